@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+"""
+Fake SIM7600 on a pseudo-terminal - stand-in modem for the direct SMS sender
+
+Answers what sms_direct.py uses (AT, AT+CMGF, AT+CMGS in PDU mode) on a pty,
+so the real pyserial code path runs without hardware:
+
+    modem = FakeModem()
+    modem.start()
+    ser = serial.Serial(modem.port)       # /dev/pts/N
+    ...
+    modem.received                        # Decoded SMS-SUBMIT PDUs
+
+Options inject the awkward cases: unsolicited lines (RING, +CLIP) in the middle
+of a submission, +CMS ERROR answers, slow network submission.
+
+Self-test (single/concatenated GSM-7 and UCS-2, extension characters,
+unsolicited lines, error handling, no +CMGS after the PDU):
+
+    python3 fake_modem.py
+"""
+import logging
+import os
+import select
+import sys
+import threading
+import time
+import tty
+
+from gsm7 import GSM7_BASIC, GSM7_EXTENSION, ESCAPE
+
+logger = logging.getLogger(__name__)
+
+EXTENSION_CHARS = {code: char for char, code in GSM7_EXTENSION.items()}
+
+
+def unpack_septets(data, count, fill_bits=0):
+    """Inverse of sms_direct.pack_septets"""
+    value = int.from_bytes(data, 'little') >> fill_bits
+    return [(value >> (7 * i)) & 0x7F for i in range(count)]
+
+
+def decode_septets(septets):
+    text = ''
+    escaped = False
+    for septet in septets:
+        if escaped:
+            text += EXTENSION_CHARS.get(septet, '?')
+            escaped = False
+        elif septet == ESCAPE:
+            escaped = True
+        else:
+            text += GSM7_BASIC[septet]
+    return text
+
+
+def decode_submit_pdu(pdu_hex):
+    """
+    Decode an SMS-SUBMIT PDU (SCA included) as sms_direct builds it
+
+    Returns:
+        dict: recipient, encoding, text, concat (reference, total, seq) or None, tpdu_length
+    """
+    pdu = bytes.fromhex(pdu_hex)
+    pos = 1 + pdu[0]  # Skip SMSC
+    tpdu_start = pos
+    first_octet = pdu[pos]
+    pos += 2  # First octet, message reference
+
+    digit_count, address_type = pdu[pos], pdu[pos + 1]
+    semi_octets = pdu[pos + 2:pos + 2 + (digit_count + 1) // 2].hex().upper()
+    digits = ''.join(semi_octets[i + 1] + semi_octets[i] for i in range(0, len(semi_octets), 2))[:digit_count]
+    recipient = ('+' if address_type == 0x91 else '') + digits
+    pos += 2 + (digit_count + 1) // 2
+
+    dcs = pdu[pos + 1]
+    pos += 2  # PID, DCS
+    validity_format = (first_octet >> 3) & 0x03
+    pos += {0: 0, 2: 1}.get(validity_format, 7)
+    user_data_length = pdu[pos]
+    user_data = pdu[pos + 1:]
+
+    concat = None
+    header_length = 0
+    if first_octet & 0x40:
+        header_length = user_data[0] + 1
+        header = user_data[1:header_length]
+        i = 0
+        while i < len(header):
+            element, length = header[i], header[i + 1]
+            if element == 0x00:
+                concat = tuple(header[i + 2:i + 5])
+            i += 2 + length
+
+    if dcs & 0x0C == 0x08:
+        encoding = 'UCS2'
+        text = user_data[header_length:user_data_length].decode('utf-16-be')
+    else:
+        encoding = 'GSM7'
+        header_septets = (header_length * 8 + 6) // 7
+        fill_bits = header_septets * 7 - header_length * 8
+        septets = unpack_septets(user_data[header_length:], user_data_length - header_septets, fill_bits)
+        text = decode_septets(septets)
+
+    return {
+        'recipient': recipient,
+        'encoding': encoding,
+        'text': text,
+        'concat': concat,
+        'tpdu_length': len(pdu) - tpdu_start
+    }
+
+
+class FakeModem(threading.Thread):
+    """SIM7600 stand-in answering AT commands on a pseudo-terminal"""
+
+    def __init__(self, unsolicited_during_submit=None, fail_recipients=(), submit_delay=0.02):
+        """
+        Args:
+            unsolicited_during_submit: Lines sent between the PDU and +CMGS (e.g. ['RING', '+CLIP: "07..."'])
+            fail_recipients: Numbers answered with +CMS ERROR: 38
+            submit_delay: Seconds the fake network takes per SMS
+        """
+        super().__init__(daemon=True)
+        self.master_fd, slave_fd = os.openpty()
+        tty.setraw(slave_fd)  # No echo, no CR/LF translation - like the USB serial port
+        self.port = os.ttyname(slave_fd)
+        self.slave_fd = slave_fd
+
+        self.unsolicited_during_submit = list(unsolicited_during_submit or [])
+        self.fail_recipients = set(fail_recipients)
+        self.submit_delay = submit_delay
+
+        self.pdu_mode = False
+        self.received = []
+        self.commands = []
+        self.message_reference = 0
+        self.running = True
+
+    def respond(self, text):
+        os.write(self.master_fd, text.encode())
+
+    def run(self):
+        buffer = b''
+        pending_length = None  # AT+CMGS length while waiting for the PDU
+
+        while self.running:
+            readable, _, _ = select.select([self.master_fd], [], [], 0.1)
+            if not readable:
+                continue
+            try:
+                buffer += os.read(self.master_fd, 1024)
+            except OSError:
+                break
+
+            while True:
+                if pending_length is not None:
+                    if b'\x1b' in buffer:
+                        buffer = buffer.split(b'\x1b', 1)[1]  # Sender gave up on the prompt
+                        pending_length = None
+                        self.respond('\r\nOK\r\n')
+                        continue
+                    if b'\x1a' not in buffer:
+                        break
+                    pdu_data, buffer = buffer.split(b'\x1a', 1)
+                    self.handle_pdu(pdu_data.decode().strip(), pending_length)
+                    pending_length = None
+                    continue
+
+                if b'\r' not in buffer:
+                    break
+                line, buffer = buffer.split(b'\r', 1)
+                command = line.decode(errors='ignore').strip()
+                if not command:
+                    continue
+                self.commands.append(command)
+
+                if command.upper().startswith('AT+CMGS='):
+                    if not self.pdu_mode:
+                        self.respond('\r\nERROR\r\n')
+                        continue
+                    pending_length = int(command.split('=', 1)[1])
+                    self.respond('\r\n> ')
+                elif command.upper() == 'AT+CMGF=0':
+                    self.pdu_mode = True
+                    self.respond('\r\nOK\r\n')
+                elif command.upper() == 'AT+CMGF=1':
+                    self.pdu_mode = False
+                    self.respond('\r\nOK\r\n')
+                elif command.upper().startswith('AT'):
+                    self.respond('\r\nOK\r\n')
+                else:
+                    self.respond('\r\nERROR\r\n')
+
+    def handle_pdu(self, pdu_hex, length):
+        for line in self.unsolicited_during_submit:
+            self.respond(f"\r\n{line}\r\n")
+        time.sleep(self.submit_delay)
+
+        try:
+            sms = decode_submit_pdu(pdu_hex)
+        except Exception as e:
+            logger.error(f"Fake modem: undecodable PDU {pdu_hex}: {e}")
+            self.respond('\r\n+CMS ERROR: 304\r\n')
+            return
+        if sms['tpdu_length'] != length:
+            self.respond('\r\n+CMS ERROR: 304\r\n')  # Invalid PDU mode parameter
+            return
+        if sms['recipient'] in self.fail_recipients:
+            self.respond('\r\n+CMS ERROR: 38\r\n')  # Network out of order
+            return
+
+        self.received.append(sms)
+        self.message_reference = (self.message_reference + 1) & 0xFF
+        self.respond(f"\r\n+CMGS: {self.message_reference}\r\n\r\nOK\r\n")
+
+    def stop(self):
+        self.running = False
+        for fd in (self.master_fd, self.slave_fd):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+
+
+def self_test():
+    """Run DirectSMSSender against the fake modem, returns True if every check passed"""
+    import serial
+    from sms_direct import DirectSMSSender, SMSSubmitError, SMSSubmitUnknown
+
+    unsolicited = []
+    modem = FakeModem(unsolicited_during_submit=['RING', '+CLIP: "0711111111",129,,,"",0'],
+                      fail_recipients={'+40700000099'})
+    modem.start()
+    ser = serial.Serial(modem.port, 115200, timeout=1)
+    sender = DirectSMSSender(lambda: ser, threading.RLock(), on_unsolicited=unsolicited.append)
+
+    long_gsm = 'Comanda dvs. a fost confirmata [ref 42] - total 19.99€. ' * 6
+    long_ucs2 = 'Comanda dvs. a fost confirmată, mulțumim! Vă așteptăm. ' * 4
+    checks = []
+
+    def check(name, condition):
+        checks.append(condition)
+        print(f"{'✅' if condition else '❌'} {name}")
+
+    try:
+        start_time = time.time()
+        refs = sender.send('+40712345678', 'Hello @ {world} ~ 5€')
+        check(f"single GSM-7 with extension characters ({(time.time() - start_time) * 1000:.0f}ms)",
+              len(refs) == 1 and modem.received[-1]['text'] == 'Hello @ {world} ~ 5€'
+              and modem.received[-1]['encoding'] == 'GSM7' and modem.received[-1]['recipient'] == '+40712345678')
+
+        sender.send('0712345678', 'Bună ziua, ačiū!')
+        check("single UCS-2, national number",
+              modem.received[-1]['text'] == 'Bună ziua, ačiū!' and modem.received[-1]['encoding'] == 'UCS2'
+              and modem.received[-1]['recipient'] == '0712345678')
+
+        before = len(modem.received)
+        refs = sender.send('+37060000000', long_gsm, concatenate=True)
+        parts = modem.received[before:]
+        check(f"concatenated GSM-7 ({len(parts)} parts)",
+              len(parts) > 1 and ''.join(p['text'] for p in parts) == long_gsm
+              and [p['concat'][2] for p in parts] == list(range(1, len(parts) + 1))
+              and len({p['concat'][0] for p in parts}) == 1)
+
+        before = len(modem.received)
+        sender.send('+40712345678', long_ucs2, concatenate=True)
+        parts = modem.received[before:]
+        check(f"concatenated UCS-2 ({len(parts)} parts)",
+              len(parts) > 1 and ''.join(p['text'] for p in parts) == long_ucs2)
+
+        try:
+            sender.send('+40712345678', long_ucs2)
+            check("too long without concatenation is refused", False)
+        except ValueError:
+            check("too long without concatenation is refused", True)
+
+        try:
+            sender.send('+40700000099', 'x')
+            check("+CMS ERROR raises SMSSubmitError", False)
+        except SMSSubmitError:
+            check("+CMS ERROR raises SMSSubmitError", True)
+
+        check(f"unsolicited lines handed back ({len(unsolicited)})",
+              'RING' in unsolicited and any(line.startswith('+CLIP') for line in unsolicited))
+        check("PDU mode set once", modem.commands.count('AT+CMGF=0') == 1)
+    finally:
+        ser.close()
+        modem.stop()
+
+    # Network slower than the submit timeout: the PDU went out, the outcome is unknown
+    slow_modem = FakeModem(submit_delay=0.5)
+    slow_modem.start()
+    slow_ser = serial.Serial(slow_modem.port, 115200, timeout=1)
+    try:
+        slow_sender = DirectSMSSender(lambda: slow_ser, threading.RLock(), submit_timeout=0.2)
+        try:
+            slow_sender.send('+40712345678', 'x')
+            check("no +CMGS after the PDU raises SMSSubmitUnknown", False)
+        except SMSSubmitUnknown:
+            check("no +CMGS after the PDU raises SMSSubmitUnknown", True)
+    finally:
+        slow_ser.close()
+        slow_modem.stop()
+
+    return all(checks)
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    sys.exit(0 if self_test() else 1)
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+GSM 03.38 (GSM-7) alphabet - septet counting and cheapest SMS encoding
+
+A message is GSM-7 if every character is in the basic table (1 septet) or the
+extension table (escape + code, 2 septets); one SMS holds 160 septets. Anything
+else forces UCS-2, 70 UTF-16 units per SMS - one '€' or 'é' used to triple the
+part count because the API only checked for ASCII.
+
+smsd (cs_convert = yes) reads text spool files as ISO-8859-15 and converts
+them to GSM-7 itself, so through the spool a GSM-7 message must also be
+ISO-8859-15 encodable (the Greek capitals and '¤' are not - those go as UCS-2).
+Senders that pack septets themselves can use the full alphabet (charset=None).
+
+Transliteration (opt-in per request) maps Romanian and Lithuanian diacritics and
+typographic punctuation to their GSM-7 base characters, so most ro/lt text
+fits GSM-7.
+"""
+
+# Basic table, index = septet value (0x1B is the escape to the extension table)
+GSM7_BASIC = (
+    '@£$¥èéùìòÇ\nØø\rÅå'
+    'Δ_ΦΓΛΩΠΨΣΘΞ\x1bÆæßÉ'
+    ' !"#¤%&\'()*+,-./'
+    '0123456789:;<=>?'
+    '¡ABCDEFGHIJKLMNO'
+    'PQRSTUVWXYZÄÖÑÜ§'
+    '¿abcdefghijklmno'
+    'pqrstuvwxyzäöñüà'
+)
+ESCAPE = 0x1B
+GSM7_EXTENSION = {
+    '\f': 0x0A, '^': 0x14, '{': 0x28, '}': 0x29, '\\': 0x2F,
+    '[': 0x3C, '~': 0x3D, ']': 0x3E, '|': 0x40, '€': 0x65,
+}
+BASIC_CODES = {char: code for code, char in enumerate(GSM7_BASIC) if code != ESCAPE}
+
+# Per-SMS budgets (single SMS / part of a concatenated SMS with 6-byte UDH)
+GSM7_SINGLE = 160
+GSM7_CONCAT = 153
+UCS2_SINGLE = 70
+UCS2_CONCAT = 67
+
+SPOOL_CHARSET = 'iso-8859-15'  # smsd cs_convert input
+
+TRANSLITERATIONS = {
+    'ro': {
+        'ă': 'a', 'â': 'a', 'î': 'i', 'ș': 's', 'ş': 's', 'ț': 't', 'ţ': 't',
+        'Ă': 'A', 'Â': 'A', 'Î': 'I', 'Ș': 'S', 'Ş': 'S', 'Ț': 'T', 'Ţ': 'T',
+    },
+    'lt': {
+        'ą': 'a', 'č': 'c', 'ę': 'e', 'ė': 'e', 'į': 'i', 'š': 's', 'ų': 'u', 'ū': 'u', 'ž': 'z',
+        'Ą': 'A', 'Č': 'C', 'Ę': 'E', 'Ė': 'E', 'Į': 'I', 'Š': 'S', 'Ų': 'U', 'Ū': 'U', 'Ž': 'Z',
+    },
+}
+# LLM replies are full of these - each one alone would force UCS-2
+PUNCTUATION = {
+    '‘': "'", '’': "'", '‚': "'", '“': '"', '”': '"', '„': '"', '«': '"', '»': '"',
+    '–': '-', '—': '-', '−': '-', '…': '...', '\u00a0': ' ', '\u202f': ' ', '\u2009': ' ',
+}
+
+
+def septet_cost(char):
+    """Septets of one character (2 for the extension table, None if not GSM-7)"""
+    if char in BASIC_CODES:
+        return 1
+    if char in GSM7_EXTENSION:
+        return 2
+    return None
+
+
+def ucs2_cost(char):
+    """UTF-16 code units of one character (2 outside the BMP, e.g. emoji)"""
+    return 2 if ord(char) > 0xFFFF else 1
+
+
+def is_gsm7(text, charset=None):
+    """
+    True if text can be sent as GSM-7
+
+    Args:
+        text: Message text
+        charset: Also require this encoding (SPOOL_CHARSET for smsd spool files)
+    """
+    if any(septet_cost(char) is None for char in text):
+        return False
+    if charset:
+        try:
+            text.encode(charset)
+        except UnicodeEncodeError:
+            return False
+    return True
+
+
+def septet_count(text):
+    """Septets needed for text (None if not GSM-7)"""
+    total = 0
+    for char in text:
+        cost = septet_cost(char)
+        if cost is None:
+            return None
+        total += cost
+    return total
+
+
+def ucs2_count(text):
+    """UTF-16 code units needed for text"""
+    return sum(ucs2_cost(char) for char in text)
+
+
+def encode_septets(text):
+    """
+    GSM-7 septet values of text (extension characters as escape + code)
+
+    Raises:
+        ValueError: text contains a character outside GSM 03.38
+    """
+    septets = []
+    for char in text:
+        if char in BASIC_CODES:
+            septets.append(BASIC_CODES[char])
+        elif char in GSM7_EXTENSION:
+            septets.extend((ESCAPE, GSM7_EXTENSION[char]))
+        else:
+            raise ValueError(f"Character {char!r} is not in the GSM 03.38 alphabet")
+    return septets
+
+
+def transliterate(text, languages=('ro', 'lt')):
+    """
+    Replace ro/lt diacritics and typographic punctuation with GSM-7 characters
+
+    Args:
+        text: Message text
+        languages: Tables to apply (codes from TRANSLITERATIONS)
+    """
+    table = dict(PUNCTUATION)
+    for language in languages:
+        table.update(TRANSLITERATIONS.get(language, {}))
+    return ''.join(table.get(char, char) for char in text)
+
+
+def choose_encoding(text, charset=None):
+    """
+    Cheapest encoding of a message
+
+    Args:
+        text: Message text
+        charset: Transport charset GSM-7 text must also fit (SPOOL_CHARSET for smsd)
+
+    Returns:
+        (encoding, cost_fn, single_budget): 'GSM7' or 'UCS2', per-character cost
+        function and units per single SMS
+    """
+    if is_gsm7(text, charset):
+        return 'GSM7', septet_cost, GSM7_SINGLE
+    return 'UCS2', ucs2_cost, UCS2_SINGLE
@@ -0,0 +1,333 @@
+#!/usr/bin/env python3
+"""
+Direct SMS sender - PDU mode AT+CMGS on the voice bot's AT port
+
+With SMS_TRANSPORT=direct the voice bot sends outbox messages itself instead of
+the API spooling files for smsd: no spool polling, no smsd on the port for
+outgoing SMS - a submission takes as long as the modem needs for AT+CMGS.
+
+- SMS-SUBMIT PDUs built here: GSM-7 (full GSM 03.38 alphabet, septet packed)
+  or UCS-2, 24h validity, the SIM's SMSC
+- Texts longer than one SMS are sent either as separate SMS (caller splits,
+  default - the SIM7600G-H firmware hangs on concatenated UCS-2 through smsd)
+  or concatenated with an 8-bit reference UDH (concatenate=True)
+- Every AT exchange holds at_lock, the same lock the bot's AT commands and
+  line reader use, so SMS never interleaves with voice commands. Lines that
+  are not part of the CMGS answer (RING, +CLIP, NO CARRIER ...) are handed back
+  through on_unsolicited, the bot processes them as if it had read them itself
+
+fake_modem.py runs a pseudo-terminal modem stand-in and a self-test of this module.
+"""
+import logging
+import os
+import threading
+import time
+
+from gsm7 import (encode_septets, is_gsm7, septet_cost, ucs2_cost,
+                  GSM7_SINGLE, GSM7_CONCAT, UCS2_SINGLE, UCS2_CONCAT)
+
+logger = logging.getLogger(__name__)
+
+SMS_TRANSPORT = os.getenv('SMS_TRANSPORT', 'spool')  # 'spool' (smsd) or 'direct' (voice bot)
+
+CTRL_Z = b'\x1a'
+ESC = b'\x1b'
+PROMPT_TIMEOUT = 5          # Seconds for the '>' prompt after AT+CMGS
+SUBMIT_TIMEOUT = 60         # Seconds for +CMGS (network submission)
+VALIDITY_24H = 0xA7         # Relative validity period octet: 24 hours
+OUTBOX_POLL_INTERVAL = 0.25
+
+FINAL_ERRORS = ('ERROR', '+CMS ERROR', '+CME ERROR')
+
+
+class SMSSubmitError(Exception):
+    """Modem rejected the SMS (+CMS ERROR) - retrying the same PDU will not help"""
+
+
+class SMSSubmitUnknown(Exception):
+    """No +CMGS after the PDU was sent - the network may have accepted it, resending risks a duplicate"""
+
+
+def encode_address(number):
+    """
+    Destination address field
+
+    Returns:
+        bytes: digit count, type of address (0x91 international / 0x81 unknown), BCD semi-octets
+    """
+    international = number.startswith('+')
+    digits = ''.join(char for char in number if char.isdigit())
+    padded = digits + 'F' if len(digits) % 2 else digits
+    swapped = ''.join(padded[i + 1] + padded[i] for i in range(0, len(padded), 2))
+    return bytes([len(digits), 0x91 if international else 0x81]) + bytes.fromhex(swapped)
+
+
+def pack_septets(septets, fill_bits=0):
+    """Pack 7-bit values LSB first, after fill_bits zero bits (alignment behind a UDH)"""
+    packed = bytearray()
+    accumulator = 0
+    bits = fill_bits
+    for septet in septets:
+        accumulator |= (septet & 0x7F) << bits
+        bits += 7
+        while bits >= 8:
+            packed.append(accumulator & 0xFF)
+            accumulator >>= 8
+            bits -= 8
+    if bits:
+        packed.append(accumulator & 0xFF)
+    return bytes(packed)
+
+
+def split_to_budget(text, cost, budget):
+    """Greedy split into pieces of at most budget units (escapes/surrogates stay whole)"""
+    pieces = []
+    current = ''
+    used = 0
+    for char in text:
+        units = cost(char)
+        if used + units > budget:
+            pieces.append(current)
+            current, used = '', 0
+        current += char
+        used += units
+    if current or not pieces:
+        pieces.append(current)
+    return pieces
+
+
+def build_submit_pdus(recipient, text, reference=0, concatenate=False):
+    """
+    SMS-SUBMIT PDUs for a message
+
+    Args:
+        recipient: Destination number (+international or national)
+        text: Message text
+        reference: Concatenation reference (0-255), same for all parts of the message
+        concatenate: Split a long text into concatenated parts (else it must fit one SMS)
+
+    Returns:
+        list: (pdu_hex, tpdu_length) per SMS, tpdu_length is the AT+CMGS argument
+
+    Raises:
+        ValueError: text does not fit one SMS and concatenate is False
+    """
+    gsm = is_gsm7(text)
+    cost = septet_cost if gsm else ucs2_cost
+    single, concat = (GSM7_SINGLE, GSM7_CONCAT) if gsm else (UCS2_SINGLE, UCS2_CONCAT)
+
+    if sum(cost(char) for char in text) <= single:
+        pieces = [text]
+    elif concatenate:
+        pieces = split_to_budget(text, cost, concat)
+        if len(pieces) > 255:
+            raise ValueError(f"Message needs {len(pieces)} parts (max 255)")
+    else:
+        raise ValueError(f"Text does not fit one SMS ({'GSM-7' if gsm else 'UCS-2'}) - split it or concatenate")
+
+    pdus = []
+    for seq, piece in enumerate(pieces, 1):
+        udh = bytes([5, 0x00, 3, reference & 0xFF, len(pieces), seq]) if len(pieces) > 1 else b''
+
+        if gsm:
+            septets = encode_septets(piece)
+            header_bits = len(udh) * 8
+            fill_bits = (7 - header_bits % 7) % 7
+            user_data = udh + pack_septets(septets, fill_bits)
+            user_data_length = (header_bits + fill_bits) // 7 + len(septets)
+        else:
+            user_data = udh + piece.encode('utf-16-be')
+            user_data_length = len(user_data)
+
+        first_octet = 0x11 | (0x40 if udh else 0)  # SMS-SUBMIT, relative validity, UDHI
+        tpdu = (bytes([first_octet, 0x00]) + encode_address(recipient)
+                + bytes([0x00, 0x00 if gsm else 0x08, VALIDITY_24H, user_data_length]) + user_data)
+        pdus.append(('00' + tpdu.hex().upper(), len(tpdu)))  # 00 = SMSC from the SIM
+
+    return pdus
+
+
+class DirectSMSSender:
+    """Sends SMS through AT+CMGS on a serial port shared with the voice bot"""
+
+    def __init__(self, get_serial, at_lock, on_unsolicited=None, submit_timeout=SUBMIT_TIMEOUT):
+        """
+        Args:
+            get_serial: Callable returning the open AT serial port (or None while closed)
+            at_lock: Lock held by every user of the port
+            on_unsolicited: Callable(line) for modem lines that are not part of an SMS answer
+            submit_timeout: Seconds to wait for +CMGS after the PDU
+        """
+        self.get_serial = get_serial
+        self.at_lock = at_lock
+        self.on_unsolicited = on_unsolicited
+        self.submit_timeout = submit_timeout
+        self.reference = int(time.time()) & 0xFF
+        self.pdu_mode_port = None  # Port on which AT+CMGF=0 was set
+
+    def send(self, recipient, text, concatenate=False):
+        """
+        Send one message
+
+        Args:
+            recipient: Destination number
+            text: Message text (one SMS unless concatenate)
+            concatenate: Send a long text as concatenated parts
+
+        Returns:
+            list: Message references (+CMGS) of the sent PDUs
+
+        Raises:
+            SMSSubmitError: The modem refused the SMS
+            SMSSubmitUnknown: PDU sent but no +CMGS - outcome unknown, do not resend
+            TimeoutError / OSError: Port problem before the PDU was sent - worth retrying later
+        """
+        self.reference = (self.reference + 1) & 0xFF
+        pdus = build_submit_pdus(recipient, text, self.reference, concatenate)
+
+        references = []
+        with self.at_lock:
+            ser = self.get_serial()
+            if ser is None:
+                raise OSError('AT port not open')
+            previous_timeout = ser.timeout
+            ser.timeout = 0.05
+            try:
+                if self.pdu_mode_port is not ser:
+                    self.command(ser, 'AT+CMGF=0')
+                    self.pdu_mode_port = ser
+                for pdu_hex, length in pdus:
+                    start_time = time.time()
+                    references.append(self.submit(ser, pdu_hex, length))
+                    logger.info(f"📤 SMS to {recipient} submitted in {(time.time() - start_time) * 1000:.0f}ms "
+                                f"(ref {references[-1]}, {length} octets)")
+            finally:
+                ser.timeout = previous_timeout
+        return references
+
+    def command(self, ser, command, timeout=2):
+        """Plain AT command, returns the lines before OK"""
+        ser.write(f"{command}\r".encode())
+        return self.read_answer(ser, timeout)
+
+    def submit(self, ser, pdu_hex, length):
+        """AT+CMGS=<length>, PDU after the prompt, returns the message reference"""
+        ser.write(f"AT+CMGS={length}\r".encode())
+        self.read_answer(ser, PROMPT_TIMEOUT, prompt=True)
+
+        ser.write(pdu_hex.encode() + CTRL_Z)
+        try:
+            answer = self.read_answer(ser, self.submit_timeout)
+        except TimeoutError:
+            raise SMSSubmitUnknown(f"No +CMGS within {self.submit_timeout}s after the PDU - may have been sent")
+        for line in answer:
+            if line.startswith('+CMGS:'):
+                return int(line.split(':', 1)[1].strip().split(',')[0])
+        return None
+
+    def read_answer(self, ser, timeout, prompt=False):
+        """
+        Read until OK (or the '>' prompt)
+
+        Returns:
+            list: Information lines of the answer
+
+        Raises:
+            SMSSubmitError: ERROR / +CMS ERROR
+            TimeoutError: No final result in time (the PDU prompt is cancelled with ESC)
+        """
+        deadline = time.time() + timeout
+        buffer = b''
+        lines = []
+
+        while time.time() < deadline:
+            buffer += ser.read(max(1, ser.in_waiting))
+
+            while b'\n' in buffer:
+                raw, buffer = buffer.split(b'\n', 1)
+                line = raw.strip().decode('ascii', errors='ignore')
+                if not line or line.startswith('AT'):
+                    continue  # Blank or command echo
+                if line == 'OK':
+                    return lines
+                if line.startswith(FINAL_ERRORS):
+                    raise SMSSubmitError(line)
+                if line.startswith('+CMGS:'):
+                    lines.append(line)
+                elif self.on_unsolicited:
+                    self.on_unsolicited(line)  # RING / +CLIP / NO CARRIER belong to the bot
+
+            if prompt and buffer.strip().startswith(b'>'):
+                return lines
+
+        if prompt:
+            ser.write(ESC)  # Leave the PDU prompt, the port stays usable
+        raise TimeoutError(f"No modem answer within {timeout}s")
+
+
+class OutboxSender(threading.Thread):
+    """Sends queued outbox parts directly (SMS_TRANSPORT=direct), pauses during calls"""
+
+    def __init__(self, outbox, sender, is_busy=None):
+        """
+        Args:
+            outbox: SMSOutbox shared with the API (same SQLite file)
+            sender: DirectSMSSender
+            is_busy: Callable, True while the modem must not send (call in progress)
+        """
+        super().__init__(daemon=True)
+        self.outbox = outbox
+        self.sender = sender
+        self.is_busy = is_busy or (lambda: False)
+        self.running = True
+
+    def run(self):
+        logger.info("📤 Direct SMS sender started (outbox -> AT+CMGS)")
+        while self.running:
+            try:
+                if self.is_busy() or self.sender.get_serial() is None:
+                    time.sleep(1)
+                    continue
+
+                parts = self.outbox.scheduler_parts()
+                if not parts:
+                    time.sleep(OUTBOX_POLL_INTERVAL)
+                    continue
+
+                for part in parts:
+                    # Port trouble: stop, so later parts of the same recipient do not overtake
+                    if self.is_busy() or not self.running or not self.send_part(part):
+                        break
+
+            except Exception as e:
+                logger.error(f"Direct SMS sender error: {e}")
+                time.sleep(5)
+
+    def send_part(self, part):
+        """
+        Send one outbox part and record the result
+
+        Returns:
+            False if the port had a problem (part stays queued for a retry)
+        """
+        try:
+            self.sender.send(part['recipient'], part['text'])
+        except (SMSSubmitError, ValueError) as e:
+            logger.error(f"📤 SMS part {part['part_num']}/{part['total_parts']} to {part['recipient']} failed: {e}")
+            self.outbox.mark_finished(part['filename'], 'failed', str(e))
+            return True
+        except SMSSubmitUnknown as e:
+            # Not re-queued: a second submission could reach the recipient twice
+            logger.error(f"📤 SMS part {part['part_num']}/{part['total_parts']} to {part['recipient']} "
+                         f"not confirmed: {e} - marked failed, not resent")
+            self.outbox.mark_finished(part['filename'], 'failed', str(e))
+            return True
+        except (TimeoutError, OSError) as e:
+            logger.warning(f"📤 SMS to {part['recipient']} not submitted ({e}) - will retry")
+            time.sleep(2)
+            return False
+        self.outbox.mark_finished(part['filename'], 'sent')
+        return True
+
+    def stop(self):
+        self.running = False
@@ -0,0 +1,442 @@
+#!/usr/bin/env python3
+"""
+SMS Outbox - Durable record of every outgoing SMS (SQLite WAL)
+
+Each /send request becomes one message row and one row per part:
+
+    message: id, idempotency key, recipient, text, encoding, state
+    part:    message id, part number, text, spool filename, state, timestamps
+
+Part states:  queued -> spooled -> sent | failed
+              queued -> sent | failed        (SMS_TRANSPORT=direct, sms_direct.py)
+              failed -> sent | failed        (cron retry, sms_retry_failed.sh)
+Message state follows its parts: failed if any part failed, sent when all are
+sent, spooled once any part reached smsd, queued before that.
+
+- Restart: queued parts are handed to the scheduler again, spooled parts are
+  looked up (one stat per file) in sent/ and failed/ in case smsd finished them
+  while the API was down
+- Idempotency: a request carrying the same idempotency key returns the
+  original message instead of sending again. Content dedup (same text to the
+  same recipient within dedup_window seconds) is opt-in per request - without
+  it an identical keyless request is a new message (same OTP sent twice)
+- Retries: sms_retry_failed.sh moves failed files back to outgoing/ as
+  {name}_retryN (up to CRON_MAX_RETRIES). The suffix is stripped when smsd
+  files the retry, so a part delivered on retry turns from failed to sent
+- SpoolWatcher follows smsd moving our files to sent/ and failed/ through
+  inotifywait (inotify-tools); without it, it polls only the in-flight files
+
+Layout:
+    /home/rom/SMS_Gateway/sms_outbox.db    (+ -wal/-shm)
+"""
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import subprocess
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DB_PATH = '/home/rom/SMS_Gateway/sms_outbox.db'
+OUTGOING_DIR = '/var/spool/sms/outgoing'
+CHECKED_DIR = '/var/spool/sms/checked'
+SENT_DIR = '/var/spool/sms/sent'
+FAILED_DIR = '/var/spool/sms/failed'
+
+DEDUP_WINDOW = 120           # Default seconds for opt-in content dedup of keyless requests
+CRON_MAX_RETRIES = 3         # MAX_RETRIES in sms_retry_failed.sh
+RETRY_WINDOW = 86400         # Failed parts younger than this may still be delivered by a cron retry
+RETRY_SUFFIX = re.compile(r'_retry(\d+)$')
+RETENTION_DAYS = 30          # Finished messages older than this are pruned
+POLL_INTERVAL = 2.0          # SpoolWatcher fallback without inotifywait
+
+
+def content_hash(recipient, text):
+    return hashlib.sha256(f"{recipient}\x1f{text}".encode('utf-8')).hexdigest()
+
+
+def split_retry_name(name):
+    """
+    Spool name without the cron retry suffix
+
+    Returns:
+        (name, retry): 'api_1_2_part1_retry2' -> ('api_1_2_part1', 2), retry 0 for the first attempt
+    """
+    match = RETRY_SUFFIX.search(name)
+    if match is None:
+        return name, 0
+    return name[:match.start()], int(match.group(1))
+
+
+def delivered_retry(name):
+    """Path of a cron retry of name that smsd moved to sent/ (None if there is none)"""
+    for retry in range(1, CRON_MAX_RETRIES + 1):
+        path = os.path.join(SENT_DIR, f"{name}_retry{retry}")
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def message_state(part_states):
+    """Message state from the states of its parts"""
+    if 'failed' in part_states:
+        return 'failed'
+    if part_states and all(state == 'sent' for state in part_states):
+        return 'sent'
+    if 'spooled' in part_states or 'sent' in part_states:
+        return 'spooled'
+    return 'queued'
+
+
+def read_fail_reason(path):
+    """'Fail_reason:' header smsd adds to a failed spool file (None if absent)"""
+    try:
+        with open(path, 'rb') as f:
+            for line in f.read(2048).split(b'\n'):
+                if not line.strip():
+                    break  # End of headers
+                if line.startswith(b'Fail_reason:'):
+                    return line.split(b':', 1)[1].strip().decode('utf-8', 'replace')
+    except OSError:
+        pass
+    return None
+
+
+class SMSOutbox:
+    """SQLite outbox of SMS messages and their parts (thread-safe)"""
+
+    def __init__(self, db_path=DEFAULT_DB_PATH):
+        """
+        Args:
+            db_path: SQLite database file (created on first use)
+        """
+        self.db_path = db_path
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(db_path, check_same_thread=False)
+        self.db.row_factory = sqlite3.Row
+        self.db.execute('PRAGMA foreign_keys=ON')  # Pruning a message deletes its parts
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        self.db.executescript('''
+            CREATE TABLE IF NOT EXISTS messages (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                idempotency_key TEXT UNIQUE,
+                content_hash TEXT,
+                recipient TEXT NOT NULL,
+                text TEXT,
+                encoding TEXT,
+                parts_total INTEGER,
+                state TEXT NOT NULL,
+                created REAL,
+                updated REAL
+            );
+            CREATE TABLE IF NOT EXISTS parts (
+                message_id INTEGER NOT NULL REFERENCES messages(id) ON DELETE CASCADE,
+                part_num INTEGER NOT NULL,
+                text TEXT,
+                needs_unicode INTEGER,
+                filename TEXT UNIQUE,
+                state TEXT NOT NULL,
+                queued REAL,
+                spooled REAL,
+                finished REAL,
+                error TEXT,
+                PRIMARY KEY (message_id, part_num)
+            );
+            CREATE INDEX IF NOT EXISTS messages_content ON messages(content_hash, created);
+            CREATE INDEX IF NOT EXISTS messages_created ON messages(created);
+            CREATE INDEX IF NOT EXISTS parts_state ON parts(state);
+        ''')
+        self.db.commit()
+
+        counts = self.count_by_state()
+        logger.info(f"📮 SMS outbox: {db_path} - {sum(counts.values())} messages {counts}")
+
+    def enqueue(self, recipient, message_parts, needs_unicode, text=None, idempotency_key=None, encoding=None,
+                dedup_window=0):
+        """
+        Record a new message (or find the one this request is a retry of)
+
+        Args:
+            recipient: Normalized phone number
+            message_parts: Texts of the single-SMS parts, in order
+            needs_unicode: Parts are spooled as UCS2
+            text: Original message text (default: parts joined)
+            idempotency_key: Caller's key; a repeated key returns the original message
+            encoding: 'UCS2' / 'GSM7' (for status only)
+            dedup_window: Seconds an identical keyless request returns the original message (0 = off)
+
+        Returns:
+            (message, created): message dict as get_message(), created False for a retry
+        """
+        text = text if text is not None else ' '.join(message_parts)
+        digest = content_hash(recipient, text)
+        now = time.time()
+
+        with self.lock:
+            if idempotency_key:
+                row = self.db.execute('SELECT id FROM messages WHERE idempotency_key = ?',
+                                      (idempotency_key,)).fetchone()
+            elif dedup_window:
+                row = self.db.execute('SELECT id FROM messages WHERE content_hash = ? AND created > ? '
+                                      'ORDER BY id DESC LIMIT 1', (digest, now - dedup_window)).fetchone()
+            else:
+                row = None
+            if row:
+                return self._get_message(row['id']), False
+
+            with self.db:
+                message_id = self.db.execute(
+                    'INSERT INTO messages (idempotency_key, content_hash, recipient, text, encoding, parts_total, '
+                    'state, created, updated) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                    (idempotency_key, digest, recipient, text, encoding or ('UCS2' if needs_unicode else 'GSM7'),
+                     len(message_parts), 'queued', now, now)
+                ).lastrowid
+
+                # Spool names stay api_* (sms_cleanup.sh, sms_watch.sh), unique per message
+                base = f"{OUTGOING_DIR}/api_{int(now * 1000)}_{message_id}"
+                self.db.executemany(
+                    'INSERT INTO parts (message_id, part_num, text, needs_unicode, filename, state, queued) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                    [(message_id, part_num, part_text, int(needs_unicode),
+                      f"{base}_part{part_num}" if len(message_parts) > 1 else base, 'queued', now)
+                     for part_num, part_text in enumerate(message_parts, 1)]
+                )
+
+            return self._get_message(message_id), True
+
+    def _get_message(self, message_id):
+        message = self.db.execute('SELECT * FROM messages WHERE id = ?', (message_id,)).fetchone()
+        if message is None:
+            return None
+        parts = self.db.execute('SELECT * FROM parts WHERE message_id = ? ORDER BY part_num',
+                                (message_id,)).fetchall()
+        return {
+            'id': message['id'],
+            'idempotency_key': message['idempotency_key'],
+            'recipient': message['recipient'],
+            'encoding': message['encoding'],
+            'state': message['state'],
+            'created': message['created'],
+            'updated': message['updated'],
+            'parts': [{
+                'part_num': part['part_num'],
+                'state': part['state'],
+                'filename': part['filename'],
+                'queued': part['queued'],
+                'spooled': part['spooled'],
+                'finished': part['finished'],
+                'error': part['error']
+            } for part in parts]
+        }
+
+    def get_message(self, message_id):
+        """Message with its parts and their states (None if unknown)"""
+        with self.lock:
+            return self._get_message(message_id)
+
+    def scheduler_parts(self, message_id=None):
+        """
+        Queued parts as SMSScheduler part dicts (oldest message first)
+
+        Args:
+            message_id: Only this message (default: all queued parts, for restart recovery)
+        """
+        query = ('SELECT p.*, m.recipient, m.parts_total FROM parts p JOIN messages m ON m.id = p.message_id '
+                 'WHERE p.state = ?')
+        args = ['queued']
+        if message_id is not None:
+            query += ' AND p.message_id = ?'
+            args.append(message_id)
+        with self.lock:
+            rows = self.db.execute(query + ' ORDER BY p.message_id, p.part_num', args).fetchall()
+        return [{
+            'message_id': row['message_id'],
+            'recipient': row['recipient'],
+            'text': row['text'],
+            'needs_unicode': bool(row['needs_unicode']),
+            'filename': row['filename'],
+            'part_num': row['part_num'],
+            'total_parts': row['parts_total'],
+            'enqueued_at': row['queued']
+        } for row in rows]
+
+    def in_flight_files(self):
+        """Spool filenames handed to smsd and not finished yet"""
+        with self.lock:
+            return [row['filename'] for row in
+                    self.db.execute("SELECT filename FROM parts WHERE state = 'spooled'")]
+
+    def retrying_files(self):
+        """Failed parts a cron retry may still deliver (spool filenames)"""
+        with self.lock:
+            return [row['filename'] for row in
+                    self.db.execute("SELECT filename FROM parts WHERE state = 'failed' AND finished > ?",
+                                    (time.time() - RETRY_WINDOW,))]
+
+    def _set_part_state(self, filename, state, allowed_from, error=None):
+        now = time.time()
+        column = 'spooled' if state == 'spooled' else 'finished'
+        with self.lock, self.db:
+            row = self.db.execute('SELECT message_id, state FROM parts WHERE filename = ?', (filename,)).fetchone()
+            if row is None or row['state'] not in allowed_from:
+                return False
+
+            self.db.execute(f'UPDATE parts SET state = ?, {column} = ?, error = ? WHERE filename = ?',
+                            (state, now, error, filename))
+            part_states = [r['state'] for r in self.db.execute('SELECT state FROM parts WHERE message_id = ?',
+                                                               (row['message_id'],))]
+            self.db.execute('UPDATE messages SET state = ?, updated = ? WHERE id = ?',
+                            (message_state(part_states), now, row['message_id']))
+            return True
+
+    def mark_spooled(self, filename):
+        """Part was written to outgoing/"""
+        return self._set_part_state(filename, 'spooled', ('queued',))
+
+    def mark_finished(self, filename, state, error=None):
+        """
+        smsd moved a part to sent/ or failed/
+
+        Args:
+            filename: Spool filename (any directory, matched by name, _retryN suffix ignored)
+            state: 'sent' or 'failed'
+            error: smsd Fail_reason for failed parts
+        """
+        name, retry = split_retry_name(os.path.basename(filename))
+        if retry and error:
+            error = f"{error} (retry {retry}/{CRON_MAX_RETRIES})"
+        # queued too: smsd can be faster than mark_spooled's commit
+        # failed too: sms_retry_failed.sh resends failed files, the retry may be delivered
+        return self._set_part_state(os.path.join(OUTGOING_DIR, name), state, ('queued', 'spooled', 'failed'), error)
+
+    def recover(self):
+        """
+        Reconcile parts with the spool after a restart (one stat per unfinished part)
+
+        Returns:
+            dict: Parts found finished / already spooled while the API was down
+        """
+        with self.lock:
+            rows = self.db.execute("SELECT filename, state FROM parts WHERE state IN ('queued', 'spooled')").fetchall()
+
+        recovered = {'sent': 0, 'failed': 0, 'spooled': 0}
+        for row in rows:
+            name = os.path.basename(row['filename'])
+            if os.path.exists(os.path.join(SENT_DIR, name)):
+                recovered['sent'] += self.mark_finished(name, 'sent')
+            elif os.path.exists(os.path.join(FAILED_DIR, name)):
+                recovered['failed'] += self.mark_finished(name, 'failed', read_fail_reason(os.path.join(FAILED_DIR, name)))
+            elif row['state'] == 'queued' and (os.path.exists(row['filename'])
+                                               or os.path.exists(os.path.join(CHECKED_DIR, name))):
+                # Written but not recorded (crash between write and commit) - do not spool twice
+                recovered['spooled'] += self.mark_spooled(row['filename'])
+
+        # Cron retries of failed parts delivered while the API was down
+        for filename in self.retrying_files():
+            path = delivered_retry(os.path.basename(filename))
+            if path:
+                recovered['sent'] += self.mark_finished(path, 'sent')
+
+        if any(recovered.values()):
+            logger.info(f"📮 SMS outbox recovery: {recovered}")
+        return recovered
+
+    def prune(self, days=RETENTION_DAYS):
+        """Delete finished messages older than days"""
+        with self.lock, self.db:
+            deleted = self.db.execute("DELETE FROM messages WHERE created < ? AND state IN ('sent', 'failed')",
+                                      (time.time() - days * 86400,)).rowcount
+        if deleted:
+            logger.info(f"📮 SMS outbox: pruned {deleted} messages older than {days} days")
+        return deleted
+
+    def count_by_state(self):
+        with self.lock:
+            return {row['state']: row['count'] for row in
+                    self.db.execute('SELECT state, COUNT(*) AS count FROM messages GROUP BY state')}
+
+
+class SpoolWatcher(threading.Thread):
+    """Moves outbox parts to sent/failed as smsd files them (inotifywait, polling fallback)"""
+
+    def __init__(self, outbox):
+        super().__init__(daemon=True)
+        self.outbox = outbox
+        self.running = True
+        self.process = None
+        self.last_prune = 0.0
+
+    def run(self):
+        logger.info("Spool watcher started")
+        while self.running:
+            try:
+                self.watch_inotify()
+            except FileNotFoundError:
+                logger.warning("inotifywait not installed (inotify-tools) - polling in-flight SMS parts")
+                self.watch_polling()
+            except Exception as e:
+                logger.error(f"Spool watcher error: {e}")
+                time.sleep(5)
+
+    def handle(self, path):
+        """smsd put path into sent/ or failed/"""
+        name = os.path.basename(path)
+        if not name.startswith('api_'):
+            return
+        if os.path.dirname(path) == FAILED_DIR:
+            reason = read_fail_reason(path)
+            if self.outbox.mark_finished(name, 'failed', reason):
+                logger.warning(f"📮 SMS part failed: {name} ({reason or 'no reason'})")
+        elif self.outbox.mark_finished(name, 'sent'):
+            logger.info(f"📮 SMS part sent: {name}{' (after retry)' if split_retry_name(name)[1] else ''}")
+
+    def maybe_prune(self):
+        if time.time() - self.last_prune > 3600:
+            self.last_prune = time.time()
+            self.outbox.prune()
+
+    def watch_inotify(self):
+        """Follow sent/ and failed/ with inotifywait (returns if it exits)"""
+        self.process = subprocess.Popen(
+            ['inotifywait', '-m', '-q', '-e', 'moved_to', '-e', 'close_write', '--format', '%w%f',
+             SENT_DIR, FAILED_DIR],
+            stdout=subprocess.PIPE, text=True
+        )
+        # Files finished between recovery and watch start
+        self.outbox.recover()
+        for line in self.process.stdout:
+            self.handle(line.rstrip('\n'))
+            self.maybe_prune()
+            if not self.running:
+                break
+        self.process.wait()
+        if self.running:
+            logger.warning(f"inotifywait exited ({self.process.returncode}) - restarting")
+            time.sleep(5)
+
+    def watch_polling(self):
+        """Stat only our in-flight files in sent/ and failed/"""
+        while self.running:
+            for filename in self.outbox.in_flight_files():
+                name = os.path.basename(filename)
+                for directory in (SENT_DIR, FAILED_DIR):
+                    path = os.path.join(directory, name)
+                    if os.path.exists(path):
+                        self.handle(path)
+                        break
+            # Failed parts: only a delivered cron retry changes them
+            for filename in self.outbox.retrying_files():
+                path = delivered_retry(os.path.basename(filename))
+                if path:
+                    self.handle(path)
+            self.maybe_prune()
+            time.sleep(POLL_INTERVAL)
+
+    def stop(self):
+        self.running = False
+        if self.process:
+            self.process.terminate()
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+SMS send scheduler - per-recipient spacing, interleaved recipients
+
+The SIM7600G-H cannot send concatenated UCS-2 SMS, so long messages are split
+at the API level and every part is spooled to SMSTools3 as a single SMS. Parts
+of one recipient must keep a gap (default 1.5s) so they arrive in order, but
+that gap applies to that recipient only: while one recipient waits, parts of
+other recipients are spooled.
+
+Modem throughput limits:
+- max_spool_depth: our files waiting in outgoing/ or being sent from checked/
+  (smsd has one modem, a deep spool only adds latency and reorders parts)
+- send_rate: spooled parts per second across all recipients
+
+Among the eligible recipients the one whose next part has waited longest goes
+first. Waits (enqueue -> spool) are exported through get_stats().
+"""
+import os
+import threading
+import time
+from collections import deque
+
+PART_SPACING = 1.5       # Seconds between parts to the same recipient
+MAX_SPOOL_DEPTH = 4      # Our files in outgoing/ + checked/ at once
+SEND_RATE = 1.0          # Parts per second, all recipients
+WAIT_WINDOW = 500        # Recent waits kept for percentiles
+
+OUTGOING_DIR = '/var/spool/sms/outgoing'
+CHECKED_DIR = '/var/spool/sms/checked'
+
+
+def in_spool(filename):
+    """True while smsd has not finished with a spooled file (outgoing/ or checked/)"""
+    name = os.path.basename(filename)
+    return (os.path.exists(os.path.join(OUTGOING_DIR, name))
+            or os.path.exists(os.path.join(CHECKED_DIR, name)))
+
+
+class SMSScheduler:
+    """Decides which queued SMS part is spooled next (thread-safe, no I/O except spool checks)"""
+
+    def __init__(self, part_spacing=PART_SPACING, max_spool_depth=MAX_SPOOL_DEPTH,
+                 send_rate=SEND_RATE, spool_check=in_spool):
+        """
+        Args:
+            part_spacing: Minimum seconds between two parts to one recipient
+            max_spool_depth: Maximum parts handed to smsd and not yet finished
+            send_rate: Maximum parts spooled per second overall
+            spool_check: filename -> True while smsd still holds it
+        """
+        self.part_spacing = part_spacing
+        self.max_spool_depth = max_spool_depth
+        self.send_interval = 1.0 / send_rate if send_rate else 0.0
+        self.spool_check = spool_check
+
+        self.lock = threading.Lock()
+        self.pending = {}           # recipient -> deque of parts (FIFO per recipient)
+        self.next_allowed = {}      # recipient -> earliest time of its next part
+        self.in_flight = []         # Filenames handed to smsd
+        self.last_spool = 0.0
+
+        self.waits = deque(maxlen=WAIT_WINDOW)
+        self.spooled_total = 0
+        self.blocked_by = None      # What the next part waits for: spacing / rate / spool_depth
+
+    def add(self, parts):
+        """
+        Queue the parts of one message (kept in order)
+
+        Args:
+            parts: List of dicts with at least 'recipient'
+        """
+        now = time.time()
+        with self.lock:
+            for part in parts:
+                part.setdefault('enqueued_at', now)
+                self.pending.setdefault(part['recipient'], deque()).append(part)
+
+    def track(self, filenames):
+        """Count files spooled before a restart against the spool depth"""
+        with self.lock:
+            self.in_flight.extend(filenames)
+
+    def _spool_depth(self):
+        self.in_flight = [filename for filename in self.in_flight if self.spool_check(filename)]
+        return len(self.in_flight)
+
+    def next_part(self):
+        """
+        Pop the next part to spool
+
+        Returns:
+            (part, 0.0) if one may be spooled now, else (None, seconds until it is worth asking again)
+        """
+        now = time.time()
+        with self.lock:
+            self.blocked_by = None
+            if not self.pending:
+                return None, 1.0
+
+            # Global send rate
+            rate_wait = self.last_spool + self.send_interval - now
+            if rate_wait > 0:
+                self.blocked_by = 'rate'
+                return None, rate_wait
+
+            # Modem busy - smsd still holds max_spool_depth of our files
+            if self.max_spool_depth and self._spool_depth() >= self.max_spool_depth:
+                self.blocked_by = 'spool_depth'
+                return None, 0.25
+
+            # Longest-waiting head part among recipients outside their spacing gap
+            best = None
+            soonest = None
+            for recipient, parts in self.pending.items():
+                allowed = self.next_allowed.get(recipient, 0.0)
+                if allowed > now:
+                    soonest = allowed if soonest is None else min(soonest, allowed)
+                    continue
+                if best is None or parts[0]['enqueued_at'] < self.pending[best][0]['enqueued_at']:
+                    best = recipient
+
+            if best is None:
+                self.blocked_by = 'spacing'
+                return None, soonest - now
+
+            part = self.pending[best].popleft()
+            if not self.pending[best]:
+                del self.pending[best]
+            return part, 0.0
+
+    def spooled(self, part, filename):
+        """Record that part was written to the spool as filename"""
+        now = time.time()
+        with self.lock:
+            self.next_allowed[part['recipient']] = now + self.part_spacing
+            self.in_flight.append(filename)
+            self.last_spool = now
+            self.spooled_total += 1
+            self.waits.append(now - part['enqueued_at'])
+
+            # Forget spacing of recipients whose gap is long over
+            for recipient in [r for r, t in self.next_allowed.items() if t < now - 60]:
+                del self.next_allowed[recipient]
+
+    def get_stats(self):
+        """Queue depth, spool depth and enqueue->spool wait times"""
+        now = time.time()
+        with self.lock:
+            waits = sorted(self.waits)
+            pending_parts = sum(len(parts) for parts in self.pending.values())
+            oldest = min((parts[0]['enqueued_at'] for parts in self.pending.values()), default=None)
+            stats = {
+                'pending_parts': pending_parts,
+                'pending_recipients': len(self.pending),
+                'spool_depth': self._spool_depth(),
+                'max_spool_depth': self.max_spool_depth,
+                'send_rate': round(1.0 / self.send_interval, 3) if self.send_interval else None,
+                'part_spacing_s': self.part_spacing,
+                'spooled_total': self.spooled_total,
+                'oldest_pending_s': round(now - oldest, 2) if oldest is not None else None,
+                'blocked_by': self.blocked_by
+            }
+
+        def percentile(q):
+            return round(waits[min(len(waits) - 1, int(q / 100.0 * len(waits)))], 3) if waits else None
+
+        stats['wait_s'] = {
+            'samples': len(waits),
+            'p50': percentile(50),
+            'p90': percentile(90),
+            'max': round(waits[-1], 3) if waits else None
+        }
+        return stats
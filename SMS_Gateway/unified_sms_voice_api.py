@@ -4,7 +4,7 @@ Unified Communication API for VPS
 Handles SMS sending and Phone Call TTS commands
 Uses binary UTF-16-BE encoding for Unicode messages
 """
-from http.server import HTTPServer, BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
 import json
 import os
 import time
@@ -13,7 +13,8 @@ import subprocess
 import threading
 import queue
 import sys
-import numpy as np
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 import urllib.parse
 import urllib.request
@@ -25,19 +26,46 @@ sys.path.insert(0, '/home/rom/SMS_Gateway')
 
 # Import phone number normalization
 from normalize_phone import normalize_phone_number, get_gateway_country_code
+from sms_scheduler import SMSScheduler
+from sms_outbox import SMSOutbox, SpoolWatcher, DEDUP_WINDOW
+from sms_direct import SMS_TRANSPORT
+from gsm7 import choose_encoding, transliterate, TRANSLITERATIONS, SPOOL_CHARSET
+
+# Phrase cache + warm-up (pre-synthesis after voice/format changes)
+from TTS.phrase_cache import PhraseCache
+from TTS.warmup import WarmupJob
+from TTS.time_stretch import MAX_RATIO
+from TTS.resampler import rate_from_format
+from TTS.tts_router import TTSRouter
 
 # Import voice modules (loaded on demand)
 voice_config_loaded = False
-tts_provider = None
+tts_provider = None  # TTSRouter around the configured provider (hedging/failover)
 tts_processor = None
-tts_queue = queue.Queue()
 hangup_queue = queue.Queue()
 response_stats = {}
 voice_config = None
+phrase_cache = None
+warmup_job = None
 
-# SMS queuing system for async processing
+# SMS queuing system for async processing (message ids; parts are persisted in the outbox)
 sms_queue = queue.Queue()
 sms_processor = None
+sms_outbox = None
+spool_watcher = None
+
+# HTTP server: per-route-class concurrency limits (voice never waits behind SMS)
+KEEPALIVE_TIMEOUT = 30          # Seconds an idle keep-alive connection keeps its thread
+SLOW_VOICE_REQUEST_MS = 500     # Voice requests slower than this are logged as warnings
+ROUTE_CLASSES = {
+    '/phone_call': 'voice',
+    '/phone_call/status': 'voice',
+    '/tts/warmup': 'voice',
+    '/send': 'sms',
+    '/send_sms': 'sms',
+    '/pi_send_message': 'sms',
+    '/sms/queue': 'sms',
+}
 
 # Set up logging (writes to RAM disk)
 from logging.handlers import RotatingFileHandler
@@ -123,7 +151,7 @@ def send_via_droidlink(droid_link, phone_nr, message):
         return False, str(e)
 
 
-def split_sms_intelligently(message, max_length=70):
+def split_sms_intelligently(message, max_length=70, cost=None):
     """
     Split SMS message intelligently at natural boundaries
 
@@ -144,13 +172,18 @@ def split_sms_intelligently(message, max_length=70):
     Step 3: If not found, look backwards from chr 70 to chr 15 for space
     Step 4: If nothing found, hard split at max_length
 
+    With a cost function the budget is counted in encoding units instead of
+    characters (gsm7.septet_cost: extension characters such as '€' take 2 of
+    the 160 septets), so a part is as full as the encoding allows.
+
     Args:
         message: Text to split
-        max_length: Max characters per part (default 70 for UCS2)
+        max_length: Max characters (or cost units) per part (default 70 for UCS2)
+        cost: Optional per-character cost (gsm7.septet_cost / gsm7.ucs2_cost)
     Returns:
         List of message parts
     """
-    if len(message) <= max_length:
+    if _units(message, cost) <= max_length:
         return [message]
 
     # Step 0: PRIORITY SPLIT on '?', '\n', '\r', ' 1.', ' 2.', etc. anywhere in message
@@ -191,17 +224,34 @@ def split_sms_intelligently(message, max_length=70):
     # Now apply length-based splitting (Steps 1-4) to each chunk
     final_parts = []
     for chunk in initial_parts:
-        final_parts.extend(_split_by_length(chunk.strip(), max_length))
+        final_parts.extend(_split_by_length(chunk.strip(), max_length, cost))
 
     return final_parts
 
 
-def _split_by_length(text, max_length):
+def _units(text, cost):
+    """Length of text in characters, or in cost units"""
+    return len(text) if cost is None else sum(cost(char) for char in text)
+
+
+def _fitting_length(text, max_length, cost):
+    """Number of leading characters of text that fit in max_length units"""
+    if cost is None:
+        return min(len(text), max_length)
+    used = 0
+    for i, char in enumerate(text):
+        used += cost(char)
+        if used > max_length:
+            return i
+    return len(text)
+
+
+def _split_by_length(text, max_length, cost=None):
     """
     Split text by length at intelligent boundaries (Steps 1-4)
     Helper function for split_sms_intelligently
     """
-    if len(text) <= max_length:
+    if _units(text, cost) <= max_length:
         return [text]
 
     parts = []
@@ -209,11 +259,11 @@ def _split_by_length(text, max_length):
     min_search_pos = 15  # Don't split too early
 
     while remaining:
-        if len(remaining) <= max_length:
+        if _units(remaining, cost) <= max_length:
             parts.append(remaining)
             break
 
-        chunk = remaining[:max_length]
+        chunk = remaining[:_fitting_length(remaining, max_length, cost)]
         split_pos = -1
 
         # Step 1: Look backwards for punctuation (., !, ;)
@@ -244,7 +294,7 @@ def _split_by_length(text, max_length):
 
         # Step 4: Hard split at max_length
         if split_pos == -1:
-            split_pos = max_length
+            split_pos = len(chunk)
 
         parts.append(remaining[:split_pos].rstrip())
         remaining = remaining[split_pos:].lstrip()
@@ -253,7 +303,7 @@ def _split_by_length(text, max_length):
 
 def load_voice_config():
     """Load voice configuration for phone call handling"""
-    global voice_config_loaded, tts_provider, voice_config
+    global voice_config_loaded, tts_provider, voice_config, phrase_cache
 
     try:
         # Load config with API key
@@ -272,7 +322,18 @@ def load_voice_config():
         from voice_config_manager import VoiceConfigManager
         manager = VoiceConfigManager()
         manager.config = voice_config
-        tts_provider = manager.get_tts_provider()
+        primary_provider = manager.get_tts_provider()
+        tts_provider = None
+
+        if primary_provider and voice_config.get('tts_hedging', True):
+            # Slow/failed primary: cached rendering or local provider, whichever starts first
+            if phrase_cache is None:
+                phrase_cache = PhraseCache()
+            tts_provider = TTSRouter(voice_config, primary_provider,
+                                     secondary=manager.get_fallback_tts_provider(),
+                                     phrase_cache=phrase_cache)
+        else:
+            tts_provider = primary_provider
 
         if tts_provider:
             voice_config_loaded = True
@@ -287,156 +348,468 @@ def load_voice_config():
         return False
 
 class SMSProcessor(threading.Thread):
-    """Background thread for async processing of SMS messages"""
+    """
+    Background thread spooling queued SMS parts to SMSTools3
+
+    Message ids arrive on sms_queue, their parts come from the outbox; the
+    SMSScheduler decides the order so parts of one recipient keep their spacing
+    while other recipients' parts go in between.
+    """
 
-    def __init__(self):
+    def __init__(self, outbox):
         super().__init__(daemon=True)
         self.running = True
+        self.outbox = outbox
+        self.scheduler = SMSScheduler()
+
+        # Restart: parts smsd already holds count against the spool depth, queued parts are scheduled again
+        outbox.recover()
+        self.scheduler.track(outbox.in_flight_files())
+        pending = outbox.scheduler_parts()
+        if pending:
+            self.scheduler.add(pending)
+            logger.info(f"📮 Resuming {len(pending)} queued SMS parts from the outbox")
 
     def run(self):
-        """Process SMS queue with delays between parts"""
+        """Move requests into the scheduler, spool parts as they become due"""
         logger.info("SMS processor thread started")
+        wait = 1.0
 
         while self.running:
             try:
-                # Get request with timeout
-                request = sms_queue.get(timeout=1)
-
-                recipient = request['recipient']
-                message_parts = request['message_parts']
-                needs_unicode = request['needs_unicode']
-                timestamp = request['timestamp']
-                pid = request['pid']
-
-                logger.info(f"Processing {len(message_parts)} SMS parts for {recipient}")
-
-                files_created = []
-
-                for part_num, part_text in enumerate(message_parts, 1):
-                    # Create filename with part number if multipart
-                    if len(message_parts) > 1:
-                        filename = f"/var/spool/sms/outgoing/api_{timestamp}_{pid}_part{part_num}"
-                    else:
-                        filename = f"/var/spool/sms/outgoing/api_{timestamp}_{pid}"
-
-                    if needs_unicode:
-                        # Write with binary UTF-16-BE for Unicode
-                        with open(filename, 'wb') as f:
-                            f.write(f"To: {recipient}\n".encode('ascii'))
-                            f.write(b"Alphabet: UCS2\n\n")
-                            f.write(part_text.encode('utf-16-be'))
-                    else:
-                        # ASCII only - use text mode
-                        with open(filename, 'w') as f:
-                            f.write(f"To: {recipient}\n\n{part_text}")
-
-                    os.chmod(filename, 0o666)
-                    files_created.append(filename)
-
-                    # Save message to cache file for sms_watch.sh to display
-                    cache_dir = "/tmp/sms_msg_cache"
-                    os.makedirs(cache_dir, exist_ok=True)
-                    cache_filename = os.path.basename(filename) + ".txt"
-                    cache_path = os.path.join(cache_dir, cache_filename)
-                    with open(cache_path, 'w', encoding='utf-8') as f:
-                        f.write(part_text)
-                    os.chmod(cache_path, 0o666)
-
-                    # Log more chars (100) so each part shows unique content in monitoring
-                    logger.info(f"SMS queued: {recipient} - Part {part_num}/{len(message_parts)} - {part_text[:100]} (Unicode: {needs_unicode})")
-
-                    # Add 1.5-second delay between parts (except after last part)
-                    if part_num < len(message_parts):
-                        time.sleep(1.5)
-
-                logger.info(f"SMS processing complete for {recipient}: {len(files_created)} files created")
-
-            except queue.Empty:
-                continue
+                # Sleep until the next part is due or a new request arrives
+                try:
+                    self.accept(sms_queue.get(timeout=max(0.05, min(wait, 1.0))))
+                    while True:
+                        self.accept(sms_queue.get_nowait())
+                except queue.Empty:
+                    pass
+
+                part, wait = self.scheduler.next_part()
+                while part is not None:
+                    self.spool(part)
+                    part, wait = self.scheduler.next_part()
+
             except Exception as e:
                 logger.error(f"Error in SMS processing: {e}")
+                wait = 1.0
+
+    def accept(self, request):
+        """Schedule the queued parts of a new outbox message"""
+        parts = self.outbox.scheduler_parts(request['message_id'])
+        self.scheduler.add(parts)
+        if parts:
+            logger.info(f"Scheduled {len(parts)} SMS parts for {parts[0]['recipient']}")
+
+    def spool(self, part):
+        """Write one part to the smsd outgoing spool"""
+        recipient = part['recipient']
+        part_text = part['text']
+        needs_unicode = part['needs_unicode']
+        filename = part['filename']
+
+        if needs_unicode:
+            # Write with binary UTF-16-BE for Unicode
+            with open(filename, 'wb') as f:
+                f.write(f"To: {recipient}\n".encode('ascii'))
+                f.write(b"Alphabet: UCS2\n\n")
+                f.write(part_text.encode('utf-16-be'))
+        else:
+            # GSM-7 - text mode in ISO-8859-15, smsd (cs_convert) maps it to the GSM alphabet
+            with open(filename, 'w', encoding=SPOOL_CHARSET) as f:
+                f.write(f"To: {recipient}\n\n{part_text}")
+
+        os.chmod(filename, 0o666)
+        self.scheduler.spooled(part, filename)
+        self.outbox.mark_spooled(filename)
+
+        # Save message to cache file for sms_watch.sh to display
+        cache_dir = "/tmp/sms_msg_cache"
+        os.makedirs(cache_dir, exist_ok=True)
+        cache_filename = os.path.basename(filename) + ".txt"
+        cache_path = os.path.join(cache_dir, cache_filename)
+        with open(cache_path, 'w', encoding='utf-8') as f:
+            f.write(part_text)
+        os.chmod(cache_path, 0o666)
+
+        # Log more chars (100) so each part shows unique content in monitoring
+        waited = time.time() - part['enqueued_at']
+        logger.info(f"SMS queued: {recipient} - Part {part['part_num']}/{part['total_parts']} - {part_text[:100]} "
+                    f"(Unicode: {needs_unicode}, waited {waited:.1f}s)")
+
+    def get_stats(self):
+        """Scheduler queue/spool depth and wait times (+ requests not yet split)"""
+        stats = self.scheduler.get_stats()
+        stats['unscheduled_requests'] = sms_queue.qsize()
+        return stats
 
     def stop(self):
         """Stop processor thread"""
         self.running = False
 
-class TTSProcessor(threading.Thread):
-    """Background thread for processing TTS requests"""
+class TTSPipeline:
+    """
+    Ordered TTS pipeline for one call
 
-    def __init__(self, tts_provider):
-        super().__init__(daemon=True)
-        self.tts_provider = tts_provider
-        self.running = True
+    Tokens of a response are synthesized concurrently but delivered strictly
+    in token (arrival) order. A high-priority request from a NEW response
+    cancels the undelivered tokens of previous responses; tokens of the same
+    response never preempt each other.
+    """
 
-    def run(self):
-        """Process TTS queue"""
-        logger.info("TTS processor thread started")
+    def __init__(self, call_id, processor):
+        self.call_id = call_id
+        self.processor = processor
+        self.lock = threading.Lock()
+
+        # Sequence numbers: assigned on arrival, delivered in order
+        self.next_seq = 0
+        self.next_delivery = 0
+        self.entries = {}  # seq -> {'request', 'response_id', 'state', 'audio'}
+
+        self.current_response = None
+        self.last_activity = time.time()
+
+    def submit(self, request):
+        """Queue a speak request (returns sequence number)"""
+        with self.lock:
+            seq = self.next_seq
+            self.next_seq += 1
+
+            # Legacy callers without responseId: every request is its own response
+            response_id = request.get('response_id') or f"single_{seq}"
+
+            # Priority preempts a PREVIOUS response only, never siblings
+            if request.get('priority') == 'high' and response_id != self.current_response:
+                cancelled = 0
+                for entry in self.entries.values():
+                    if entry['response_id'] != response_id and entry['state'] != 'cancelled':
+                        entry['state'] = 'cancelled'
+                        entry['audio'] = None
+                        cancelled += 1
+                if cancelled:
+                    logger.info(f"TTS pipeline {self.call_id}: response {response_id} preempted {cancelled} pending tokens")
+                self._deliver_ready()
+
+            self.current_response = response_id
+            self.entries[seq] = {
+                'request': request,
+                'response_id': response_id,
+                'state': 'pending',
+                'audio': None
+            }
+            self.last_activity = time.time()
 
-        while self.running:
+        if request.get('audio_file'):
+            # Pre-rendered audio (bot cache hit) - only needs its slot in the order
+            audio = None
             try:
-                # Get request with timeout
-                request = tts_queue.get(timeout=1)
-
-                call_id = request['call_id']
-                text = request['text']
-                language = request.get('language')
-
-                # Update language if needed
+                with open(request['audio_file'], 'rb') as f:
+                    audio = f.read()
+            except Exception as e:
+                logger.error(f"Failed to read cached audio {request['audio_file']}: {e}")
+            self._complete(seq, audio)
+        else:
+            self.processor.executor.submit(self._synthesize, seq)
+
+        return seq
+
+    def pending_count(self):
+        """Requests not yet delivered"""
+        with self.lock:
+            return sum(1 for entry in self.entries.values() if entry['state'] != 'cancelled')
+
+    def _synthesize(self, seq):
+        """Worker: synthesize one token (skipped if cancelled meanwhile)"""
+        with self.lock:
+            entry = self.entries.get(seq)
+            if not entry or entry['state'] == 'cancelled':
+                return
+            request = entry['request']
+
+        audio = self.processor.synthesize(request)
+        self._complete(seq, audio)
+
+    def _complete(self, seq, audio):
+        """Store result and deliver everything that is now in order"""
+        with self.lock:
+            entry = self.entries.get(seq)
+            if entry and entry['state'] == 'pending':
+                entry['state'] = 'done'
+                entry['audio'] = audio
+            self._deliver_ready()
+
+    def _deliver_ready(self):
+        """Write finished tokens to /tmp in sequence order (caller holds lock)"""
+        while self.next_delivery in self.entries:
+            entry = self.entries[self.next_delivery]
+            if entry['state'] == 'pending':
+                break  # Earlier token still synthesizing - keep order
+
+            if entry['state'] == 'done' and entry['audio']:
+                self._write(self.next_delivery, entry)
+
+            del self.entries[self.next_delivery]
+            self.next_delivery += 1
+
+    def _write(self, seq, entry):
+        """Atomically publish audio for the voice bot playback thread"""
+        request = entry['request']
+        audio_bytes = entry['audio']
+
+        # Name sorts by time then sequence; request id lets the bot match its metadata
+        suffix = f"-{request['request_id']}" if request.get('request_id') else ''
+        if request.get('tts_source', 'primary') != 'primary':
+            suffix += f".{request['tts_source']}"  # Hedged/failover audio - bot plays it but doesn't cache it
+        tts_file = f"/tmp/tts_{self.call_id}_{int(time.time()*1000)}_{seq:05d}{suffix}.raw"
+        tmp_file = tts_file + '.tmp'  # Not matched by the bot's *.raw glob until renamed
+
+        with open(tmp_file, 'wb') as f:
+            f.write(audio_bytes)
+        os.rename(tmp_file, tts_file)
+
+        logger.info(f"TTS audio saved to {tts_file} for playback ({len(audio_bytes)} bytes, token {request.get('token_index')})")
+
+
+class TTSProcessor:
+    """Per-call ordered TTS pipelines sharing one synthesis worker pool"""
+
+    def __init__(self, tts_provider, max_workers=3):
+        self.tts_provider = tts_provider
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='tts')
+        self.pipelines = {}
+        self.lock = threading.Lock()
+
+        # Providers sharing one stream/queue internally must not synthesize concurrently
+        self.concurrent = getattr(tts_provider, 'supports_concurrent_synthesis', False)
+        self.provider_lock = threading.Lock()
+        # Concurrent providers: language is one shared attribute - switched only while nothing synthesizes
+        self.language_changed = threading.Condition()
+        self.synthesizing = 0
+
+        logger.info(f"TTS processor started: {max_workers} workers "
+                    f"({'concurrent' if self.concurrent else 'serialized'} synthesis)")
+
+    def submit(self, request):
+        """Route a speak request to its call's pipeline"""
+        with self.lock:
+            self._prune()
+            pipeline = self.pipelines.get(request['call_id'])
+            if pipeline is None:
+                pipeline = TTSPipeline(request['call_id'], self)
+                self.pipelines[request['call_id']] = pipeline
+        return pipeline.submit(request)
+
+    def queue_size(self):
+        """Total undelivered requests over all calls"""
+        with self.lock:
+            pipelines = list(self.pipelines.values())
+        return sum(p.pending_count() for p in pipelines)
+
+    def _prune(self, idle_seconds=300):
+        """Forget pipelines of calls that went quiet (caller holds lock)"""
+        now = time.time()
+        for call_id in [c for c, p in self.pipelines.items()
+                        if now - p.last_activity > idle_seconds and not p.pending_count()]:
+            del self.pipelines[call_id]
+
+    def set_provider(self, tts_provider):
+        """Swap the TTS provider after a config reload"""
+        with self.provider_lock:
+            self.tts_provider = tts_provider
+            self.concurrent = getattr(tts_provider, 'supports_concurrent_synthesis', False)
+
+    @contextlib.contextmanager
+    def synthesis_slot(self, language):
+        """
+        Hold the provider for one synthesis in language
+
+        Serialized providers: provider_lock. Concurrent providers: syntheses in the
+        same language run side by side, a different language waits until they are
+        done - another call's language never changes under a running request.
+        """
+        if not self.concurrent:
+            with self.provider_lock:
                 if language and language != self.tts_provider.language:
                     self.tts_provider.language = language
+                yield
+            return
+
+        with self.language_changed:
+            while language and language != self.tts_provider.language and self.synthesizing:
+                self.language_changed.wait()
+            if language and language != self.tts_provider.language:
+                self.tts_provider.language = language
+            self.synthesizing += 1
+        try:
+            yield
+        finally:
+            with self.language_changed:
+                self.synthesizing -= 1
+                self.language_changed.notify_all()
+
+    def synthesize(self, request):
+        """Synthesize one token to int16 PCM bytes (None on failure), sets request['tts_source']"""
+        call_id = request['call_id']
+        text = request['text']
+        language = request.get('language')
 
+        try:
+            with self.synthesis_slot(language):
                 logger.info(f"Processing TTS for call {call_id}: {text[:50]}...")
 
                 # Stream synthesis
                 start_time = time.time()
-                chunk_count = 0
-                audio_chunks = []
-                for audio_chunk in self.tts_provider.synthesize_stream(text):
-                    audio_chunks.append(audio_chunk)
-                    chunk_count += 1
-
-                total_time = time.time() - start_time
-                logger.info(f"TTS complete: {chunk_count} chunks in {total_time:.2f}s")
-
-                # Save audio to file for voice bot to play
-                if audio_chunks:
-                    # Convert float32 numpy arrays to int16 PCM
-                    audio_float32 = np.concatenate(audio_chunks)  # Combine all chunks
-                    audio_int16 = (audio_float32 * 32767).astype(np.int16)  # Convert to int16
-                    audio_bytes = audio_int16.tobytes()  # Convert to bytes
-
-                    tts_file = f"/tmp/tts_{call_id}_{int(time.time()*1000)}.raw"
-                    with open(tts_file, 'wb') as f:
-                        f.write(audio_bytes)
-                    logger.info(f"TTS audio saved to {tts_file} for playback ({len(audio_bytes)} bytes)")
-
-                # Update stats
-                if call_id in response_stats:
-                    response_stats[call_id]['last_tts_time'] = total_time
-
-            except queue.Empty:
-                continue
-            except Exception as e:
-                logger.error(f"Error in TTS processing: {e}")
+                audio_chunks = list(self.tts_provider.synthesize_stream_pcm(text))
+
+                # Router: which source won (non-primary audio must not be cached under the primary voice)
+                request['tts_source'] = (self.tts_provider.current_source()
+                                         if hasattr(self.tts_provider, 'current_source') else 'primary')
+
+            total_time = time.time() - start_time
+            logger.info(f"TTS complete: {len(audio_chunks)} chunks in {total_time:.2f}s")
+
+            # Update stats
+            if call_id in response_stats:
+                response_stats[call_id]['last_tts_time'] = total_time
+
+            if not audio_chunks:
+                return None
+
+            # Providers already deliver int16 PCM at the modem rate
+            return b''.join(audio_chunks)
+
+        except Exception as e:
+            logger.error(f"Error in TTS processing: {e}")
+            return None
 
     def stop(self):
-        """Stop processor thread"""
-        self.running = False
+        """Stop worker pool"""
+        self.executor.shutdown(wait=False)
+
+class RouteLimiter:
+    """Concurrency limit of one route class (requests over the limit wait up to max_wait, then get 503)"""
+
+    def __init__(self, name, limit, max_wait):
+        self.name = name
+        self.limit = limit
+        self.max_wait = max_wait
+        self.semaphore = threading.BoundedSemaphore(limit)
+        self.lock = threading.Lock()
+        self.active = 0
+        self.served = 0
+        self.rejected = 0
+
+    def acquire(self):
+        """Take a slot (False if none freed up within max_wait)"""
+        if not self.semaphore.acquire(timeout=self.max_wait):
+            with self.lock:
+                self.rejected += 1
+            return False
+        with self.lock:
+            self.active += 1
+        return True
+
+    def release(self):
+        with self.lock:
+            self.active -= 1
+            self.served += 1
+        self.semaphore.release()
+
+    def get_stats(self):
+        with self.lock:
+            return {'limit': self.limit, 'active': self.active, 'served': self.served, 'rejected': self.rejected}
+
+
+# Voice: bot token stream + status polling, generous. SMS: DroidLink forwards can hold a slot for 30s.
+route_limiters = {
+    'voice': RouteLimiter('voice', limit=32, max_wait=1.0),
+    'sms': RouteLimiter('sms', limit=4, max_wait=10.0),
+}
+
+
+class UnifiedAPIServer(ThreadingHTTPServer):
+    """One daemon thread per connection"""
+    daemon_threads = True
+    request_queue_size = 64  # Accept backlog (default 5 drops bursts of bot connections)
+
+    def handle_error(self, request, client_address):
+        # Clients dropping keep-alive connections is normal, not worth a traceback
+        if isinstance(sys.exc_info()[1], ConnectionError):
+            return
+        super().handle_error(request, client_address)
+
 
 class SMSHandler(BaseHTTPRequestHandler):
+    # Keep-alive: the bot sends every TTS token over one connection (no TCP setup per token)
+    protocol_version = 'HTTP/1.1'
+    timeout = KEEPALIVE_TIMEOUT  # Idle connections release their thread
+    disable_nagle_algorithm = True  # Headers and body go out as separate writes - no 40ms delayed-ACK stall
+
     def do_POST(self):
+        self.dispatch(self.route_post)
+
+    def do_GET(self):
+        self.dispatch(self.route_get)
+
+    def dispatch(self, route):
+        """
+        Run a route under its class's concurrency limit and log its timing
+
+        The request body is always read first, so a rejected or failed request
+        never leaves unread bytes on a keep-alive connection.
+        """
+        start_time = time.time()
+        self.response_status = None
+        content_length = int(self.headers.get('Content-Length') or 0)
+        self.body = self.rfile.read(content_length) if content_length else b''
+
+        path = self.path.split('?')[0]
+        route_class = ROUTE_CLASSES.get(path, 'sms' if path.startswith('/sms/') else 'other')
+        limiter = route_limiters.get(route_class)
+
+        if limiter and not limiter.acquire():
+            logger.warning(f"🚦 {route_class} routes at limit ({limiter.limit}) - rejecting {self.command} {self.path}")
+            self._send_json(503, {
+                'success': False,
+                'error': f'Too many concurrent {route_class} requests'
+            }, headers={'Retry-After': '1'})
+        else:
+            try:
+                route()
+            finally:
+                if limiter:
+                    limiter.release()
+
+        elapsed_ms = (time.time() - start_time) * 1000
+        log = logger.warning if route_class == 'voice' and elapsed_ms > SLOW_VOICE_REQUEST_MS else logger.info
+        log(f"⏱️ {self.client_address[0]} {self.command} {self.path} -> {self.response_status} "
+            f"in {elapsed_ms:.0f}ms [{route_class}]")
+
+    def _send_json(self, status, payload, indent=None, headers=None):
+        """Send a JSON response (always with Content-Length - required for keep-alive)"""
+        body = json.dumps(payload, indent=indent).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def route_post(self):
         if self.path == '/phone_call':
             # Handle phone call TTS commands
             self.handle_phone_call()
+        elif self.path == '/tts/warmup':
+            # Pre-synthesize missing phrases for the active voice (background)
+            self.handle_tts_warmup()
         elif self.path == '/phone_call/status':
             # Handle status request for phone calls
             self.handle_phone_status()
         elif self.path == '/send' or self.path == '/send_sms' or self.path == '/pi_send_message':
-            content_length = int(self.headers['Content-Length'])
-            post_data = self.rfile.read(content_length)
-
             try:
-                data = json.loads(post_data.decode('utf-8'))
+                data = json.loads(self.body.decode('utf-8'))
                 recipient = data.get('to', '')  # Keep the + prefix for all numbers (portable across countries)
                 message = data.get('message', '')
                 droid_link_raw = data.get('droidLink') or data.get('droid_link', '')  # MacroDroid webhook URL
@@ -453,13 +826,10 @@ class SMSHandler(BaseHTTPRequestHandler):
                         logger.info(f"Phone normalized: {original_recipient} → {recipient} (using {default_cc})")
 
                 if not recipient or not message:
-                    self.send_response(400)
-                    self.send_header('Content-Type', 'application/json')
-                    self.end_headers()
-                    self.wfile.write(json.dumps({
+                    self._send_json(400, {
                         'success': False,
                         'error': 'Missing recipient or message'
-                    }).encode())
+                    })
                     return
 
                 # Check if DroidLink is specified - route via MacroDroid
@@ -468,92 +838,92 @@ class SMSHandler(BaseHTTPRequestHandler):
                     # Send raw message (before tokenization) via DroidLink
                     success, response = send_via_droidlink(droid_link, recipient, message)
 
-                    self.send_response(200 if success else 502)
-                    self.send_header('Content-Type', 'application/json')
-                    self.end_headers()
-                    self.wfile.write(json.dumps({
+                    self._send_json(200 if success else 502, {
                         'success': success,
                         'method': 'droidlink',
                         'recipient': recipient,
                         'response': response[:200] if response else '',
                         'message_length': len(message)
-                    }).encode())
+                    })
                     return
 
                 # Traditional smstools path (no droid_link)
-                # Check if Unicode is needed
-                needs_unicode = False
-                try:
-                    message.encode('ascii')
-                except UnicodeEncodeError:
-                    needs_unicode = True
-
-                # Smart split for long messages (70 chars for UCS2, 160 for GSM7)
+                # Opt-in: ro/lt diacritics -> GSM-7 base letters (true or a list of languages)
+                transliterate_languages = data.get('transliterate')
+                if transliterate_languages:
+                    if transliterate_languages is True:
+                        transliterate_languages = tuple(TRANSLITERATIONS)
+                    elif isinstance(transliterate_languages, str):
+                        transliterate_languages = (transliterate_languages,)
+                    message = transliterate(message, transliterate_languages)
+
+                # Cheapest encoding: GSM-7 (incl. extension table, e.g. '€') unless a character needs UCS-2
+                # (the spool goes through smsd's ISO-8859-15 conversion, direct PDUs take the full alphabet)
+                encoding, cost, max_length = choose_encoding(
+                    message, charset=None if SMS_TRANSPORT == 'direct' else SPOOL_CHARSET)
+                needs_unicode = encoding == 'UCS2'
+
+                # Smart split for long messages (70 UTF-16 units for UCS2, 160 septets for GSM7)
                 # SIM7600G-H modem cannot handle UCS-2 multipart - split at API level
-                max_length = 70 if needs_unicode else 160
-                message_parts = split_sms_intelligently(message, max_length)
-
-                # Generate timestamp and file identifiers
-                timestamp = int(time.time() * 1000)
-                pid = os.getpid()
-
-                # Queue SMS for async processing (instant response!)
-                sms_request = {
-                    'recipient': recipient,
-                    'message_parts': message_parts,
-                    'needs_unicode': needs_unicode,
-                    'timestamp': timestamp,
-                    'pid': pid
-                }
-                sms_queue.put(sms_request)
-
-                logger.info(f"SMS request queued: {recipient} - {len(message_parts)} parts - will process asynchronously")
+                message_parts = split_sms_intelligently(message, max_length, cost)
+
+                # Record in the outbox first (survives restarts, retries of the same key are not resent)
+                idempotency_key = (data.get('idempotencyKey') or data.get('idempotency_key')
+                                   or self.headers.get('Idempotency-Key'))
+                # Opt-in content dedup for keyless clients: true = DEDUP_WINDOW, a number = seconds
+                dedupe = data.get('dedupe')
+                dedup_window = DEDUP_WINDOW if dedupe is True else (dedupe if isinstance(dedupe, (int, float)) else 0)
+                sms_message, created = sms_outbox.enqueue(recipient, message_parts, needs_unicode,
+                                                          text=message, idempotency_key=idempotency_key,
+                                                          encoding=encoding, dedup_window=dedup_window)
+
+                if created:
+                    # Queue SMS for async processing (instant response!) - SMSProcessor schedules the parts
+                    # (SMS_TRANSPORT=direct: the voice bot picks the parts up from the outbox instead)
+                    if sms_processor:
+                        sms_queue.put({'message_id': sms_message['id']})
+                    logger.info(f"SMS request queued: {recipient} - {len(message_parts)} parts - "
+                                f"message {sms_message['id']} - will process asynchronously")
+                else:
+                    logger.info(f"SMS request is a retry of message {sms_message['id']} ({sms_message['state']}) - not resent")
 
                 # Respond immediately without waiting for file creation
-                self.send_response(200)
-                self.send_header('Content-Type', 'application/json')
-                self.end_headers()
-                self.wfile.write(json.dumps({
+                self._send_json(200, {
                     'success': True,
-                    'message_id': timestamp,
-                    'encoding': 'UCS2' if needs_unicode else 'GSM7',
-                    'parts': len(message_parts),
-                    'queued': True,
+                    'message_id': sms_message['id'],
+                    'status_url': f"/sms/{sms_message['id']}",
+                    'state': sms_message['state'],
+                    'status': 'queued' if created else 'duplicate',
+                    'duplicate': not created,
+                    'encoding': sms_message['encoding'],
+                    'parts': len(sms_message['parts']),
+                    'queued': created,
                     'processing': 'async'
-                }).encode())
+                })
                 
             except Exception as e:
                 logger.error(f"Error processing SMS: {e}")
-                self.send_response(500)
-                self.send_header('Content-Type', 'application/json')
-                self.end_headers()
-                self.wfile.write(json.dumps({
+                self._send_json(500, {
                     'success': False,
                     'error': str(e)
-                }).encode())
+                })
         else:
-            self.send_response(404)
-            self.end_headers()
+            self._send_json(404, {'success': False, 'error': 'Not found'})
 
     def handle_phone_call(self):
         """Process phone call TTS command from VPS"""
         # Config is loaded at startup, just verify it's available
         if not voice_config_loaded:
             logger.error("Voice config not loaded - cannot handle phone call")
-            self.send_response(503)
-            self.send_header('Content-Type', 'application/json')
-            self.end_headers()
-            self.wfile.write(json.dumps({
+            self._send_json(503, {
                 'success': False,
                 'error': 'Voice configuration not available'
-            }).encode())
+            })
             return
 
         try:
-            # Read request data
-            content_length = int(self.headers['Content-Length'])
-            post_data = self.rfile.read(content_length)
-            data = json.loads(post_data.decode('utf-8'))
+            # Request data (read by dispatch)
+            data = json.loads(self.body.decode('utf-8'))
 
             # Extract fields
             call_id = data.get('callId')
@@ -580,7 +950,7 @@ class SMSHandler(BaseHTTPRequestHandler):
 
             # Process based on action
             if action == 'speak':
-                # Queue TTS request
+                # Queue TTS request (ordered per call; responseId groups tokens of one response)
                 tts_request = {
                     'call_id': call_id,
                     'session_id': session_id,
@@ -588,20 +958,15 @@ class SMSHandler(BaseHTTPRequestHandler):
                     'language': language,
                     'voice_settings': voice_settings,
                     'priority': priority,
+                    'response_id': data.get('responseId'),
+                    'token_index': data.get('tokenIndex'),
+                    'request_id': data.get('requestId'),
+                    'audio_file': data.get('audio_file'),
                     'timestamp': time.time()
                 }
 
-                # Priority queue handling
-                if priority == 'high':
-                    # Clear queue for high priority
-                    while not tts_queue.empty():
-                        try:
-                            tts_queue.get_nowait()
-                        except:
-                            break
-
-                tts_queue.put(tts_request)
-                logger.info(f"Queued TTS for call {call_id}")
+                tts_processor.submit(tts_request)
+                logger.info(f"Queued TTS for call {call_id} (response {tts_request['response_id']}, token {tts_request['token_index']})")
 
             elif action == 'hangup':
                 # Signal to hang up call
@@ -612,72 +977,161 @@ class SMSHandler(BaseHTTPRequestHandler):
                 logger.info(f"Queued hangup for call {call_id}")
 
             # Send success response
-            self.send_response(200)
-            self.send_header('Content-Type', 'application/json')
-            self.end_headers()
-            self.wfile.write(json.dumps({
+            self._send_json(200, {
                 'success': True,
                 'message': f'Command {action} queued',
                 'call_id': call_id,
-                'queue_size': tts_queue.qsize()
-            }).encode())
+                'queue_size': tts_processor.queue_size()
+            })
 
         except json.JSONDecodeError as e:
             logger.error(f"Invalid JSON: {e}")
-            self.send_response(400)
-            self.send_header('Content-Type', 'application/json')
-            self.end_headers()
-            self.wfile.write(json.dumps({
+            self._send_json(400, {
                 'success': False,
                 'error': 'Invalid JSON format'
-            }).encode())
+            })
 
         except Exception as e:
             logger.error(f"Error processing phone call: {e}")
-            self.send_response(500)
-            self.send_header('Content-Type', 'application/json')
-            self.end_headers()
-            self.wfile.write(json.dumps({
+            self._send_json(500, {
                 'success': False,
                 'error': str(e)
-            }).encode())
+            })
+
+    def handle_tts_warmup(self):
+        """Start a background warm-up job (JSON: phrases, voice, audio_format, speed, pitch, language)"""
+        global warmup_job, phrase_cache
+
+        try:
+            if not voice_config_loaded:
+                raise RuntimeError('Voice configuration not available')
+
+            data = json.loads(self.body.decode('utf-8'))
+            phrases = data.get('phrases', [])
+            voice = data.get('voice')
+            audio_format = data.get('audio_format')
+            language = data.get('language', voice_config.get('language', 'en'))
+            if not phrases or not voice or not audio_format:
+                raise ValueError('phrases, voice and audio_format are required')
+
+            speed = data.get('speed', 1.0)
+            pitch = data.get('pitch', 1)
+
+            def configured_rendering():
+                # What the loaded provider produces (format as its output rate - the bot may name a fallback format)
+                voice_settings = voice_config.get('voice_settings', {})
+                return (voice_settings.get('voice', 'default'), rate_from_format(voice_config.get('audio_format')),
+                        float(voice_settings.get('speed', 1.0)), float(voice_settings.get('pitch', 1)))
+
+            # Bot fetched a new config (voice, format or prosody changed) - synthesize with it, not the startup one
+            requested = (voice, rate_from_format(audio_format), float(speed), float(pitch))
+            if requested != configured_rendering():
+                logger.info(f"Warm-up rendering {requested} differs from loaded {configured_rendering()} - "
+                            f"reloading voice config")
+                if not load_voice_config():
+                    raise RuntimeError('Voice config reload failed')
+                tts_processor.set_provider(tts_provider)
+
+                # Still different: the provider cannot produce this key - caching its audio under it would be wrong
+                if requested != configured_rendering():
+                    self._send_json(409, {
+                        'success': False,
+                        'error': f"Voice config renders {configured_rendering()}, warm-up asked for {requested}"
+                    })
+                    return
+
+            if phrase_cache is None:
+                phrase_cache = PhraseCache()
+            if warmup_job and warmup_job.get_status()['state'] in ('queued', 'running'):
+                warmup_job.cancel()
+
+            def synthesize_primary(text):
+                # Only the configured voice goes into the cache (no hedged/fallback renderings)
+                request = {'call_id': 'warmup', 'text': text, 'language': language}
+                audio = tts_processor.synthesize(request)
+                return audio if request.get('tts_source', 'primary') == 'primary' else None
+
+            warmup_job = WarmupJob(
+                synthesize_primary,
+                phrase_cache, voice, audio_format,
+                speed=speed,
+                pitch=pitch,
+                # Serialized providers share one lock with live calls - keep warm-up to one worker
+                max_workers=2 if tts_processor.concurrent else 1,
+                rate_per_sec=voice_config.get('tts_warmup_rate', 2.0),
+                max_stretch_ratio=voice_config.get('tts_stretch_max_ratio', MAX_RATIO)
+            )
+            warmup_job.start(phrases)
+
+            self._send_json(202, {'success': True, 'warmup': warmup_job.get_status()})
+
+        except Exception as e:
+            logger.error(f"Error starting TTS warm-up: {e}")
+            self._send_json(400 if isinstance(e, (ValueError, KeyError)) else 503, {
+                'success': False,
+                'error': str(e)
+            })
 
     def handle_phone_status(self):
         """Return phone call status information"""
         try:
-            self.send_response(200)
-            self.send_header('Content-Type', 'application/json')
-            self.end_headers()
-
             status = {
-                'tts_queue_size': tts_queue.qsize(),
+                'tts_queue_size': tts_processor.queue_size() if tts_processor else 0,
                 'active_calls': len(response_stats),
                 'tts_provider': voice_config.get('tts_model') if voice_config else 'not_configured',
                 'language': voice_config.get('language') if voice_config else 'not_configured',
                 'voice_configured': voice_config_loaded,
+                'tts_router': tts_provider.get_stats() if isinstance(tts_provider, TTSRouter) else None,
+                'http_routes': {name: limiter.get_stats() for name, limiter in route_limiters.items()},
                 'stats': response_stats
             }
 
-            self.wfile.write(json.dumps(status, indent=2).encode())
+            self._send_json(200, status, indent=2)
 
         except Exception as e:
             logger.error(f"Error getting phone status: {e}")
-            self.send_response(500)
-            self.send_header('Content-Type', 'application/json')
-            self.end_headers()
-            self.wfile.write(json.dumps({
+            self._send_json(500, {
                 'success': False,
                 'error': str(e)
-            }).encode())
+            })
 
-    def do_GET(self):
+    def handle_sms_status(self):
+        """GET /sms/<id> - message and part states"""
+        message_id = self.path.split('?')[0][len('/sms/'):]
+        if not message_id.isdigit():
+            self._send_json(400, {'success': False, 'error': 'Message id must be numeric'})
+            return
+
+        sms_message = sms_outbox.get_message(int(message_id)) if sms_outbox else None
+        if sms_message is None:
+            self._send_json(404, {'success': False, 'error': f'Unknown message {message_id}'})
+        else:
+            self._send_json(200, {'success': True, 'message': sms_message})
+
+    def route_get(self):
         if self.path == '/phone_call/status':
             # Return phone call status
             self.handle_phone_status()
+        elif self.path == '/tts/warmup':
+            # Warm-up job progress
+            self._send_json(200, {'warmup': warmup_job.get_status() if warmup_job else {'state': 'idle'}})
+        elif self.path == '/sms/queue':
+            # SMS scheduler queue depth and wait times
+            self._send_json(200, {
+                'transport': SMS_TRANSPORT,
+                'sms_queue': sms_processor.get_stats() if sms_processor else None,
+                'outbox': sms_outbox.count_by_state() if sms_outbox else None
+            }, indent=2)
+        elif self.path.startswith('/sms/'):
+            # Outbox status of one message
+            self.handle_sms_status()
         else:
-            self.send_response(404)
-            self.end_headers()
-    
+            self._send_json(404, {'success': False, 'error': 'Not found'})
+
+    def log_request(self, code='-', size='-'):
+        # Replaced by the timing line in dispatch
+        self.response_status = code
+
     def log_message(self, format, *args):
         logger.info(f"{self.client_address[0]} - {format % args}")
 
@@ -686,27 +1140,39 @@ if __name__ == '__main__':
     print("Starting Unified Communication API on port 8088")
     print("="*60)
     print("SMS Endpoints:")
-    print("  POST /send - Send SMS (JSON: {to: '+number', message: 'text'})")
+    print("  POST /send - Send SMS (JSON: {to: '+number', message: 'text', transliterate: ['ro', 'lt'], "
+          "idempotencyKey: 'key', dedupe: true})")
     print("  POST /pi_send_message - Send SMS (same as /send)")
+    print("  GET /sms/queue - SMS scheduler queue depth and wait times")
+    print("  GET /sms/<id> - Message and part states (queued/spooled/sent/failed)")
     print("")
     print("Phone Call Endpoints:")
     print("  POST /phone_call - Receive TTS commands from VPS")
     print("  GET /phone_call/status - Get phone call processing status")
+    print("  POST /tts/warmup - Pre-synthesize phrases for the active voice")
+    print("  GET /tts/warmup - Warm-up progress")
     print("")
 
     # Start SMS processor for async message handling
-    logger.info("Starting SMS processor for async message handling...")
-    sms_processor = SMSProcessor()
-    sms_processor.start()
-    logger.info("✅ SMS processor started - messages will be processed asynchronously")
-    print("✅ SMS async processor started")
+    sms_outbox = SMSOutbox()
+    if SMS_TRANSPORT == 'direct':
+        # Voice bot sends outbox parts with AT+CMGS on its AT port (sms_direct.OutboxSender)
+        logger.info("✅ SMS transport: direct - outbox parts are sent by the voice bot, not spooled")
+        print("✅ SMS direct transport (voice bot AT port)")
+    else:
+        logger.info("Starting SMS processor for async message handling...")
+        sms_processor = SMSProcessor(sms_outbox)
+        sms_processor.start()
+        spool_watcher = SpoolWatcher(sms_outbox)
+        spool_watcher.start()
+        logger.info("✅ SMS processor started - messages will be processed asynchronously")
+        print("✅ SMS async processor started")
 
     # Load voice config at startup, not lazily
     logger.info("Loading voice configuration at startup...")
     if load_voice_config():
         # Start TTS processor at startup
-        tts_processor = TTSProcessor(tts_provider)
-        tts_processor.start()
+        tts_processor = TTSProcessor(tts_provider, max_workers=voice_config.get('tts_concurrency', 3))
         logger.info("✅ TTS processor started at startup")
         print("✅ Voice configuration loaded successfully")
     else:
@@ -714,5 +1180,8 @@ if __name__ == '__main__':
 
     print("="*60)
 
-    server = HTTPServer(('0.0.0.0', 8088), SMSHandler)
+    # Thread per connection: a slow /send (DroidLink, up to 30s) never delays /phone_call
+    server = UnifiedAPIServer(('0.0.0.0', 8088), SMSHandler)
+    logger.info(f"✅ HTTP server: threaded, keep-alive, route limits "
+                f"{ {name: limiter.limit for name, limiter in route_limiters.items()} }")
     server.serve_forever()
\ No newline at end of file
@@ -0,0 +1,461 @@
+#!/usr/bin/env python3
+"""
+Audio Pack - Packed, memory-mapped audio library
+
+Thousands of tiny .raw files per voice cost a directory lookup + open/read per
+phrase. A pack stores all of them in one data file per format/voice:
+
+    /home/rom/audio_library/{audio_format}/{voice}/_library.pack   (PCM, concatenated)
+    /home/rom/audio_library/{audio_format}/{voice}/_library.idx    (JSON offset index)
+
+Only the top-level files of a voice dir are packed - the synced library with
+its sanitized names, which is what PhraseCache looks up through the packs.
+Subdirectories belong to other owners and stay plain files: phrases/ is the
+PhraseCache store (its own byte budget and LRU eviction), silence_fills/ is
+read by the FillerScheduler.
+
+Index entries: name (file name in the voice dir) -> [offset, length, size, mtime_ns]
+size/mtime_ns of the source file let the sync step append only new/changed files.
+Removed/replaced entries become dead bytes; the pack is rewritten once they
+exceed 25% of the file.
+
+The .raw files stay in place (rsync needs them to sync incrementally from the
+VPS) - the pack is the read path for the bot.
+
+Usage:
+    python3 -m TTS.audio_pack migrate /home/rom/audio_library    # full rebuild of all packs
+    python3 -m TTS.audio_pack sync /home/rom/audio_library       # incremental (after rsync)
+    python3 -m TTS.audio_pack bench /home/rom/audio_library      # files vs pack lookup
+    python3 -m TTS.audio_pack check                              # self-test in a temp library
+"""
+
+import argparse
+import json
+import logging
+import mmap
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+PACK_NAME = '_library.pack'
+INDEX_NAME = '_library.idx'
+AUDIO_SUFFIXES = ('.raw', '.pcm')
+COMPACT_RATIO = 0.25      # Rewrite pack when dead bytes exceed this share
+RELOAD_INTERVAL = 30      # Seconds between index mtime checks in the bot
+
+
+def scan_audio_files(voice_dir):
+    """Names of the library audio files directly in a voice dir (subdirectories are not packed)"""
+    names = []
+    with os.scandir(voice_dir) as scan:
+        for entry in scan:
+            if (entry.is_file() and entry.name.endswith(AUDIO_SUFFIXES)
+                    and not entry.name.startswith('_library')):
+                names.append(entry.name)
+    return sorted(names)
+
+
+def load_index(voice_dir):
+    """Pack index or None if missing/corrupt"""
+    try:
+        with open(os.path.join(voice_dir, INDEX_NAME), 'r', encoding='utf-8') as f:
+            index = json.load(f)
+        if index.get('version') != 1:
+            return None
+        return index
+    except (OSError, ValueError):
+        return None
+
+
+def write_index(voice_dir, index):
+    """Atomic index replace (readers see old or new, never partial)"""
+    index_path = os.path.join(voice_dir, INDEX_NAME)
+    tmp_path = index_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(index, f, ensure_ascii=False, separators=(',', ':'))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, index_path)
+
+
+def build_pack(voice_dir, incremental=True):
+    """
+    Create or update the pack for one voice dir
+
+    Args:
+        voice_dir: audio_library/{format}/{voice}
+        incremental: Append new/changed files only (False = full rewrite)
+
+    Returns:
+        dict: {'added': int, 'removed': int, 'entries': int, 'pack_bytes': int, 'rewritten': bool}
+    """
+    voice_dir = str(voice_dir)
+    pack_path = os.path.join(voice_dir, PACK_NAME)
+    names = scan_audio_files(voice_dir)
+
+    index = load_index(voice_dir) if incremental else None
+    # Pack and index must agree (e.g. interrupted append) - otherwise rebuild
+    if index and (not os.path.exists(pack_path) or os.path.getsize(pack_path) != index['pack_bytes']):
+        logger.warning(f"Pack/index mismatch in {voice_dir} - rebuilding")
+        index = None
+    # Packs from before subdirectories were skipped hold phrases/ and silence_fills/ - drop them now
+    if index and any('/' in name for name in index['entries']):
+        logger.warning(f"Pack in {voice_dir} contains subdirectory files - rebuilding")
+        index = None
+
+    entries = index['entries'] if index else {}
+    dead_bytes = index['dead_bytes'] if index else 0
+    pack_bytes = index['pack_bytes'] if index else 0
+
+    current = set(names)
+    removed = [name for name in entries if name not in current]
+    for name in removed:
+        dead_bytes += entries.pop(name)[1]
+
+    changed = []
+    for name in names:
+        st = os.stat(os.path.join(voice_dir, name))
+        entry = entries.get(name)
+        if entry and entry[2] == st.st_size and entry[3] == st.st_mtime_ns:
+            continue
+        if entry:
+            dead_bytes += entry[1]
+        changed.append((name, st))
+
+    new_bytes = sum(st.st_size for _, st in changed)
+    rewrite = index is None or dead_bytes > COMPACT_RATIO * (pack_bytes + new_bytes)
+
+    if rewrite:
+        # Full rewrite into a new file - a bot holding the old mmap keeps reading the old inode
+        tmp_pack = pack_path + '.tmp'
+        entries = {}
+        pack_bytes = 0
+        with open(tmp_pack, 'wb') as out:
+            for name in names:
+                pack_bytes = _append_file(out, voice_dir, name, entries, pack_bytes)
+            out.flush()
+            os.fsync(out.fileno())
+        os.replace(tmp_pack, pack_path)
+        dead_bytes = 0
+        added = len(names)
+    else:
+        if not changed and not removed:
+            return {'added': 0, 'removed': 0, 'entries': len(entries), 'pack_bytes': pack_bytes, 'rewritten': False}
+        with open(pack_path, 'ab') as out:
+            for name, _ in changed:
+                pack_bytes = _append_file(out, voice_dir, name, entries, pack_bytes)
+            out.flush()
+            os.fsync(out.fileno())
+        added = len(changed)
+
+    write_index(voice_dir, {
+        'version': 1,
+        'pack_bytes': pack_bytes,
+        'dead_bytes': dead_bytes,
+        'entries': entries
+    })
+
+    return {'added': added, 'removed': len(removed), 'entries': len(entries),
+            'pack_bytes': pack_bytes, 'rewritten': rewrite}
+
+
+def _append_file(out, voice_dir, name, entries, offset):
+    """Copy one file into the pack (2-byte aligned for 16-bit PCM), returns new end offset"""
+    path = os.path.join(voice_dir, name)
+    st = os.stat(path)
+    with open(path, 'rb') as f:
+        data = f.read()
+    out.write(data)
+    entries[name] = [offset, len(data), st.st_size, st.st_mtime_ns]
+    offset += len(data)
+    if offset % 2:
+        out.write(b'\0')
+        offset += 1
+    return offset
+
+
+def voice_dirs(library_dir):
+    """All audio_library/{format}/{voice} dirs"""
+    library = Path(library_dir)
+    if not library.is_dir():
+        return []
+    return sorted(voice for fmt in library.iterdir() if fmt.is_dir()
+                  for voice in fmt.iterdir() if voice.is_dir())
+
+
+class AudioPack:
+    """Read-only mmap view of one voice pack"""
+
+    def __init__(self, voice_dir):
+        self.voice_dir = str(voice_dir)
+        self.entries = {}
+        self.map = None
+        self.index_mtime = None
+        self.load()
+
+    def load(self):
+        """(Re)map pack + index. Old mapping is dropped, not closed - slices may still be in use"""
+        index_path = os.path.join(self.voice_dir, INDEX_NAME)
+        try:
+            index_mtime = os.stat(index_path).st_mtime_ns
+        except OSError:
+            self.entries = {}
+            self.map = None
+            self.index_mtime = None
+            return False
+
+        index = load_index(self.voice_dir)
+        if not index or not index['pack_bytes']:
+            self.entries = {}
+            self.map = None
+            self.index_mtime = index_mtime
+            return False
+
+        try:
+            with open(os.path.join(self.voice_dir, PACK_NAME), 'rb') as f:
+                pack_map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError) as e:
+            logger.error(f"Failed to map audio pack in {self.voice_dir}: {e}")
+            return False
+
+        if len(pack_map) < index['pack_bytes']:
+            logger.error(f"Audio pack in {self.voice_dir} shorter than index - ignoring")
+            return False
+
+        self.map = memoryview(pack_map)
+        self.entries = index['entries']
+        self.index_mtime = index_mtime
+        logger.info(f"📦 Audio pack {self.voice_dir}: {len(self.entries)} phrases, {index['pack_bytes'] / 1024 / 1024:.1f}MB")
+        return True
+
+    def is_stale(self):
+        try:
+            return os.stat(os.path.join(self.voice_dir, INDEX_NAME)).st_mtime_ns != self.index_mtime
+        except OSError:
+            return self.index_mtime is not None
+
+    def get(self, name):
+        """Zero-copy memoryview of a phrase or None"""
+        entry = self.entries.get(name)
+        if entry is None or self.map is None:
+            return None
+        offset, length = entry[0], entry[1]
+        return self.map[offset:offset + length]
+
+    def __contains__(self, name):
+        return name in self.entries
+
+
+class AudioPackSet:
+    """Packs for all voices of an audio library, looked up by file path"""
+
+    def __init__(self, library_dir='/home/rom/audio_library'):
+        self.library_dir = Path(library_dir)
+        self.prefix = str(self.library_dir).rstrip('/') + '/'
+        self.packs = {}  # voice_dir -> AudioPack
+        self.last_check = {}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _split(self, path):
+        """Path -> (voice_dir, relative name) or (None, None) if outside the library"""
+        path = str(path)
+        if not path.startswith(self.prefix):
+            return None, None
+        parts = path[len(self.prefix):].split('/', 2)
+        if len(parts) < 3:
+            return None, None
+        return self.prefix + parts[0] + '/' + parts[1], parts[2]
+
+    def _pack(self, voice_dir):
+        pack = self.packs.get(voice_dir)
+        now = time.time()
+        if pack is not None and now - self.last_check[voice_dir] < RELOAD_INTERVAL:
+            return pack
+
+        with self.lock:
+            pack = self.packs.get(voice_dir)
+            if pack is None:
+                pack = AudioPack(voice_dir)
+                self.packs[voice_dir] = pack
+            elif pack.is_stale():
+                pack.load()
+            self.last_check[voice_dir] = now
+            return pack
+
+    def contains(self, path):
+        voice_dir, name = self._split(path)
+        return voice_dir is not None and name in self._pack(voice_dir)
+
+    def read(self, path):
+        """
+        Phrase audio from the pack
+
+        Args:
+            path: File path inside the audio library (as if the .raw file was read)
+
+        Returns:
+            memoryview or None if not packed
+        """
+        voice_dir, name = self._split(path)
+        if voice_dir is None:
+            return None
+        data = self._pack(voice_dir).get(name)
+        if data is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return data
+
+
+def benchmark(library_dir, samples=2000):
+    """Compare open/read of .raw files with pack lookups on the same phrases"""
+    packs = AudioPackSet(library_dir)
+    targets = []
+    for voice_dir in voice_dirs(library_dir):
+        index = load_index(str(voice_dir))
+        if index:
+            targets.extend(str(voice_dir / name) for name in index['entries'])
+
+    if not targets:
+        print("No packs found - run 'migrate' first")
+        return 1
+
+    picks = [random.choice(targets) for _ in range(samples)]
+    for path in picks[:50]:
+        packs.read(path)  # Map packs before timing
+
+    def run(read):
+        timings = []
+        for path in picks:
+            start = time.perf_counter()
+            read(path)
+            timings.append((time.perf_counter() - start) * 1e6)
+        timings.sort()
+        return timings
+
+    def read_file(path):
+        try:
+            with open(path, 'rb') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    file_timings = run(read_file)
+    view_timings = run(packs.read)
+    copy_timings = run(lambda path: bytes(packs.read(path)))
+
+    def line(label, timings):
+        mean = sum(timings) / len(timings)
+        p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+        return f"   {label:<16} mean {mean:7.1f}µs  p50 {timings[len(timings) // 2]:7.1f}µs  p99 {p99:7.1f}µs"
+
+    print(f"⏱️  {samples} lookups over {len(targets)} packed phrases")
+    print(line("files (open/read)", file_timings))
+    print(line("pack (view)", view_timings))
+    print(line("pack (bytes)", copy_timings))
+    return 0
+
+
+def self_check():
+    """
+    Sync a temp library with a legacy file and PhraseCache entries, evict, sync again
+
+    Returns:
+        bool: True if the pack never holds phrases/ bytes and lookups still work
+    """
+    from TTS.phrase_cache import PhraseCache, legacy_filename
+
+    library = tempfile.mkdtemp(prefix='audio_pack_check_')
+    checks = []
+
+    def check(name, condition):
+        checks.append(condition)
+        print(f"{'✅' if condition else '❌'} {name}")
+
+    try:
+        voice_dir = os.path.join(library, 'slin16', 'ro-RO-AlinaNeural')
+        os.makedirs(os.path.join(voice_dir, 'silence_fills'))
+        legacy_data = b'\x01\x00' * 800
+        with open(os.path.join(voice_dir, legacy_filename('Bună ziua')), 'wb') as f:
+            f.write(legacy_data)
+        with open(os.path.join(voice_dir, 'silence_fills', 'ok.pcm'), 'wb') as f:
+            f.write(b'\x00' * 1600)
+
+        cache = PhraseCache(library, max_bytes=3 * 4000, legacy_fallback=True, packs=AudioPackSet(library))
+        for i in range(3):
+            cache.put(f"Phrase {i}", 'ro-RO-AlinaNeural', 'slin16', b'\x02\x00' * 2000)
+
+        result = build_pack(voice_dir)
+        check(f"first sync packs only the library file ({result['entries']} entries, {result['pack_bytes']} bytes)",
+              result['entries'] == 1 and result['pack_bytes'] == len(legacy_data))
+
+        for i in range(3, 6):
+            cache.put(f"Phrase {i}", 'ro-RO-AlinaNeural', 'slin16', b'\x02\x00' * 2000)
+        check(f"phrase cache evicted over budget ({cache.evictions} entries)", cache.evictions == 3)
+
+        result = build_pack(voice_dir)
+        index = load_index(voice_dir)
+        check("sync after eviction keeps no evicted bytes",
+              result['pack_bytes'] == len(legacy_data) and index['dead_bytes'] == 0
+              and os.path.getsize(os.path.join(voice_dir, PACK_NAME)) == len(legacy_data))
+
+        legacy_path = cache.lookup('Bună ziua', 'ro-RO-AlinaNeural', 'slin16')
+        check("legacy phrase still read from the pack",
+              legacy_path is not None and bytes(cache.packs.read(legacy_path)) == legacy_data)
+
+        # Pack written before subdirectories were skipped
+        with open(os.path.join(voice_dir, PACK_NAME), 'ab') as f:
+            f.write(b'\x00' * 1600)
+        index['entries']['silence_fills/ok.pcm'] = [index['pack_bytes'], 1600, 1600, 0]
+        index['pack_bytes'] += 1600
+        write_index(voice_dir, index)
+        result = build_pack(voice_dir)
+        check("old pack with subdirectory entries is rebuilt",
+              result['rewritten'] and result['entries'] == 1 and result['pack_bytes'] == len(legacy_data))
+    finally:
+        shutil.rmtree(library, ignore_errors=True)
+
+    return all(checks)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Packed audio library tools")
+    parser.add_argument('command', choices=['migrate', 'sync', 'bench', 'check'],
+                        help="migrate: full rebuild, sync: incremental update, bench: lookup benchmark, "
+                             "check: self-test in a temp library")
+    parser.add_argument('library', nargs='?', default='/home/rom/audio_library', help="Audio library root")
+    parser.add_argument('--samples', type=int, default=2000, help="Lookups for bench (default: 2000)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+    if args.command == 'bench':
+        return benchmark(args.library, args.samples)
+    if args.command == 'check':
+        return 0 if self_check() else 1
+
+    dirs = voice_dirs(args.library)
+    if not dirs:
+        print(f"No voice directories under {args.library}")
+        return 1
+
+    for voice_dir in dirs:
+        start = time.time()
+        result = build_pack(voice_dir, incremental=(args.command == 'sync'))
+        print(f"📦 {voice_dir}: +{result['added']} -{result['removed']} → {result['entries']} phrases, "
+              f"{result['pack_bytes'] / 1024:.0f}KB{' (rewritten)' if result['rewritten'] else ''} "
+              f"in {(time.time() - start) * 1000:.0f}ms")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,441 @@
+#!/usr/bin/env python3
+"""
+Phrase Cache - Content-addressed TTS audio cache
+
+Key = sha256(normalized text, voice, audio format, speed, pitch)
+    - Text is NFC-normalized and whitespace-collapsed, nothing else is stripped,
+      so phrases that differ only in diacritics or punctuation never collide
+    - Same text with a different speed/pitch is a different entry
+    - Entries time-stretched from another speed are marked 'derived' and are
+      never used as a base for further stretching (TTS/time_stretch.py)
+
+Layout:
+    /home/rom/audio_library/{audio_format}/{voice}/phrases/{key[:2]}/{key}.raw
+    /home/rom/audio_library/phrase_cache.db    (SQLite WAL index)
+
+The index tracks size, last use and hit count per entry. Entries are evicted
+least-recently-used first once the total size exceeds max_bytes. Files synced
+from the VPS with the old sanitized names ({audio_format}/{voice}/{name}.raw)
+are still found as a fallback, but are not managed by the byte budget.
+
+HotPhraseCache keeps the hottest renderings (welcome message, apologies, most
+frequent tokens) as PCM in memory - a hit needs no disk I/O at all.
+"""
+
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BASE_DIR = '/home/rom/audio_library'
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024  # 512MB on the SD card
+DEFAULT_HOT_MAX_BYTES = 8 * 1024 * 1024  # ~4 min of 16kHz PCM in RAM
+TOUCH_FLUSH_INTERVAL = 30  # Seconds between last-used/hit-count writes to the index
+
+
+def normalize_text(text):
+    """NFC + collapsed whitespace (case, diacritics and punctuation are kept)"""
+    return unicodedata.normalize('NFC', ' '.join(text.split()))
+
+
+def phrase_key(text, voice, audio_format, speed=1.0, pitch=1):
+    """Content hash identifying one rendering of a phrase"""
+    material = '\x1f'.join([normalize_text(text), voice, audio_format, f"{float(speed):g}", f"{float(pitch):g}"])
+    return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+
+def legacy_filename(text):
+    """Old sanitized cache name (ASCII alphanumerics only, lowercase, hashed if long)"""
+    cleaned = re.sub(r'[^a-zA-Z0-9]', '', text).lower()
+    if len(cleaned) > 200:
+        text_hash = hashlib.md5(text.encode()).hexdigest()[:8]
+        cleaned = cleaned[:150] + '_' + text_hash
+    return cleaned + '.raw'
+
+
+class PhraseCache:
+    """Content-addressed phrase cache with SQLite index and size-bounded LRU eviction"""
+
+    def __init__(self, base_dir=DEFAULT_BASE_DIR, max_bytes=DEFAULT_MAX_BYTES, legacy_fallback=True, packs=None):
+        """
+        Args:
+            base_dir: Audio library root
+            max_bytes: Byte budget for cached phrases (0/None = unbounded)
+            legacy_fallback: Also look up old sanitized file names (default prosody only)
+            packs: Optional AudioPackSet - packed legacy names are found without a stat()
+        """
+        self.base_dir = Path(base_dir)
+        self.packs = packs
+        self.max_bytes = max_bytes
+        self.legacy_fallback = legacy_fallback
+        self.lock = threading.Lock()
+
+        # Counters since start
+        self.hits = 0
+        self.misses = 0
+        self.legacy_hits = 0
+        self.evictions = 0
+
+        # Pending index updates {key: (last_used, hit_increment)}
+        self.touched = {}
+        self.last_flush = time.time()
+
+        self.db = None
+        self.total_bytes = 0
+        self.open_index()
+
+    def open_index(self):
+        """Open (or create) the SQLite index"""
+        try:
+            self.base_dir.mkdir(parents=True, exist_ok=True)
+            self.db = sqlite3.connect(str(self.base_dir / 'phrase_cache.db'), check_same_thread=False)
+            self.db.execute('PRAGMA journal_mode=WAL')
+            self.db.execute('PRAGMA synchronous=NORMAL')
+            self.db.execute('''
+                CREATE TABLE IF NOT EXISTS phrases (
+                    key TEXT PRIMARY KEY,
+                    path TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    text TEXT,
+                    voice TEXT,
+                    audio_format TEXT,
+                    speed REAL,
+                    pitch REAL,
+                    created REAL,
+                    last_used REAL,
+                    hits INTEGER DEFAULT 0,
+                    derived INTEGER DEFAULT 0
+                )
+            ''')
+            columns = [row[1] for row in self.db.execute('PRAGMA table_info(phrases)')]
+            if 'derived' not in columns:
+                self.db.execute('ALTER TABLE phrases ADD COLUMN derived INTEGER DEFAULT 0')
+            self.db.execute('CREATE INDEX IF NOT EXISTS phrases_last_used ON phrases(last_used)')
+            self.db.execute('CREATE INDEX IF NOT EXISTS phrases_text ON phrases(text, voice, audio_format)')
+            self.db.commit()
+            self.total_bytes = self.db.execute('SELECT COALESCE(SUM(size), 0) FROM phrases').fetchone()[0]
+            count = self.db.execute('SELECT COUNT(*) FROM phrases').fetchone()[0]
+            logger.info(f"📚 Phrase cache: {count} phrases, {self.total_bytes / 1024 / 1024:.1f}MB "
+                        f"(budget {self.max_bytes / 1024 / 1024 if self.max_bytes else 0:.0f}MB)")
+        except Exception as e:
+            logger.error(f"Phrase cache index unavailable: {e} - caching disabled")
+            self.db = None
+
+    def path_for(self, key, voice, audio_format):
+        return self.base_dir / audio_format / voice / 'phrases' / key[:2] / f"{key}.raw"
+
+    def lookup(self, text, voice, audio_format, speed=1.0, pitch=1, count=True):
+        """
+        Find the cached rendering of a phrase
+
+        Args:
+            text: Phrase text
+            voice: TTS voice name
+            audio_format: Audio format directory (e.g. Raw8Khz16BitMonoPcm)
+            speed: Voice speed
+            pitch: Voice pitch
+            count: Update hit/miss counters and LRU order (False for preloading)
+
+        Returns:
+            Path or None on miss
+        """
+        key = phrase_key(text, voice, audio_format, speed, pitch)
+
+        with self.lock:
+            row = None
+            if self.db:
+                try:
+                    row = self.db.execute('SELECT path FROM phrases WHERE key = ?', (key,)).fetchone()
+                except sqlite3.Error as e:
+                    logger.error(f"Phrase cache lookup error: {e}")
+
+            if row:
+                if count:
+                    self.hits += 1
+                    last_used, hits = self.touched.get(key, (0, 0))
+                    self.touched[key] = (time.time(), hits + 1)
+                    self._maybe_flush()
+                return Path(row[0])
+
+        # Old sanitized names (synced library) - prosody was never part of those names
+        if self.legacy_fallback and float(speed) == 1.0 and float(pitch) == 1.0:
+            legacy_path = self.base_dir / audio_format / voice / legacy_filename(text)
+            if (self.packs and self.packs.contains(legacy_path)) or legacy_path.exists():
+                if count:
+                    with self.lock:
+                        self.hits += 1
+                        self.legacy_hits += 1
+                return legacy_path
+
+        if count:
+            with self.lock:
+                self.misses += 1
+        return None
+
+    def lookup_variants(self, text, voice, audio_format, pitch=1):
+        """
+        Synthesized renderings of a phrase at any speed (time-stretch bases)
+
+        Returns:
+            list: [(speed, Path)] - derived (stretched) entries excluded
+        """
+        variants = []
+        with self.lock:
+            if self.db:
+                try:
+                    variants = [(row[0], Path(row[1])) for row in self.db.execute(
+                        'SELECT speed, path FROM phrases WHERE text = ? AND voice = ? AND audio_format = ? '
+                        'AND pitch = ? AND derived = 0',
+                        (normalize_text(text), voice, audio_format, float(pitch))
+                    ).fetchall()]
+                except sqlite3.Error as e:
+                    logger.error(f"Phrase cache lookup error: {e}")
+
+        if self.legacy_fallback and float(pitch) == 1.0 and not any(speed == 1.0 for speed, _ in variants):
+            legacy_path = self.base_dir / audio_format / voice / legacy_filename(text)
+            if (self.packs and self.packs.contains(legacy_path)) or legacy_path.exists():
+                variants.append((1.0, legacy_path))
+        return variants
+
+    def top_phrases(self, voice, audio_format, speed=1.0, pitch=1, limit=50):
+        """
+        Most used phrases for a voice/format/prosody
+
+        Returns:
+            list: Phrase texts, most hits first
+        """
+        with self.lock:
+            if not self.db:
+                return []
+            try:
+                self._flush_touched()
+                self.db.commit()
+                rows = self.db.execute(
+                    'SELECT text FROM phrases WHERE voice = ? AND audio_format = ? AND speed = ? AND pitch = ? '
+                    'ORDER BY hits DESC, last_used DESC LIMIT ?',
+                    (voice, audio_format, float(speed), float(pitch), limit)
+                ).fetchall()
+            except sqlite3.Error as e:
+                logger.error(f"Phrase cache index error: {e}")
+                return []
+        return [row[0] for row in rows]
+
+    def put(self, text, voice, audio_format, audio_data, speed=1.0, pitch=1, derived=False):
+        """
+        Store a rendering (atomic write, evicts old entries over budget)
+
+        Args:
+            derived: True if time-stretched from another speed (not a stretch base)
+
+        Returns:
+            Path of the cached file or None on error
+        """
+        if not audio_data or not self.db:
+            return None
+
+        key = phrase_key(text, voice, audio_format, speed, pitch)
+        path = self.path_for(key, voice, audio_format)
+
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_suffix('.tmp')
+            with open(tmp_path, 'wb') as f:
+                f.write(audio_data)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logger.error(f"Phrase cache save error: {e}")
+            return None
+
+        now = time.time()
+        with self.lock:
+            try:
+                old = self.db.execute('SELECT size FROM phrases WHERE key = ?', (key,)).fetchone()
+                self.db.execute(
+                    'INSERT OR REPLACE INTO phrases (key, path, size, text, voice, audio_format, speed, pitch, created, last_used, hits, derived) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, COALESCE((SELECT hits FROM phrases WHERE key = ?), 0), ?)',
+                    (key, str(path), len(audio_data), normalize_text(text), voice, audio_format,
+                     float(speed), float(pitch), now, now, key, int(derived))
+                )
+                self.total_bytes += len(audio_data) - (old[0] if old else 0)
+                self._evict()
+                self.db.commit()
+            except sqlite3.Error as e:
+                logger.error(f"Phrase cache index error: {e}")
+
+        logger.debug(f"Cached phrase '{text[:40]}' → {path.name} ({len(audio_data)} bytes)")
+        return path
+
+    def invalidate(self, path):
+        """Forget an entry whose file turned out to be missing or unreadable"""
+        with self.lock:
+            if self.db:
+                try:
+                    row = self.db.execute('SELECT key, size FROM phrases WHERE path = ?', (str(path),)).fetchone()
+                    if row:
+                        self.db.execute('DELETE FROM phrases WHERE key = ?', (row[0],))
+                        self.db.commit()
+                        self.total_bytes -= row[1]
+                        self.touched.pop(row[0], None)
+                except sqlite3.Error as e:
+                    logger.error(f"Phrase cache index error: {e}")
+
+    def _evict(self):
+        """Drop least-recently-used entries until under budget (lock held)"""
+        # Bot and unified API (warm-up) both write the index - recount instead of trusting our own total
+        self.total_bytes = self.db.execute('SELECT COALESCE(SUM(size), 0) FROM phrases').fetchone()[0]
+        if not self.max_bytes or self.total_bytes <= self.max_bytes:
+            return
+
+        self._flush_touched()
+        freed = 0
+        for key, path, size in self.db.execute('SELECT key, path, size FROM phrases ORDER BY last_used ASC').fetchall():
+            if self.total_bytes <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.warning(f"Phrase cache evict error {path}: {e}")
+                continue
+            self.db.execute('DELETE FROM phrases WHERE key = ?', (key,))
+            self.total_bytes -= size
+            freed += size
+            self.evictions += 1
+
+        logger.info(f"🧹 Phrase cache evicted {freed / 1024:.0f}KB (now {self.total_bytes / 1024 / 1024:.1f}MB)")
+
+    def _maybe_flush(self):
+        """Write batched last-used/hit updates (lock held) - keeps SD card writes rare"""
+        if time.time() - self.last_flush >= TOUCH_FLUSH_INTERVAL:
+            self._flush_touched()
+            try:
+                self.db.commit()
+            except sqlite3.Error as e:
+                logger.error(f"Phrase cache index error: {e}")
+
+    def _flush_touched(self):
+        if self.touched:
+            self.db.executemany(
+                'UPDATE phrases SET last_used = ?, hits = hits + ? WHERE key = ?',
+                [(last_used, hits, key) for key, (last_used, hits) in self.touched.items()]
+            )
+            self.touched.clear()
+        self.last_flush = time.time()
+
+    def flush(self):
+        """Persist pending index updates (call end / shutdown)"""
+        with self.lock:
+            if self.db:
+                try:
+                    self._flush_touched()
+                    self.db.commit()
+                except sqlite3.Error as e:
+                    logger.error(f"Phrase cache index error: {e}")
+
+    def stats(self):
+        """Counters for logs/status"""
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'legacy_hits': self.legacy_hits,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+                'evictions': self.evictions,
+                'total_bytes': self.total_bytes,
+                'max_bytes': self.max_bytes
+            }
+
+
+class HotPhraseCache:
+    """In-memory LRU of phrase PCM (bounded by bytes, thread-safe)"""
+
+    def __init__(self, max_bytes=DEFAULT_HOT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()  # key -> PCM bytes
+        self.total_bytes = 0
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, text, voice, audio_format, speed=1.0, pitch=1):
+        """PCM bytes or None"""
+        key = phrase_key(text, voice, audio_format, speed, pitch)
+        with self.lock:
+            audio_data = self.entries.get(key)
+            if audio_data is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return audio_data
+
+    def put(self, text, voice, audio_format, audio_data, speed=1.0, pitch=1):
+        """Add/refresh a phrase, dropping least recently used ones over budget"""
+        if not audio_data or len(audio_data) > self.max_bytes:
+            return
+
+        key = phrase_key(text, voice, audio_format, speed, pitch)
+        with self.lock:
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.total_bytes -= len(old)
+            self.entries[key] = audio_data
+            self.total_bytes += len(audio_data)
+
+            while self.total_bytes > self.max_bytes:
+                _, dropped = self.entries.popitem(last=False)
+                self.total_bytes -= len(dropped)
+
+    def preload(self, phrases, phrase_cache, voice, audio_format, speed=1.0, pitch=1):
+        """
+        Load phrases from the disk cache into memory
+
+        Args:
+            phrases: Phrase texts (first = most important, kept if budget is tight)
+            phrase_cache: PhraseCache to read from
+            voice, audio_format, speed, pitch: Rendering to load
+
+        Returns:
+            int: Number of phrases loaded
+        """
+        loaded = 0
+        # Load least important first so the most important end up most recently used
+        for text in reversed(list(dict.fromkeys(p for p in phrases if p))):
+            path = phrase_cache.lookup(text, voice, audio_format, speed, pitch, count=False)
+            if not path:
+                continue
+            try:
+                audio_data = phrase_cache.packs.read(path) if phrase_cache.packs else None
+                if audio_data is None:
+                    with open(path, 'rb') as f:
+                        audio_data = f.read()
+            except OSError as e:
+                logger.warning(f"Hot cache preload failed for '{text[:40]}': {e}")
+                continue
+            self.put(text, voice, audio_format, audio_data, speed, pitch)
+            loaded += 1
+        return loaded
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.total_bytes = 0
+
+    def stats(self):
+        with self.lock:
+            return {
+                'phrases': len(self.entries),
+                'bytes': self.total_bytes,
+                'hits': self.hits,
+                'misses': self.misses
+            }
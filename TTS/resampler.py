@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Streaming Resampler - Polyphase int16 PCM sample rate conversion
+
+TTS providers deliver audio at their native rate (OpenAI PCM: 24kHz, Azure:
+whatever audio_format asks for) while the modem plays 8kHz or 16kHz
+(AT+CPCMFRM). Every provider feeds its raw chunks through a StreamingResampler
+and emits the modem rate directly, so nothing downstream has to convert.
+
+- Filter history and output phase are carried across chunks (no clicks at
+  chunk boundaries, no per-chunk restart)
+- A trailing odd byte (HTTP chunks split samples) is kept for the next chunk
+- Windowed-sinc polyphase taps are designed once per rate pair (lru_cache)
+- Equal rates are a passthrough
+"""
+
+import math
+import re
+from functools import lru_cache
+
+import numpy as np
+
+ZERO_CROSSINGS = 8     # Filter half-width in samples of the lower rate
+ROLLOFF = 0.9          # Cutoff as a fraction of the lower Nyquist frequency
+KAISER_BETA = 8.0
+
+FORMAT_RATE_PATTERN = re.compile(r'(\d+)khz', re.IGNORECASE)
+
+
+def rate_from_format(audio_format, default=8000):
+    """
+    Sample rate of an audio format name
+
+    Args:
+        audio_format: e.g. "Raw8Khz16BitMonoPcm" or "raw-16khz-16bit-mono-pcm"
+        default: Rate when the name carries none (modem default is 8kHz)
+
+    Returns:
+        int: Sample rate in Hz
+    """
+    match = FORMAT_RATE_PATTERN.search(audio_format or '')
+    return int(match.group(1)) * 1000 if match else default
+
+
+@lru_cache(maxsize=16)
+def design_taps(up, down):
+    """
+    Polyphase filter bank for an up/down ratio
+
+    Returns:
+        np.ndarray: float32 (up, taps_per_phase), phase p holds h[p + k*up]
+    """
+    factor = max(up, down)
+    taps_per_phase = math.ceil(2 * ZERO_CROSSINGS * factor / up)
+    length = taps_per_phase * up
+
+    cutoff = 0.5 * ROLLOFF / factor  # Normalized to the upsampled rate
+    n = np.arange(length) - (length - 1) / 2.0
+    h = 2 * cutoff * np.sinc(2 * cutoff * n) * np.kaiser(length, KAISER_BETA)
+    h *= up / h.sum()  # Unity DC gain after zero-stuffing
+
+    bank = h.reshape(taps_per_phase, up).T.astype(np.float32)
+    bank.setflags(write=False)
+    return bank
+
+
+class StreamingResampler:
+    """Converts a stream of int16 PCM chunks from in_rate to out_rate"""
+
+    def __init__(self, in_rate, out_rate):
+        """
+        Args:
+            in_rate: Provider sample rate
+            out_rate: Modem sample rate
+        """
+        self.in_rate = int(in_rate)
+        self.out_rate = int(out_rate)
+        divisor = math.gcd(self.in_rate, self.out_rate)
+        self.up = self.out_rate // divisor
+        self.down = self.in_rate // divisor
+        self.passthrough = self.up == self.down
+
+        self.bank = None if self.passthrough else design_taps(self.up, self.down)
+        self.taps_per_phase = 0 if self.passthrough else self.bank.shape[1]
+        self.reset()
+
+    def reset(self):
+        """Forget carried state (start of a new utterance)"""
+        self.carry = b''
+        self.history = np.zeros(max(self.taps_per_phase - 1, 0), dtype=np.float32)
+        self.position = 0  # Upsampled index of the next output, relative to the next input sample
+
+    def _to_samples(self, data):
+        if isinstance(data, np.ndarray):
+            return data.astype(np.int16, copy=False)
+
+        data = self.carry + bytes(data) if self.carry else data
+        usable = len(data) & ~1
+        self.carry = bytes(data[usable:])
+        return np.frombuffer(data, dtype=np.int16, count=usable // 2)
+
+    def process(self, data):
+        """
+        Resample the next chunk
+
+        Args:
+            data: PCM bytes (any length) or int16 array
+
+        Returns:
+            np.ndarray: int16 samples at out_rate (may be empty)
+        """
+        samples = self._to_samples(data)
+        if self.passthrough or not len(samples):
+            return samples
+
+        up, down = self.up, self.down
+        count = len(samples)
+        buffer = np.concatenate((self.history, samples.astype(np.float32)))
+
+        n_out = max(0, -(-(count * up - self.position) // down))
+        positions = self.position + down * np.arange(n_out)
+        phases = positions % up
+        # Window of taps_per_phase inputs ending at each output's input index
+        ends = positions // up + self.taps_per_phase - 1
+        windows = buffer[ends[:, None] - np.arange(self.taps_per_phase)[None, :]]
+        out = np.einsum('ij,ij->i', windows, self.bank[phases])
+
+        self.position += n_out * down - count * up
+        self.history = buffer[len(buffer) - len(self.history):]
+
+        return np.clip(np.rint(out), -32768, 32767).astype(np.int16)
+
+    def flush(self):
+        """Drain the filter tail at the end of an utterance (int16 array)"""
+        if self.passthrough:
+            self.carry = b''
+            return np.zeros(0, dtype=np.int16)
+        tail = self.process(np.zeros(self.taps_per_phase // 2, dtype=np.int16))
+        self.reset()
+        return tail
+
+
+def resample_pcm(data, in_rate, out_rate):
+    """One-shot conversion of a complete utterance (bytes or int16 array -> int16 array)"""
+    resampler = StreamingResampler(in_rate, out_rate)
+    out = resampler.process(data)
+    if resampler.passthrough:
+        return out
+    return np.concatenate((out, resampler.flush()))
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Time Stretch - Speed variants of cached phrases without re-synthesis
+
+WSOLA (waveform similarity overlap-add): the audio is cut into 20ms Hann
+frames, laid out at a fixed output hop and read at hop x factor. Each frame is
+shifted within +/-5ms to the position whose waveform best continues the
+previous frame (normalized cross-correlation, one matrix product per frame),
+so pitch and timbre are kept and no phasiness appears at moderate factors.
+
+Beyond MAX_RATIO (default 1.25x faster or slower) artifacts become audible -
+callers fall back to real synthesis instead.
+
+Speed semantics match voice_settings.speed: a rendering cached at speed 1.0
+played as speed 1.2 is stretched by factor 1.2 (output 1/1.2 as long).
+"""
+
+import numpy as np
+
+FRAME_MS = 20
+TOLERANCE_MS = 5
+MAX_RATIO = 1.25
+
+
+def stretch_factor(base_speed, target_speed):
+    """Tempo factor turning a base_speed rendering into target_speed (>1 = faster/shorter)"""
+    return float(target_speed) / float(base_speed)
+
+
+def within_quality(factor, max_ratio=MAX_RATIO):
+    """True if a stretch by factor stays within the quality threshold"""
+    return 1.0 / max_ratio <= factor <= max_ratio
+
+
+def choose_base(variants, target_speed, max_ratio=MAX_RATIO):
+    """
+    Best cached rendering to derive target_speed from
+
+    Args:
+        variants: [(speed, path)] of synthesized renderings of the phrase
+        target_speed: Requested speed
+        max_ratio: Quality threshold
+
+    Returns:
+        (speed, path) with the smallest stretch, or None if all exceed the threshold
+    """
+    best = None
+    for speed, path in variants:
+        if not speed:
+            continue
+        distance = abs(np.log(stretch_factor(speed, target_speed)))
+        if within_quality(stretch_factor(speed, target_speed), max_ratio) and (best is None or distance < best[0]):
+            best = (distance, speed, path)
+    return best[1:] if best else None
+
+
+def time_stretch(pcm, factor, sample_rate):
+    """
+    Change tempo without changing pitch (WSOLA)
+
+    Args:
+        pcm: int16 PCM bytes or int16 array (mono)
+        factor: Tempo factor (>1 = faster, output len/factor samples)
+        sample_rate: Sample rate of pcm
+
+    Returns:
+        np.ndarray: Stretched int16 samples
+    """
+    x = np.frombuffer(pcm, dtype=np.int16) if isinstance(pcm, (bytes, bytearray, memoryview)) else np.asarray(pcm, dtype=np.int16)
+    if abs(factor - 1.0) < 1e-3 or len(x) == 0:
+        return x.copy()
+
+    frame = max(16, int(sample_rate * FRAME_MS / 1000) // 2 * 2)
+    hop_out = frame // 2
+    hop_in = hop_out * factor
+    tolerance = int(sample_rate * TOLERANCE_MS / 1000)
+    window = np.hanning(frame + 1)[:-1].astype(np.float32)  # Periodic Hann - sums to 1 at 50% overlap
+
+    out_len = int(round(len(x) / factor))
+    n_frames = out_len // hop_out + 3
+
+    # Pad so every candidate window exists (input is read up to n_frames * hop_in + frame + tolerance)
+    pad = tolerance + frame
+    tail = int(n_frames * hop_in) + frame + 2 * tolerance + hop_out - len(x)
+    xp = np.concatenate((np.zeros(pad, dtype=np.float32), x.astype(np.float32),
+                         np.zeros(max(tail, 0) + pad, dtype=np.float32)))
+
+    out = np.zeros(n_frames * hop_out + frame, dtype=np.float32)
+    offsets = np.arange(-tolerance, tolerance + 1)
+    previous = pad - hop_out
+
+    # Frame k is centered on output sample k * hop_out (out[] starts half a frame early, no fade-in)
+    for k in range(n_frames):
+        ideal = pad + int(round(k * hop_in)) - hop_out
+        if k == 0:
+            position = ideal
+        else:
+            # Natural continuation of the previous frame vs. candidates around the ideal position
+            template = xp[previous + hop_out:previous + hop_out + frame]
+            region = xp[ideal - tolerance:ideal + tolerance + frame]
+            candidates = np.lib.stride_tricks.sliding_window_view(region, frame)
+            energy = np.sqrt(np.einsum('ij,ij->i', candidates, candidates)) + 1e-3
+            position = ideal + offsets[np.argmax((candidates @ template) / energy)]
+
+        out[k * hop_out:k * hop_out + frame] += xp[position:position + frame] * window
+        previous = position
+
+    return np.clip(np.rint(out[hop_out:hop_out + out_len]), -32768, 32767).astype(np.int16)
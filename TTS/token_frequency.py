@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+Token Frequency - Cache admission from historical bot responses
+
+Mines the per-call logs for what callers actually hear:
+    /home/rom/transcriptions/{call_id}_transcription.txt   (header: Language/Voice, "  Bot: ..." lines)
+    /home/rom/transcriptions/{call_id}_tokenization.txt    (how each response was split)
+
+Tokens are counted per (language, voice). The most frequent ones are admitted
+to the phrase cache through the TTS warm-up job, and the projected cache hit
+rate (share of historical token occurrences served from cache) is reported
+before and after admission.
+
+Usage:
+    python3 -m TTS.token_frequency                         # report for the active config
+    python3 -m TTS.token_frequency --top 300 --min-count 2
+    python3 -m TTS.token_frequency --warmup                # admit: send top tokens to the warm-up job
+    python3 -m TTS.token_frequency --json
+"""
+
+import argparse
+import glob
+import json
+import logging
+import os
+import re
+import sys
+from collections import Counter, defaultdict
+
+from TTS.phrase_cache import normalize_text
+from TTS.tokenizer import tokenize_response
+
+logger = logging.getLogger(__name__)
+
+TRANSCRIPTIONS_DIR = '/home/rom/transcriptions'
+TOKEN_LINE = re.compile(r'^    \d+\. (.*)$')
+HEADER_LINE = re.compile(r'^(Language|Voice): (.*)$')
+
+
+def read_header(transcription_file):
+    """Language/Voice from a transcription file header"""
+    header = {}
+    try:
+        with open(transcription_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.startswith('====') and header:
+                    break
+                match = HEADER_LINE.match(line.rstrip('\n'))
+                if match:
+                    header[match.group(1).lower()] = match.group(2).strip()
+    except OSError:
+        pass
+    return header
+
+
+def read_logged_tokens(tokenization_file):
+    """Tokens exactly as they were sent to TTS"""
+    tokens = []
+    with open(tokenization_file, 'r', encoding='utf-8') as f:
+        for line in f:
+            match = TOKEN_LINE.match(line.rstrip('\n'))
+            if match:
+                tokens.append(match.group(1))
+    return tokens
+
+
+def read_bot_responses(transcription_file):
+    responses = []
+    with open(transcription_file, 'r', encoding='utf-8') as f:
+        for line in f:
+            if line.startswith('  Bot: '):
+                responses.append(line[len('  Bot: '):].rstrip('\n'))
+    return responses
+
+
+def mine_tokens(transcriptions_dir=TRANSCRIPTIONS_DIR, default_voice='unknown'):
+    """
+    Count spoken tokens per (language, voice)
+
+    Args:
+        transcriptions_dir: Directory with per-call logs
+        default_voice: Voice for logs written before the header recorded it
+
+    Returns:
+        dict: {(language, voice): Counter(normalized token -> occurrences)}
+    """
+    counters = defaultdict(Counter)
+
+    for transcription_file in sorted(glob.glob(os.path.join(transcriptions_dir, '*_transcription.txt'))):
+        header = read_header(transcription_file)
+        language = header.get('language', 'auto')
+        voice = header.get('voice', default_voice)
+        tokenization_file = transcription_file[:-len('_transcription.txt')] + '_tokenization.txt'
+
+        try:
+            if os.path.exists(tokenization_file):
+                tokens = read_logged_tokens(tokenization_file)
+            else:
+                # Older calls without a tokenization log - split the responses the same way the bot does
+                tokens = [token for response in read_bot_responses(transcription_file)
+                          for token in tokenize_response(response, language, save_debug=False)]
+        except OSError as e:
+            logger.warning(f"Skipping {transcription_file}: {e}")
+            continue
+
+        counters[(language, voice)].update(normalize_text(token) for token in tokens if token.strip())
+
+    return dict(counters)
+
+
+def select_tokens(counter, top_n=200, min_count=3):
+    """Most frequent tokens worth caching"""
+    return [token for token, count in counter.most_common(top_n) if count >= min_count]
+
+
+def projected_hit_rate(counter, is_cached, admitted=()):
+    """
+    Share of historical token occurrences that would be served from cache
+
+    Args:
+        counter: Token occurrences
+        is_cached: Callable(token) -> bool for the current cache
+        admitted: Tokens that would be added
+
+    Returns:
+        float: Hit rate 0..1
+    """
+    total = sum(counter.values())
+    if not total:
+        return 0.0
+    admitted = set(admitted)
+    hits = sum(count for token, count in counter.items() if token in admitted or is_cached(token))
+    return hits / total
+
+
+def top_tokens(language, voice, top_n=200, min_count=3, transcriptions_dir=TRANSCRIPTIONS_DIR):
+    """Admission list for one language/voice (logs without a Voice header count for every voice)"""
+    counters = mine_tokens(transcriptions_dir, default_voice=voice)
+    return select_tokens(counters.get((language, voice), Counter()), top_n, min_count)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mine bot responses for frequent TTS tokens and project cache hit rate")
+    parser.add_argument('--config', default='/home/rom/voice_config.json', help="Active voice config")
+    parser.add_argument('--transcriptions', default=TRANSCRIPTIONS_DIR, help="Per-call log directory")
+    parser.add_argument('--top', type=int, default=200, help="Tokens to admit per language/voice (default: 200)")
+    parser.add_argument('--min-count', type=int, default=3, help="Minimum occurrences to admit (default: 3)")
+    parser.add_argument('--warmup', action='store_true', help="Send admitted tokens to the TTS warm-up job")
+    parser.add_argument('--api', default='http://localhost:8088/tts/warmup', help="Warm-up endpoint")
+    parser.add_argument('--json', action='store_true', help="JSON output")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format='%(message)s')
+
+    try:
+        with open(args.config, 'r') as f:
+            config = json.load(f)
+    except (OSError, ValueError):
+        config = {}
+
+    voice_settings = config.get('voice_settings', {})
+    active_voice = voice_settings.get('voice', 'unknown')
+    audio_format = config.get('audio_format', 'Raw8Khz16BitMonoPcm')
+    speed = voice_settings.get('speed', 1.0)
+    pitch = voice_settings.get('pitch', 1)
+
+    from TTS.phrase_cache import PhraseCache
+    cache = PhraseCache()
+
+    report = []
+    for (language, voice), counter in sorted(mine_tokens(args.transcriptions, default_voice=active_voice).items()):
+        admitted = select_tokens(counter, args.top, args.min_count)
+
+        def is_cached(token):
+            return cache.lookup(token, voice, audio_format, speed, pitch, count=False) is not None
+
+        new = [token for token in admitted if not is_cached(token)]
+        report.append({
+            'language': language,
+            'voice': voice,
+            'occurrences': sum(counter.values()),
+            'unique_tokens': len(counter),
+            'admitted': len(admitted),
+            'new': new,
+            'hit_rate_before': round(projected_hit_rate(counter, is_cached), 4),
+            'hit_rate_after': round(projected_hit_rate(counter, is_cached, admitted), 4),
+            'top': counter.most_common(10)
+        })
+
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    else:
+        if not report:
+            print(f"No transcriptions found in {args.transcriptions}")
+        for entry in report:
+            print(f"\n🔤 {entry['language']} / {entry['voice']}: {entry['occurrences']} token occurrences, "
+                  f"{entry['unique_tokens']} unique")
+            print(f"   Admit top {entry['admitted']} (≥{args.min_count}x), {len(entry['new'])} not cached yet")
+            print(f"   Projected hit rate: {entry['hit_rate_before']:.1%} → {entry['hit_rate_after']:.1%}")
+            for token, count in entry['top']:
+                print(f"     {count:5d}  {token}")
+
+    if args.warmup:
+        import requests
+        for entry in report:
+            if entry['voice'] != active_voice or not entry['new']:
+                continue
+            response = requests.post(args.api, json={
+                'phrases': entry['new'],
+                'voice': active_voice,
+                'audio_format': audio_format,
+                'speed': speed,
+                'pitch': pitch,
+                'language': entry['language']
+            }, timeout=5)
+            print(f"🔥 Warm-up for {entry['language']}/{active_voice}: HTTP {response.status_code} ({len(entry['new'])} tokens)")
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -7,16 +7,34 @@ Split criteria:
 1. After punctuation: ? ! , .
 2. Before separator words (language-specific)
 3. Exception handling (e.g., "dvs." in Romanian)
+
+Separator words and exceptions are compiled once per language and reloaded
+only when separators_{lang} / exceptions_{lang} change on disk (mtime):
+- Separator words: one alternation regex (longest first)
+- Exceptions: reversed-suffix trie, walked backwards from the punctuation
+
+Streamed responses use IncrementalTokenizer: text deltas go in, each clause
+comes out as soon as its boundary can no longer change.
 """
 
 import os
+import queue
 import re
+import threading
 import time
 
+SEPARATORS_DIR = "/home/rom/transcription_separators"
+
+# Punctuation split point: ? ! , . followed by whitespace or end of text
+PUNCTUATION_PATTERN = re.compile(r'[?!,.](?=[ \n\t]|\Z)')
+# Incremental mode: end of the buffer is not end of text, the next char must be known
+PUNCTUATION_PATTERN_OPEN = re.compile(r'[?!,.](?=[ \n\t])')
+WHITESPACE_PATTERN = re.compile(r'\s+')
+
 
 def load_separators(language):
     """Load separator words for specified language"""
-    separators_file = f"/home/rom/transcription_separators/separators_{language}"
+    separators_file = f"{SEPARATORS_DIR}/separators_{language}"
     separator_words = []
 
     if os.path.exists(separators_file):
@@ -31,7 +49,7 @@ def load_separators(language):
 
 def load_exceptions(language):
     """Load exception patterns for specified language"""
-    exceptions_file = f"/home/rom/transcription_separators/exceptions_{language}"
+    exceptions_file = f"{SEPARATORS_DIR}/exceptions_{language}"
     exceptions = []
 
     if os.path.exists(exceptions_file):
@@ -44,85 +62,194 @@ def load_exceptions(language):
     return exceptions
 
 
-def tokenize_response(text, language, call_id=None, save_debug=True):
+class SuffixTrie:
+    """Trie over reversed exception strings - answers 'does text[start:end] end with any exception'"""
+
+    END = object()
+
+    def __init__(self, words):
+        self.root = {}
+        for word in words:
+            node = self.root
+            for char in reversed(word):
+                node = node.setdefault(char, {})
+            node[self.END] = True
+
+    def matches(self, text, start, end):
+        """True if text[start:end] ends with one of the words (case-sensitive)"""
+        node = self.root
+        i = end - 1
+        while i >= start:
+            node = node.get(text[i])
+            if node is None:
+                return False
+            if self.END in node:
+                return True
+            i -= 1
+        return False
+
+
+class LanguageTables:
+    """Compiled separator regex + exception trie for one language"""
+
+    def __init__(self, language):
+        self.language = language
+        self.mtimes = self.file_mtimes(language)
+
+        separator_words = load_separators(language)
+        exceptions = load_exceptions(language)
+
+        # Split before a separator word preceded by whitespace, followed by whitespace/punctuation/end.
+        # Lookahead wrapper so every whitespace position is reported (separators may contain spaces)
+        self.separator_pattern = None
+        self.separator_pattern_open = None
+        if separator_words:
+            alternation = '|'.join(re.escape(word) for word in sorted(set(separator_words), key=len, reverse=True))
+            self.separator_pattern = re.compile(r'(?=\s+(?:' + alternation + r')(?:\s|[?!,.]|$))', re.IGNORECASE)
+            self.separator_pattern_open = re.compile(r'(?=\s+(?:' + alternation + r')(?:\s|[?!,.]))', re.IGNORECASE)
+
+        # Every prefix of every separator word - a buffer ending in one may still become a split
+        self.separator_prefixes = {word.lower()[:n] for word in separator_words for n in range(len(word) + 1)}
+        self.max_separator_len = max((len(word) for word in separator_words), default=0)
+
+        self.exceptions = SuffixTrie(exceptions)
+        self.separator_count = len(separator_words)
+        self.exception_count = len(exceptions)
+
+    @staticmethod
+    def file_mtimes(language):
+        mtimes = []
+        for name in (f"separators_{language}", f"exceptions_{language}"):
+            try:
+                mtimes.append(os.stat(f"{SEPARATORS_DIR}/{name}").st_mtime_ns)
+            except OSError:
+                mtimes.append(None)
+        return tuple(mtimes)
+
+    def is_stale(self):
+        return self.file_mtimes(self.language) != self.mtimes
+
+
+_tables = {}
+_tables_lock = threading.Lock()
+
+
+def get_language_tables(language):
+    """Compiled tables for a language (recompiled when the source files change)"""
+    tables = _tables.get(language)
+    if tables is None or tables.is_stale():
+        with _tables_lock:
+            tables = _tables.get(language)
+            if tables is None or tables.is_stale():
+                tables = LanguageTables(language)
+                _tables[language] = tables
+    return tables
+
+
+def split_points(text, tables, final=True):
     """
-    Tokenize response text into smaller parts for better TTS flow
+    Positions i after which the text is split (token ends at text[i])
 
     Args:
         text (str): Text to tokenize
-        language (str): Language code ('ro', 'lt', etc.)
-        call_id (str, optional): Call ID for debug file naming
-        save_debug (bool): Whether to save debug output to disk
+        tables (LanguageTables): Compiled tables for the language
+        final (bool): End of text is end of response (False: more text may follow)
 
     Returns:
-        list: List of text tokens
+        list: Sorted split positions
+    """
+    separator_pattern = tables.separator_pattern if final else tables.separator_pattern_open
+    punctuation_pattern = PUNCTUATION_PATTERN if final else PUNCTUATION_PATTERN_OPEN
 
-    Split criteria:
-    1. After punctuation: ? ! , .
-    2. Before separator words (loaded from file based on language)
-    3. Exceptions: Don't split if pattern found in exceptions file
+    # Separator word starts at p -> split after p - 1 (p == 0 is never a split point)
+    separator_splits = set()
+    if separator_pattern:
+        separator_splits = {m.start() - 1 for m in separator_pattern.finditer(text, 1)}
+
+    candidates = {m.start(): True for m in punctuation_pattern.finditer(text)}
+    for i in separator_splits:
+        candidates[i] = False
+
+    points = []
+    start = 0
+    for i in sorted(candidates):
+        # Punctuation inside an exception ("dvs.") only splits if a separator word follows
+        if candidates[i] and tables.exceptions.matches(text, start, i + 1):
+            continue
+        points.append(i)
+        start = i + 1
+
+    return points
+
+
+def split_text(text, tables, final=True):
     """
+    Split text into stripped, non-empty tokens
+
+    Args:
+        text (str): Text to tokenize
+        tables (LanguageTables): Compiled tables for the language
+        final (bool): End of text is end of response. If False, only clauses whose
+                      boundary is confirmed are returned
 
-    # Load separator words and exceptions for this language
-    separator_words = load_separators(language)
-    exceptions = load_exceptions(language)
+    Returns:
+        tuple: (tokens, consumed) - consumed is the number of chars the tokens cover
+    """
+    points = split_points(text, tables, final)
+    if not final:
+        # A separator word may still be arriving - splits from there on are not settled
+        limit = pending_separator_start(text, tables) - 1
+        points = [i for i in points if i <= limit]
 
-    # Process text character by character
     tokens = []
-    current_token = ""
-    i = 0
-
-    while i < len(text):
-        char = text[i]
-        current_token += char
-        should_split = False
-
-        # 1. Check for punctuation split (after: ? ! , .)
-        if char in '?!,.':
-            # Check if this is an exception (e.g., "dvs." in Romanian)
-            is_exception = False
-            for exception in exceptions:
-                if current_token.rstrip().endswith(exception):
-                    is_exception = True
-                    break
-
-            if not is_exception:
-                if i + 1 >= len(text) or text[i + 1] in ' \n\t':
-                    should_split = True
-
-        # 2. Check for separator word split (before word)
-        if not should_split and separator_words:
-            remaining_text = text[i + 1:]
-            for separator_word in separator_words:
-                pattern = r'^\s+(' + re.escape(separator_word) + r')(\s|[?!,.]|$)'
-                match = re.match(pattern, remaining_text, re.IGNORECASE)
-                if match:
-                    should_split = True
-                    break
-
-        # Perform split if needed
-        if should_split:
-            token = current_token.strip()
-            if token:
-                tokens.append(token)
-            current_token = ""
-
-        i += 1
-
-    # Add remaining text as final token
-    if current_token.strip():
-        tokens.append(current_token.strip())
+    start = 0
+    for i in points:
+        token = text[start:i + 1].strip()
+        if token:
+            tokens.append(token)
+        start = i + 1
 
-    if not tokens:
-        tokens = [text.strip()]
+    if final:
+        if text[start:].strip():
+            tokens.append(text[start:].strip())
+        start = len(text)
 
-    # Save debug info if requested
-    if save_debug and call_id:
+    return tokens, start
+
+
+def pending_separator_start(text, tables):
+    """
+    Start of a trailing whitespace run that could still turn into a separator split
+
+    Returns:
+        int: Position of the whitespace run, len(text) if none
+    """
+    if not tables.separator_pattern:
+        return len(text)
+
+    for m in WHITESPACE_PATTERN.finditer(text, max(0, len(text) - tables.max_separator_len - 1)):
+        if text[m.end():].lower() in tables.separator_prefixes:
+            start = m.start()
+            while start > 0 and text[start - 1].isspace():
+                start -= 1
+            return start
+
+    return len(text)
+
+
+# Debug output is written by a background thread - keeps file I/O off the TTS hot path
+_debug_queue = queue.Queue()
+_debug_thread = None
+_debug_lock = threading.Lock()
+
+
+def _debug_writer():
+    while True:
+        call_id, timestamp, text, tokens = _debug_queue.get()
         try:
             os.makedirs("/home/rom/transcriptions", exist_ok=True)
             debug_file = f"/home/rom/transcriptions/{call_id}_tokenization.txt"
             with open(debug_file, 'a', encoding='utf-8') as f:
-                timestamp = time.strftime('%H:%M:%S')
                 f.write(f"\n[{timestamp}] Original text:\n")
                 f.write(f"  {text}\n\n")
                 f.write(f"  Split into {len(tokens)} tokens:\n")
@@ -130,5 +257,115 @@ def tokenize_response(text, language, call_id=None, save_debug=True):
                     f.write(f"    {idx}. {token}\n")
         except Exception as e:
             print(f"Warning: Failed to save tokenization debug: {e}")
+        finally:
+            _debug_queue.task_done()
+
+
+def save_debug_async(call_id, text, tokens):
+    """Queue tokenization debug output for the background writer"""
+    global _debug_thread
+    if _debug_thread is None:
+        with _debug_lock:
+            if _debug_thread is None:
+                _debug_thread = threading.Thread(target=_debug_writer, name="tokenizer-debug", daemon=True)
+                _debug_thread.start()
+    _debug_queue.put((call_id, time.strftime('%H:%M:%S'), text, list(tokens)))
+
+
+def flush_debug():
+    """Wait until all queued debug output is written"""
+    _debug_queue.join()
+
+
+def tokenize_response(text, language, call_id=None, save_debug=True):
+    """
+    Tokenize response text into smaller parts for better TTS flow
+
+    Args:
+        text (str): Text to tokenize
+        language (str): Language code ('ro', 'lt', etc.)
+        call_id (str, optional): Call ID for debug file naming
+        save_debug (bool): Whether to save debug output to disk (written in background)
+
+    Returns:
+        list: List of text tokens
+
+    Split criteria:
+    1. After punctuation: ? ! , .
+    2. Before separator words (loaded from file based on language)
+    3. Exceptions: Don't split if pattern found in exceptions file
+    """
+    tokens, _ = split_text(text, get_language_tables(language))
+
+    if not tokens:
+        tokens = [text.strip()]
+
+    # Save debug info if requested
+    if save_debug and call_id:
+        save_debug_async(call_id, text, tokens)
 
     return tokens
+
+
+class IncrementalTokenizer:
+    """
+    Tokenizer for streamed responses - emits each clause once its boundary is confirmed
+
+    A boundary is confirmed when the text after it has arrived: the char after the
+    punctuation, or the separator word plus the char after it. End of the buffer is
+    never treated as end of text until flush().
+
+    Usage:
+        tokenizer = IncrementalTokenizer('ro', call_id=call_id)
+        for delta in stream:
+            for token in tokenizer.feed(delta):
+                request_tts(token)
+        for token in tokenizer.flush():
+            request_tts(token)
+    """
+
+    def __init__(self, language, call_id=None, save_debug=True):
+        self.language = language
+        self.call_id = call_id
+        self.save_debug = save_debug
+        self.tables = get_language_tables(language)
+        self.buffer = ""  # Text after the last confirmed boundary
+        self.text = ""    # Full response so far (debug output)
+        self.tokens = []
+
+    def feed(self, delta):
+        """
+        Add a text delta
+
+        Args:
+            delta (str): Next piece of the response
+
+        Returns:
+            list: Tokens confirmed by this delta (may be empty)
+        """
+        if not delta:
+            return []
+
+        self.buffer += delta
+        self.text += delta
+
+        tokens, consumed = split_text(self.buffer, self.tables, final=False)
+        self.buffer = self.buffer[consumed:]
+        self.tokens.extend(tokens)
+        return tokens
+
+    def flush(self):
+        """
+        Response complete - return the remaining tokens
+
+        Returns:
+            list: Remaining tokens (empty if nothing is left)
+        """
+        tokens, _ = split_text(self.buffer, self.tables, final=True)
+        self.buffer = ""
+        self.tokens.extend(tokens)
+
+        if self.save_debug and self.call_id and self.tokens:
+            save_debug_async(self.call_id, self.text, self.tokens)
+
+        return tokens
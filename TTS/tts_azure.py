@@ -10,24 +10,87 @@ import numpy as np
 import queue
 import threading
 import time
-from typing import Optional, Callable
+from typing import Optional, Generator, Callable
+from .tts_base import BaseTTS
+from .resampler import StreamingResampler, resample_pcm
 
 logger = logging.getLogger(__name__)
 
-class AzureTTS:
+CHUNK_TIMEOUT = 10      # Seconds without audio before a synthesis is given up
+CANCEL_TIMEOUT = 2      # Seconds to wait for the end marker after stop_speaking
+
+
+class SynthesizerSession:
+    """One pre-connected SpeechSynthesizer with its own chunk queue (used by one request at a time)"""
+
+    def __init__(self, speech_config, name):
+        self.name = name
+        self.chunks = queue.Queue()
+
+        # audio_config=None: audio only comes back through events/results (no speaker, no shared pull stream)
+        self.synthesizer = speechsdk.SpeechSynthesizer(speech_config=speech_config, audio_config=None)
+        self.synthesizer.synthesizing.connect(self.on_synthesizing)
+        self.synthesizer.synthesis_completed.connect(self.on_synthesis_finished)
+        self.synthesizer.synthesis_canceled.connect(self.on_synthesis_finished)
+
+        # Open the websocket now so the first request doesn't pay TLS/connection setup
+        self.connected = False
+        self.connection = speechsdk.Connection.from_speech_synthesizer(self.synthesizer)
+        self.connection.connected.connect(self.on_connected)
+        self.connection.disconnected.connect(self.on_disconnected)
+        self.connection.open(True)
+
+    def on_connected(self, evt):
+        self.connected = True
+        logger.debug(f"Azure session {self.name} connected")
+
+    def on_disconnected(self, evt):
+        self.connected = False
+        logger.debug(f"Azure session {self.name} disconnected")
+
+    def on_synthesizing(self, evt):
+        """Called when audio data is being generated (streaming)"""
+        audio_data = evt.result.audio_data
+
+        if audio_data and len(audio_data) > 0:
+            # Raw 16-bit PCM for this session's consumer (resampled there)
+            self.chunks.put(audio_data)
+
+    def on_synthesis_finished(self, evt):
+        """Called when synthesis completes or is canceled"""
+        self.chunks.put(None)  # Signal end of stream
+
+    def reset(self):
+        """Drop anything left over from a previous request"""
+        while True:
+            try:
+                self.chunks.get_nowait()
+            except queue.Empty:
+                return
+
+    def rewarm(self):
+        """Reopen the connection if the service closed it while idle"""
+        if not self.connected:
+            try:
+                self.connection.open(True)
+            except Exception as e:
+                logger.warning(f"Azure session {self.name} reconnect failed: {e}")
+
+
+class AzureTTS(BaseTTS):
     """Azure TTS provider with real-time streaming support"""
 
+    # Each request checks out its own synthesizer session
+    supports_concurrent_synthesis = True
+
     def __init__(self, config: dict):
         """
         Initialize Azure TTS with configuration
         Args:
             config: Configuration dict from voice_config_manager
         """
-        self.config = config
-        self.tts_url = config.get('tts_access_link', '')
-        self.api_key = config.get('tts_secret_key', '')
-        self.language = config.get('language', 'en')
-        self.voice_settings = config.get('voice_settings', {})
+        super().__init__(config)
+        self.tts_url = self.endpoint
 
         # Parse Azure endpoint from URL
         if 'cognitiveservices.azure.com' in self.tts_url:
@@ -86,15 +149,13 @@ class AzureTTS:
         else:
             self.sample_rate = 16000  # Default
 
-        # Initialize synthesizer
-        self.synthesizer = None
+        # Pool of pre-connected synthesizer sessions (sized like the API's TTS worker pool)
+        self.pool_size = max(1, int(config.get('tts_concurrency', 3)))
+        self.sessions = queue.Queue()
+        self.session_count = 0
         self.setup_synthesizer()
 
-        # Streaming queue for real-time audio
-        self.audio_queue = queue.Queue()
-        self.is_streaming = False
-
-        logger.info(f"✅ Azure TTS initialized: region={self.region}, language={self.language}, format={audio_format_name}, sample_rate={self.sample_rate}Hz")
+        logger.info(f"✅ Azure TTS initialized: region={self.region}, language={self.language}, format={audio_format_name}, sample_rate={self.sample_rate}Hz, output_rate={self.output_rate}Hz")
 
     def setup_synthesizer(self):
         """Setup Azure Speech synthesizer with optimal settings"""
@@ -119,23 +180,13 @@ class AzureTTS:
             voice_name = self.get_voice_name()
             speech_config.speech_synthesis_voice_name = voice_name
 
-            # Enable streaming for real-time synthesis
-            # Use pull audio output stream for lowest latency
-            self.pull_stream = speechsdk.audio.PullAudioOutputStream()
-            audio_config = speechsdk.audio.AudioOutputConfig(stream=self.pull_stream)
+            self.speech_config = speech_config
 
-            # Create synthesizer with streaming support
-            self.synthesizer = speechsdk.SpeechSynthesizer(
-                speech_config=speech_config,
-                audio_config=audio_config
-            )
+            # Create and warm the session pool (each session streams through its own queue)
+            for _ in range(self.pool_size):
+                self.sessions.put(self.new_session())
 
-            # Connect events for real-time streaming
-            self.synthesizer.synthesis_started.connect(self.on_synthesis_started)
-            self.synthesizer.synthesizing.connect(self.on_synthesizing)
-            self.synthesizer.synthesis_completed.connect(self.on_synthesis_completed)
-
-            logger.info(f"Synthesizer configured: voice={voice_name}, format=Raw16Khz16BitMonoPcm")
+            logger.info(f"Synthesizer pool configured: {self.pool_size} sessions, voice={voice_name}")
 
         except Exception as e:
             logger.error(f"Failed to setup synthesizer: {e}")
@@ -158,69 +209,84 @@ class AzureTTS:
         # Implement if using managed identity
         return None
 
-    def on_synthesis_started(self, evt):
-        """Called when synthesis starts"""
-        logger.debug("Synthesis started")
-        self.is_streaming = True
-
-    def on_synthesizing(self, evt):
-        """Called when audio data is being generated (streaming)"""
-        # Get audio chunk
-        audio_data = evt.result.audio_data
-
-        if audio_data and len(audio_data) > 0:
-            # Convert to numpy array (16-bit PCM)
-            audio_np = np.frombuffer(audio_data, dtype=np.int16)
-            # Normalize to float32 [-1, 1]
-            audio_float = audio_np.astype(np.float32) / 32768.0
+    def new_session(self) -> SynthesizerSession:
+        """Create one pre-connected synthesizer session"""
+        self.session_count += 1
+        return SynthesizerSession(self.speech_config, f"s{self.session_count}")
 
-            # Put in queue for immediate playback
-            self.audio_queue.put(audio_float)
+    def checkout(self) -> SynthesizerSession:
+        """Take a session from the pool (waits if all are busy)"""
+        session = self.sessions.get()
+        session.reset()
+        return session
 
-            logger.debug(f"Streaming chunk: {len(audio_float)} samples")
-
-    def on_synthesis_completed(self, evt):
-        """Called when synthesis completes"""
-        logger.debug("Synthesis completed")
-        self.is_streaming = False
-        self.audio_queue.put(None)  # Signal end of stream
-
-    def synthesize_stream(self, text: str, callback: Optional[Callable] = None):
+    def checkin(self, session: SynthesizerSession, clean: bool = True):
+        """
+        Return a session to the pool
+        Args:
+            session: Session from checkout()
+            clean: False if its synthesizer may still deliver audio (replaced by a fresh session)
+        """
+        if not clean:
+            logger.warning(f"Azure session {session.name} not drained - replacing it")
+            try:
+                session = self.new_session()
+            except Exception as e:
+                logger.error(f"Failed to replace Azure session: {e}")
+                return
+        session.rewarm()
+        self.sessions.put(session)
+
+    def synthesize_stream_pcm(self, text: str, callback: Optional[Callable] = None) -> Generator[bytes, None, None]:
         """
         Synthesize text with streaming (lowest latency)
         Args:
             text: Text to synthesize
             callback: Optional callback for each audio chunk
         Returns:
-            Generator yielding audio chunks
+            Generator yielding int16 PCM chunks at the modem rate
         """
         logger.info(f"Starting streaming synthesis: {text[:50]}...")
 
         # Apply SSML for better control
         ssml = self.build_ssml(text)
 
-        # Start async synthesis
-        result_future = self.synthesizer.speak_ssml_async(ssml)
+        session = self.checkout()
+        finished = False
 
-        # Yield audio chunks as they arrive
-        start_time = time.time()
-        first_chunk_time = None
-        total_samples = 0
-
-        while True:
-            try:
-                # Get chunk with timeout
-                chunk = self.audio_queue.get(timeout=0.1)
+        try:
+            # Start async synthesis
+            result_future = session.synthesizer.speak_ssml_async(ssml)
+
+            # Yield audio chunks as they arrive
+            start_time = time.time()
+            first_chunk_time = None
+            total_samples = 0
+            resampler = StreamingResampler(self.sample_rate, self.output_rate)
+
+            while True:
+                try:
+                    audio_data = session.chunks.get(timeout=CHUNK_TIMEOUT)
+                except queue.Empty:
+                    logger.error(f"Azure synthesis stalled: no audio for {CHUNK_TIMEOUT}s")
+                    break
 
-                if chunk is None:
+                if audio_data is None:
                     # End of stream
+                    finished = True
                     break
 
+                # Resample to the modem rate (passthrough if the SDK format already matches)
+                audio_np = resampler.process(audio_data)
+                if not len(audio_np):
+                    continue
+                chunk = audio_np.tobytes()
+
                 if first_chunk_time is None:
                     first_chunk_time = time.time() - start_time
-                    logger.info(f"⚡ First audio chunk in {first_chunk_time*1000:.0f}ms")
+                    logger.info(f"⚡ First audio chunk in {first_chunk_time*1000:.0f}ms (session {session.name})")
 
-                total_samples += len(chunk)
+                total_samples += len(audio_np)
 
                 # Yield chunk for playback
                 yield chunk
@@ -229,20 +295,50 @@ class AzureTTS:
                 if callback:
                     callback(chunk)
 
-            except queue.Empty:
-                # Check if synthesis is still running
-                if not self.is_streaming:
-                    break
+            if not finished:
+                return
 
-        # Get final result
-        result = result_future.get()
+            tail = resampler.flush()
+            if len(tail):
+                chunk = tail.tobytes()
+                total_samples += len(tail)
+                yield chunk
+                if callback:
+                    callback(chunk)
 
-        if result.reason == speechsdk.ResultReason.SynthesizingAudioCompleted:
-            duration_sec = total_samples / self.sample_rate
-            total_time = time.time() - start_time
-            logger.info(f"✅ Synthesis complete: {duration_sec:.1f}s audio in {total_time:.1f}s")
-        else:
-            logger.error(f"Synthesis failed: {result.reason}")
+            # Get final result
+            result = result_future.get()
+
+            if result.reason == speechsdk.ResultReason.SynthesizingAudioCompleted:
+                duration_sec = total_samples / self.output_rate
+                total_time = time.time() - start_time
+                logger.info(f"✅ Synthesis complete: {duration_sec:.1f}s audio in {total_time:.1f}s")
+            else:
+                logger.error(f"Synthesis failed: {result.reason}")
+
+        finally:
+            if not finished:
+                # Abandoned (consumer stopped early or stall) - stop the synthesizer and wait for its end marker
+                finished = self.stop_session(session)
+            self.checkin(session, clean=finished)
+
+    def stop_session(self, session: SynthesizerSession) -> bool:
+        """Stop a running synthesis, True once its end marker arrived"""
+        try:
+            session.synthesizer.stop_speaking_async().get()
+        except Exception as e:
+            logger.warning(f"Azure stop_speaking failed: {e}")
+        return self.drain(session)
+
+    def drain(self, session: SynthesizerSession) -> bool:
+        """Discard queued audio up to the end marker, True if it arrived within CANCEL_TIMEOUT"""
+        deadline = time.time() + CANCEL_TIMEOUT
+        while True:
+            try:
+                if session.chunks.get(timeout=max(0.0, deadline - time.time())) is None:
+                    return True
+            except queue.Empty:
+                return False
 
     def synthesize_to_file(self, text: str, output_file: str):
         """
@@ -256,7 +352,7 @@ class AzureTTS:
         # Use file output for this
         audio_config = speechsdk.audio.AudioOutputConfig(filename=output_file)
         file_synthesizer = speechsdk.SpeechSynthesizer(
-            speech_config=self.synthesizer._speech_config,
+            speech_config=self.speech_config,
             audio_config=audio_config
         )
 
@@ -279,17 +375,24 @@ class AzureTTS:
         """
         ssml = self.build_ssml(text)
 
-        result = self.synthesizer.speak_ssml_async(ssml).get()
+        session = self.checkout()
+        clean = False
+        try:
+            result = session.synthesizer.speak_ssml_async(ssml).get()
+            # Events may still be in flight - wait for the end marker so the session goes back clean
+            clean = self.drain(session)
+        finally:
+            self.checkin(session, clean=clean)
 
         if result.reason == speechsdk.ResultReason.SynthesizingAudioCompleted:
             # Get all audio data
             audio_data = result.audio_data
 
-            # Convert to numpy
-            audio_np = np.frombuffer(audio_data, dtype=np.int16)
+            # Convert to numpy at the modem rate
+            audio_np = resample_pcm(audio_data, self.sample_rate, self.output_rate)
             audio_float = audio_np.astype(np.float32) / 32768.0
 
-            duration = len(audio_float) / self.sample_rate
+            duration = len(audio_float) / self.output_rate
             logger.info(f"Synthesized {duration:.1f}s of audio")
 
             return audio_float
@@ -355,7 +458,7 @@ class AzureTTS:
         logger.info(f"   Total time: {total*1000:.0f}ms")
 
         if audio is not None:
-            duration = len(audio) / self.sample_rate
+            duration = len(audio) / self.output_rate
             logger.info(f"   Audio duration: {duration:.1f}s")
             logger.info(f"   RTF: {total/duration:.2f}x")
 
@@ -397,7 +500,7 @@ def test_azure_tts():
     text_lt = "Labas! Tai yra balso sintezės sistemos testas."
     audio = tts_lt.synthesize_to_array(text_lt)
     if audio is not None:
-        print(f"Generated {len(audio)/tts_lt.sample_rate:.1f}s of Lithuanian audio")
+        print(f"Generated {len(audio)/tts_lt.output_rate:.1f}s of Lithuanian audio")
 
 
 if __name__ == "__main__":
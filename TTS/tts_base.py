@@ -8,12 +8,16 @@ from abc import ABC, abstractmethod
 import numpy as np
 import logging
 from typing import Optional, Generator, Callable
+from .resampler import rate_from_format
 
 logger = logging.getLogger(__name__)
 
 class BaseTTS(ABC):
     """Abstract base class for TTS providers"""
 
+    # True if overlapping synthesize_stream() calls are safe (no shared stream state)
+    supports_concurrent_synthesis = False
+
     def __init__(self, config: dict):
         """
         Initialize TTS provider
@@ -26,18 +30,47 @@ class BaseTTS(ABC):
         self.api_key = config.get('tts_secret_key', '')
         self.endpoint = config.get('tts_access_link', '')
 
+        # Providers resample to the modem rate (AT+CPCMFRM follows audio_format)
+        self.output_rate = rate_from_format(config.get('audio_format'))
+
     @abstractmethod
-    def synthesize_stream(self, text: str, callback: Optional[Callable] = None) -> Generator[np.ndarray, None, None]:
+    def synthesize_stream_pcm(self, text: str, callback: Optional[Callable] = None) -> Generator[bytes, None, None]:
         """
-        Synthesize text with streaming (lowest latency)
+        Synthesize text with streaming (lowest latency, native format)
         Args:
             text: Text to synthesize
             callback: Optional callback for each audio chunk
         Yields:
-            Audio chunks as numpy arrays (16kHz, mono, float32)
+            Audio chunks as PCM bytes (output_rate, mono, int16) - what the voice bot plays
         """
         pass
 
+    def synthesize_stream(self, text: str, callback: Optional[Callable] = None) -> Generator[np.ndarray, None, None]:
+        """
+        Synthesize text with streaming (float adapter over synthesize_stream_pcm)
+        Args:
+            text: Text to synthesize
+            callback: Optional callback for each audio chunk
+        Yields:
+            Audio chunks as numpy arrays (output_rate, mono, float32)
+        """
+        for chunk in self.synthesize_stream_pcm(text):
+            audio_float = np.frombuffer(chunk, dtype=np.int16).astype(np.float32) / 32768.0
+            yield audio_float
+            if callback:
+                callback(audio_float)
+
+    def synthesize_to_pcm(self, text: str) -> Optional[bytes]:
+        """
+        Synthesize text to PCM bytes
+        Args:
+            text: Text to synthesize
+        Returns:
+            Audio as PCM bytes (output_rate, mono, int16) or None if failed
+        """
+        audio_data = b''.join(self.synthesize_stream_pcm(text))
+        return audio_data or None
+
     @abstractmethod
     def synthesize_to_array(self, text: str) -> Optional[np.ndarray]:
         """
@@ -45,7 +78,7 @@ class BaseTTS(ABC):
         Args:
             text: Text to synthesize
         Returns:
-            Audio as numpy array (16kHz, mono, float32) or None if failed
+            Audio as numpy array (output_rate, mono, float32) or None if failed
         """
         pass
 
@@ -23,7 +23,7 @@ class GoogleTTS(BaseTTS):
         # Would require google-cloud-texttospeech package
         # from google.cloud import texttospeech
 
-    def synthesize_stream(self, text: str, callback: Optional[Callable] = None) -> Generator[np.ndarray, None, None]:
+    def synthesize_stream_pcm(self, text: str, callback: Optional[Callable] = None) -> Generator[bytes, None, None]:
         """
         Synthesize text with streaming
         TODO: Implement actual Google TTS streaming
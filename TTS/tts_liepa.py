@@ -23,7 +23,7 @@ class LiepaTTS(BaseTTS):
         # Liepa is a Lithuanian TTS system
         # API endpoint and authentication would go here
 
-    def synthesize_stream(self, text: str, callback: Optional[Callable] = None) -> Generator[np.ndarray, None, None]:
+    def synthesize_stream_pcm(self, text: str, callback: Optional[Callable] = None) -> Generator[bytes, None, None]:
         """
         Synthesize text with streaming
         TODO: Implement actual Liepa streaming
@@ -11,12 +11,19 @@ import time
 import json
 from typing import Optional, Generator, Callable
 from .tts_base import BaseTTS
+from .resampler import StreamingResampler
 
 logger = logging.getLogger(__name__)
 
 class OpenAITTS(BaseTTS):
     """OpenAI TTS provider"""
 
+    # Each synthesis is an independent HTTP request
+    supports_concurrent_synthesis = True
+
+    # response_format 'pcm' is 24kHz, 16-bit, mono
+    PCM_RATE = 24000
+
     def __init__(self, config: dict):
         """Initialize OpenAI TTS"""
         super().__init__(config)
@@ -32,14 +39,14 @@ class OpenAITTS(BaseTTS):
 
         logger.info(f"✅ OpenAI TTS initialized: model={self.model}, voice={self.voice}")
 
-    def synthesize_stream(self, text: str, callback: Optional[Callable] = None) -> Generator[np.ndarray, None, None]:
+    def synthesize_stream_pcm(self, text: str, callback: Optional[Callable] = None) -> Generator[bytes, None, None]:
         """
         Synthesize text with streaming
         Args:
             text: Text to synthesize
             callback: Optional callback for each audio chunk
         Yields:
-            Audio chunks as numpy arrays
+            Audio chunks as int16 PCM bytes at the modem rate
         """
         headers = {
             'Authorization': f'Bearer {self.api_key}',
@@ -71,35 +78,39 @@ class OpenAITTS(BaseTTS):
                 logger.error(f"OpenAI API error: {response.status_code} - {response.text}")
                 return
 
-            # Process streaming response
+            # Process streaming response (chunks may split samples - the resampler carries the odd byte)
+            resampler = StreamingResampler(self.PCM_RATE, self.output_rate)
             total_samples = 0
             for chunk in response.iter_content(chunk_size=4096):
                 if chunk:
-                    # Convert PCM bytes to numpy array
-                    # PCM format is 24kHz, 16-bit, mono
-                    audio_np = np.frombuffer(chunk, dtype=np.int16)
-
-                    # Resample from 24kHz to 16kHz
-                    # Simple decimation (not ideal but fast)
-                    audio_16k = audio_np[::3] * 2  # Every 3rd sample, amplify
-
-                    # Normalize to float32
-                    audio_float = audio_16k.astype(np.float32) / 32768.0
+                    # Resample from 24kHz to the modem rate
+                    audio_np = resampler.process(chunk)
+                    if not len(audio_np):
+                        continue
 
                     if first_chunk_time is None:
                         first_chunk_time = time.time() - start_time
                         logger.info(f"⚡ First chunk in {first_chunk_time*1000:.0f}ms")
 
-                    total_samples += len(audio_float)
+                    total_samples += len(audio_np)
+                    audio_data = audio_np.tobytes()
 
                     # Yield chunk
-                    yield audio_float
+                    yield audio_data
 
                     # Call callback if provided
                     if callback:
-                        callback(audio_float)
+                        callback(audio_data)
+
+            tail = resampler.flush()
+            if len(tail):
+                total_samples += len(tail)
+                audio_data = tail.tobytes()
+                yield audio_data
+                if callback:
+                    callback(audio_data)
 
-            duration_sec = total_samples / 16000
+            duration_sec = total_samples / self.output_rate
             total_time = time.time() - start_time
             logger.info(f"✅ Synthesis complete: {duration_sec:.1f}s audio in {total_time:.1f}s")
 
@@ -114,12 +125,10 @@ class OpenAITTS(BaseTTS):
         Returns:
             Audio as numpy array or None if failed
         """
-        chunks = []
-        for chunk in self.synthesize_stream(text):
-            chunks.append(chunk)
+        audio_data = self.synthesize_to_pcm(text)
 
-        if chunks:
-            return np.concatenate(chunks)
+        if audio_data is not None:
+            return np.frombuffer(audio_data, dtype=np.int16).astype(np.float32) / 32768.0
         return None
 
     def synthesize_to_file(self, text: str, output_file: str) -> bool:
@@ -131,16 +140,16 @@ class OpenAITTS(BaseTTS):
         Returns:
             True if successful
         """
-        audio = self.synthesize_to_array(text)
+        audio_data = self.synthesize_to_pcm(text)
 
-        if audio is not None:
+        if audio_data is not None:
             # Save as WAV file
             import wave
             with wave.open(output_file, 'wb') as wf:
                 wf.setnchannels(1)
                 wf.setsampwidth(2)
-                wf.setframerate(16000)
-                wf.writeframes((audio * 32768).astype(np.int16).tobytes())
+                wf.setframerate(self.output_rate)
+                wf.writeframes(audio_data)
 
             logger.info(f"Saved to: {output_file}")
             return True
@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+Piper Text-to-Speech Module (local, CPU)
+Runs Piper/VITS ONNX voices on the Jetson through ONNX Runtime - no network round trip,
+keeps speaking when the VPN or Internet is down.
+
+Voice files (https://github.com/rhasspy/piper voices):
+    /home/rom/piper_voices/{language}.onnx        (or config 'piper_model')
+    /home/rom/piper_voices/{language}.onnx.json   (phoneme map, sample rate, espeak voice)
+
+Phonemes come from piper_phonemize when installed, else from the espeak-ng binary.
+"""
+
+import json
+import logging
+import os
+import re
+import subprocess
+import time
+import wave
+from typing import Optional, Generator, Callable
+
+import numpy as np
+import onnxruntime as ort
+
+from .tts_base import BaseTTS
+from .resampler import StreamingResampler
+
+try:
+    from piper_phonemize import phonemize_espeak
+except ImportError:
+    phonemize_espeak = None
+
+logger = logging.getLogger(__name__)
+
+PIPER_VOICES_DIR = '/home/rom/piper_voices'
+
+# Special phonemes of the Piper phoneme_id_map
+PAD = '_'
+BOS = '^'
+EOS = '$'
+
+LANGUAGE_SWITCH = re.compile(r'\([a-z\-]+\)')  # espeak-ng "(en)...(ro)" markers
+
+
+def espeak_phonemes(text, voice):
+    """
+    IPA phonemes per clause from the espeak-ng binary (fallback for piper_phonemize)
+
+    Returns:
+        list: One list of phoneme characters per clause
+    """
+    result = subprocess.run(
+        ['espeak-ng', '-q', '--ipa', '-v', voice, text],
+        capture_output=True,
+        text=True,
+        timeout=10
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"espeak-ng failed: {result.stderr.strip()}")
+
+    sentences = []
+    for line in result.stdout.splitlines():
+        line = LANGUAGE_SWITCH.sub('', line).strip()
+        if line:
+            sentences.append(list(line))
+    return sentences
+
+
+class PiperTTS(BaseTTS):
+    """Local Piper (VITS) TTS provider on ONNX Runtime"""
+
+    def __init__(self, config: dict):
+        """Initialize Piper TTS"""
+        super().__init__(config)
+
+        self.model_path = (self.voice_settings.get('piper_model') or config.get('piper_model')
+                           or os.path.join(PIPER_VOICES_DIR, f"{self.language}.onnx"))
+
+        with open(self.model_path + '.json', 'r', encoding='utf-8') as f:
+            model_config = json.load(f)
+
+        self.sample_rate = model_config['audio']['sample_rate']
+        self.espeak_voice = model_config.get('espeak', {}).get('voice', self.language)
+        self.phoneme_id_map = model_config['phoneme_id_map']
+        self.num_speakers = model_config.get('num_speakers', 1)
+        self.speaker_id = int(self.voice_settings.get('piper_speaker', 0))
+
+        inference = model_config.get('inference', {})
+        self.noise_scale = inference.get('noise_scale', 0.667)
+        self.length_scale = inference.get('length_scale', 1.0)
+        self.noise_w = inference.get('noise_w', 0.8)
+
+        # Leave CPU for whisper/VAD running alongside
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = int(config.get('piper_threads', 2))
+        options.inter_op_num_threads = 1
+        self.session = ort.InferenceSession(self.model_path, sess_options=options,
+                                            providers=['CPUExecutionProvider'])
+
+        # First run initializes kernels/allocations - do it now, not on the first caller
+        self.infer([self.phoneme_id_map[BOS][0], self.phoneme_id_map[EOS][0]])
+
+        logger.info(f"✅ Piper TTS initialized: model={os.path.basename(self.model_path)}, "
+                    f"sample_rate={self.sample_rate}Hz, output_rate={self.output_rate}Hz, "
+                    f"phonemizer={'piper_phonemize' if phonemize_espeak else 'espeak-ng'}")
+
+    def phonemize(self, text: str) -> list:
+        """Text -> list of sentences, each a list of IPA phoneme characters"""
+        if phonemize_espeak:
+            return phonemize_espeak(text, self.espeak_voice)
+        return espeak_phonemes(text, self.espeak_voice)
+
+    def phoneme_ids(self, phonemes: list) -> list:
+        """Phonemes -> model ids (BOS, phoneme/PAD pairs, EOS as Piper expects)"""
+        ids = list(self.phoneme_id_map[BOS])
+        for phoneme in phonemes:
+            phoneme_ids = self.phoneme_id_map.get(phoneme)
+            if phoneme_ids is None:
+                continue  # Not in this voice's inventory
+            ids.extend(phoneme_ids)
+            ids.extend(self.phoneme_id_map[PAD])
+        ids.extend(self.phoneme_id_map[EOS])
+        return ids
+
+    def infer(self, ids: list) -> np.ndarray:
+        """Run the VITS model, returns int16 samples at the model rate"""
+        inputs = {
+            'input': np.array([ids], dtype=np.int64),
+            'input_lengths': np.array([len(ids)], dtype=np.int64),
+            'scales': np.array([self.noise_scale, self.length_scale / self.get_speed(), self.noise_w],
+                               dtype=np.float32)
+        }
+        if self.num_speakers > 1:
+            inputs['sid'] = np.array([self.speaker_id], dtype=np.int64)
+
+        audio = self.session.run(None, inputs)[0].squeeze()
+
+        # Same peak normalization as the Piper reference implementation
+        audio = audio * (32767.0 / max(0.01, float(np.max(np.abs(audio)))))
+        return np.clip(audio, -32768, 32767).astype(np.int16)
+
+    def synthesize_stream_pcm(self, text: str, callback: Optional[Callable] = None) -> Generator[bytes, None, None]:
+        """
+        Synthesize text sentence by sentence
+        Args:
+            text: Text to synthesize
+            callback: Optional callback for each audio chunk
+        Yields:
+            Audio chunks as int16 PCM bytes at the modem rate (one per sentence)
+        """
+        logger.info(f"Starting Piper synthesis: {text[:50]}...")
+        start_time = time.time()
+        first_chunk_time = None
+        total_samples = 0
+        resampler = StreamingResampler(self.sample_rate, self.output_rate)
+
+        try:
+            sentences = self.phonemize(text)
+        except Exception as e:
+            logger.error(f"Piper phonemization failed: {e}")
+            return
+
+        for phonemes in sentences:
+            audio_np = resampler.process(self.infer(self.phoneme_ids(phonemes)))
+            if not len(audio_np):
+                continue
+
+            if first_chunk_time is None:
+                first_chunk_time = time.time() - start_time
+                logger.info(f"⚡ First chunk in {first_chunk_time*1000:.0f}ms")
+
+            total_samples += len(audio_np)
+            audio_data = audio_np.tobytes()
+
+            yield audio_data
+
+            if callback:
+                callback(audio_data)
+
+        tail = resampler.flush()
+        if len(tail):
+            total_samples += len(tail)
+            audio_data = tail.tobytes()
+            yield audio_data
+            if callback:
+                callback(audio_data)
+
+        duration_sec = total_samples / self.output_rate
+        total_time = time.time() - start_time
+        logger.info(f"✅ Synthesis complete: {duration_sec:.1f}s audio in {total_time:.1f}s")
+
+    def synthesize_to_array(self, text: str) -> Optional[np.ndarray]:
+        """
+        Synthesize text to numpy array
+        Args:
+            text: Text to synthesize
+        Returns:
+            Audio as numpy array or None if failed
+        """
+        audio_data = self.synthesize_to_pcm(text)
+
+        if audio_data is not None:
+            return np.frombuffer(audio_data, dtype=np.int16).astype(np.float32) / 32768.0
+        return None
+
+    def synthesize_to_file(self, text: str, output_file: str) -> bool:
+        """
+        Synthesize text to WAV file
+        Args:
+            text: Text to synthesize
+            output_file: Output file path
+        Returns:
+            True if successful
+        """
+        audio_data = self.synthesize_to_pcm(text)
+
+        if audio_data is not None:
+            with wave.open(output_file, 'wb') as wf:
+                wf.setnchannels(1)
+                wf.setsampwidth(2)
+                wf.setframerate(self.output_rate)
+                wf.writeframes(audio_data)
+
+            logger.info(f"Saved to: {output_file}")
+            return True
+
+        return False
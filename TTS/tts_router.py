@@ -0,0 +1,330 @@
+#!/usr/bin/env python3
+"""
+TTS Router - Latency hedging and failover between TTS providers
+
+Wraps the configured (cloud) provider. Each request starts on the primary; if
+no audio arrived by the hedge deadline (or the primary failed), the router
+serves the cached rendering of the phrase if there is one, otherwise starts the
+same text on the secondary provider (local Piper). Whichever stream delivers
+its first chunk first is played, the other is cancelled.
+
+The deadline adapts to the primary's rolling time-to-first-chunk (p90 x 1.25),
+so only its slow tail is hedged. Decisions, win counts and TTFC percentiles are
+exported through get_stats() (GET /phone_call/status).
+"""
+
+import contextlib
+import logging
+import queue
+import threading
+import time
+import wave
+from collections import Counter, deque
+from typing import Optional, Generator, Callable
+
+import numpy as np
+
+from .tts_base import BaseTTS
+
+logger = logging.getLogger(__name__)
+
+TTFC_WINDOW = 100           # First-chunk latencies kept per provider
+MIN_SAMPLES = 10            # Use the fixed default until the primary has this many
+DEFAULT_DEADLINE = 0.8      # Seconds
+MIN_DEADLINE = 0.25
+MAX_DEADLINE = 2.0
+DEADLINE_FACTOR = 1.25      # Deadline = p90 x factor
+
+
+class LatencyTracker:
+    """Rolling window of time-to-first-chunk samples"""
+
+    def __init__(self, window=TTFC_WINDOW):
+        self.samples = deque(maxlen=window)
+        self.lock = threading.Lock()
+
+    def add(self, seconds):
+        with self.lock:
+            self.samples.append(seconds)
+
+    def percentile(self, q):
+        """q-th percentile in seconds (None without samples)"""
+        with self.lock:
+            if not self.samples:
+                return None
+            return float(np.percentile(self.samples, q))
+
+    def count(self):
+        with self.lock:
+            return len(self.samples)
+
+
+class Attempt:
+    """One provider streaming one request in a worker thread (chunks go to the shared event queue)"""
+
+    def __init__(self, router, source, text, events):
+        self.router = router
+        self.source = source
+        self.text = text
+        self.events = events
+        self.cancelled = threading.Event()
+        self.thread = threading.Thread(target=self.run, name=f'tts-{source}', daemon=True)
+        self.thread.start()
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def run(self):
+        provider = self.router.providers[self.source]
+        lock = self.router.locks[self.source]
+
+        try:
+            # Serialized providers queue here - that wait counts against the hedge deadline, not TTFC
+            with lock or contextlib.nullcontext():
+                if self.cancelled.is_set():
+                    return
+                start_time = time.time()
+                first = True
+                stream = provider.synthesize_stream_pcm(self.text)
+                try:
+                    for chunk in stream:
+                        if first:
+                            # Recorded even if the attempt lost - otherwise only fast samples shape the deadline
+                            self.router.ttfc[self.source].add(time.time() - start_time)
+                            first = False
+                        if self.cancelled.is_set():
+                            break
+                        self.events.put((self, chunk))
+                finally:
+                    # Lets the provider stop its synthesis (e.g. Azure stop_speaking)
+                    stream.close()
+        except Exception as e:
+            logger.error(f"TTS {self.source} failed: {e}")
+        finally:
+            self.events.put((self, None))  # End of this attempt
+
+
+class TTSRouter(BaseTTS):
+    """Hedges a slow primary TTS provider with a cached phrase or a secondary provider"""
+
+    # Serializes non-concurrent providers itself (per provider lock)
+    supports_concurrent_synthesis = True
+
+    def __init__(self, config: dict, primary: BaseTTS, secondary: Optional[BaseTTS] = None, phrase_cache=None):
+        """
+        Args:
+            config: Active voice config
+            primary: Configured provider (get_tts_provider)
+            secondary: Hedge/failover provider (get_fallback_tts_provider) or None
+            phrase_cache: PhraseCache for cached renderings of the same text, or None
+        """
+        self.providers = {'primary': primary, 'secondary': secondary}
+        super().__init__(config)
+        self.phrase_cache = phrase_cache
+        self.audio_format = config.get('audio_format', 'Raw8Khz16BitMonoPcm')
+        self.fixed_deadline = config.get('tts_hedge_deadline_ms')
+
+        self.locks = {source: (None if getattr(provider, 'supports_concurrent_synthesis', False) else threading.Lock())
+                      for source, provider in self.providers.items()}
+        self.ttfc = {'primary': LatencyTracker(), 'secondary': LatencyTracker()}
+
+        self.stats_lock = threading.Lock()
+        self.requests = 0
+        self.decisions = Counter()
+        self.wins = Counter()
+        self.local = threading.local()
+
+        logger.info(f"✅ TTS router: primary={type(primary).__name__}, "
+                    f"secondary={type(secondary).__name__ if secondary else 'none'}, "
+                    f"cache={'yes' if phrase_cache else 'no'}")
+
+    @property
+    def language(self):
+        return self.providers['primary'].language
+
+    @language.setter
+    def language(self, language):
+        for provider in self.providers.values():
+            if provider:
+                provider.language = language
+
+    def get_deadline(self) -> float:
+        """Seconds to wait for the primary's first chunk before hedging"""
+        if self.fixed_deadline:
+            return self.fixed_deadline / 1000.0
+        tracker = self.ttfc['primary']
+        if tracker.count() < MIN_SAMPLES:
+            return DEFAULT_DEADLINE
+        return min(MAX_DEADLINE, max(MIN_DEADLINE, tracker.percentile(90) * DEADLINE_FACTOR))
+
+    def current_source(self) -> str:
+        """Source of the last stream this thread consumed ('primary', 'secondary', 'cache' or 'none')"""
+        return getattr(self.local, 'source', 'primary')
+
+    def cached_audio(self, text: str) -> Optional[bytes]:
+        """Cached rendering of exactly this text in the active voice/format"""
+        if not self.phrase_cache:
+            return None
+        path = self.phrase_cache.lookup(text, self.get_voice_name(), self.audio_format,
+                                        self.get_speed(), self.get_pitch(), count=False)
+        if not path:
+            return None
+        try:
+            with open(path, 'rb') as f:
+                return f.read() or None
+        except OSError:
+            return None
+
+    def record(self, decision, source):
+        with self.stats_lock:
+            self.requests += 1
+            self.decisions[decision] += 1
+            if source != 'none':
+                self.wins[source] += 1
+        self.local.source = source
+
+    def synthesize_stream_pcm(self, text: str, callback: Optional[Callable] = None) -> Generator[bytes, None, None]:
+        """
+        Synthesize text on the fastest-starting source
+        Args:
+            text: Text to synthesize
+            callback: Optional callback for each audio chunk
+        Yields:
+            Audio chunks as int16 PCM bytes at the modem rate
+        """
+        events = queue.Queue()
+        attempts = [Attempt(self, 'primary', text, events)]
+        deadline = time.time() + self.get_deadline()
+        hedged = False
+        failed_over = False
+        finished = 0
+        winner = None
+        first_chunk = None
+        self.local.source = 'none'
+
+        try:
+            while winner is None:
+                try:
+                    timeout = None if hedged else max(0.0, deadline - time.time())
+                    attempt, chunk = events.get(timeout=timeout)
+                except queue.Empty:
+                    attempt, chunk = None, None
+
+                if attempt is not None and chunk is not None:
+                    winner, first_chunk = attempt, chunk
+                    break
+
+                if attempt is not None:
+                    finished += 1
+                    failed_over = failed_over or not hedged
+
+                if not hedged:
+                    # Deadline passed or primary failed without audio - hedge
+                    hedged = True
+                    logger.warning(f"⏱️ TTS primary {'failed' if attempt else 'slow'} - hedging: {text[:40]}...")
+                    audio_data = self.cached_audio(text)
+                    if audio_data:
+                        self.record('failover_cache' if failed_over else 'cache', 'cache')
+                        for other in attempts:
+                            other.cancel()
+                        yield audio_data
+                        if callback:
+                            callback(audio_data)
+                        return
+                    if self.providers['secondary']:
+                        attempts.append(Attempt(self, 'secondary', text, events))
+
+                if finished == len(attempts):
+                    self.record('failed', 'none')
+                    logger.error(f"❌ All TTS sources failed: {text[:40]}...")
+                    return
+
+            # First chunk decides - cancel the other stream
+            for other in attempts:
+                if other is not winner:
+                    other.cancel()
+
+            if not hedged:
+                decision = 'primary'
+            elif failed_over:
+                decision = f'failover_{winner.source}'
+            else:
+                decision = f'hedged_{winner.source}'
+            self.record(decision, winner.source)
+            if winner.source != 'primary':
+                logger.info(f"🏁 TTS {decision}: {text[:40]}...")
+
+            chunk = first_chunk
+            while chunk is not None:
+                yield chunk
+                if callback:
+                    callback(chunk)
+                attempt, chunk = events.get()
+                while attempt is not winner:
+                    attempt, chunk = events.get()  # Late chunks/end markers of cancelled attempts
+
+        finally:
+            for attempt in attempts:
+                attempt.cancel()
+
+    def synthesize_to_array(self, text: str) -> Optional[np.ndarray]:
+        """
+        Synthesize text to numpy array
+        Args:
+            text: Text to synthesize
+        Returns:
+            Audio as numpy array or None if failed
+        """
+        audio_data = self.synthesize_to_pcm(text)
+
+        if audio_data is not None:
+            return np.frombuffer(audio_data, dtype=np.int16).astype(np.float32) / 32768.0
+        return None
+
+    def synthesize_to_file(self, text: str, output_file: str) -> bool:
+        """
+        Synthesize text to WAV file
+        Args:
+            text: Text to synthesize
+            output_file: Output file path
+        Returns:
+            True if successful
+        """
+        audio_data = self.synthesize_to_pcm(text)
+
+        if audio_data is not None:
+            with wave.open(output_file, 'wb') as wf:
+                wf.setnchannels(1)
+                wf.setsampwidth(2)
+                wf.setframerate(self.output_rate)
+                wf.writeframes(audio_data)
+            return True
+
+        return False
+
+    def get_stats(self) -> dict:
+        """Decisions, win rates and first-chunk latency per source"""
+        with self.stats_lock:
+            requests = self.requests
+            decisions = dict(self.decisions)
+            wins = dict(self.wins)
+
+        hedged = requests - decisions.get('primary', 0) - decisions.get('failed', 0)
+        ttfc = {}
+        for source, tracker in self.ttfc.items():
+            p50, p90 = tracker.percentile(50), tracker.percentile(90)
+            ttfc[source] = {
+                'samples': tracker.count(),
+                'p50_ms': round(p50 * 1000) if p50 is not None else None,
+                'p90_ms': round(p90 * 1000) if p90 is not None else None
+            }
+
+        return {
+            'requests': requests,
+            'deadline_ms': round(self.get_deadline() * 1000),
+            'hedge_rate': round(hedged / requests, 4) if requests else 0.0,
+            'decisions': decisions,
+            'wins': wins,
+            'win_rate': {source: round(count / requests, 4) for source, count in wins.items()} if requests else {},
+            'ttfc': ttfc
+        }
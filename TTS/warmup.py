@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+TTS Warm-up - Pre-synthesize phrases for the active voice/format
+
+After a voice or format change the phrase cache is cold: the first callers
+would pay full TTS latency for the welcome message, apologies and common
+tokens. The warm-up job synthesizes everything that is missing, in parallel
+but rate limited (TTS APIs throttle, and live calls share the provider).
+
+Phrase sources:
+- Active config (welcome message, optional 'warmup_phrases' list)
+- Fallback/apology strings from the voice bot
+- Filler expressions (config 'filler_phrases' or audio_library/silence_fillers_expresions.txt)
+- Hotword lists (/home/rom/hotwords_{lang}.txt)
+
+Phrases already cached at another speed are time-stretched locally instead of
+re-synthesized (a speed change on the VPS would otherwise re-render everything).
+
+Runs inside the unified API (owns the TTS provider), started by the voice bot
+via POST /tts/warmup after fetch_voice_config_from_vps.
+"""
+
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from TTS.resampler import rate_from_format
+from TTS.time_stretch import time_stretch, choose_base, MAX_RATIO
+
+logger = logging.getLogger(__name__)
+
+FILLER_PHRASES_FILE = '/home/rom/audio_library/silence_fillers_expresions.txt'
+HOTWORDS_FILE = '/home/rom/hotwords_{language}.txt'
+
+
+def read_phrase_file(path):
+    """Non-empty lines of a phrase list (empty list if missing)"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return [line.strip() for line in f if line.strip()]
+    except OSError:
+        return []
+
+
+def collect_warmup_phrases(config, fallback_phrases=(), filler_file=FILLER_PHRASES_FILE, hotwords_file=HOTWORDS_FILE):
+    """
+    Phrases to pre-synthesize for a config, most important first
+
+    Args:
+        config: Active voice config dict
+        fallback_phrases: Apology/fallback strings used by the bot
+        filler_file: Filler expressions file (used if config has no 'filler_phrases')
+        hotwords_file: Hotwords path template ({language})
+
+    Returns:
+        list: Unique phrases
+    """
+    phrases = [config.get('welcome_message')]
+    phrases += list(fallback_phrases)
+    phrases += config.get('warmup_phrases', [])
+    phrases += config.get('filler_phrases') or read_phrase_file(filler_file)
+    if config.get('warmup_hotwords', True):
+        phrases += read_phrase_file(hotwords_file.format(language=config.get('language', 'en')))
+
+    return list(dict.fromkeys(p.strip() for p in phrases if p and p.strip()))
+
+
+class RateLimiter:
+    """Spaces out synthesis starts to at most rate_per_sec (shared by all workers)"""
+
+    def __init__(self, rate_per_sec):
+        self.interval = 1.0 / rate_per_sec if rate_per_sec else 0.0
+        self.next_slot = 0.0
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        with self.lock:
+            now = time.time()
+            wait = self.next_slot - now
+            self.next_slot = max(now, self.next_slot) + self.interval
+        if wait > 0:
+            time.sleep(wait)
+
+
+class WarmupJob:
+    """Synthesizes missing phrases of one voice/format into the phrase cache"""
+
+    def __init__(self, synthesize, phrase_cache, voice, audio_format, speed=1.0, pitch=1,
+                 max_workers=2, rate_per_sec=2.0, max_stretch_ratio=MAX_RATIO):
+        """
+        Args:
+            synthesize: Callable(text) -> PCM bytes or None
+            phrase_cache: PhraseCache to fill
+            voice, audio_format, speed, pitch: Rendering the bot will look up
+            max_workers: Parallel syntheses
+            rate_per_sec: Max synthesis starts per second
+            max_stretch_ratio: Derive from another cached speed within this ratio (0 = always synthesize)
+        """
+        self.synthesize = synthesize
+        self.phrase_cache = phrase_cache
+        self.voice = voice
+        self.audio_format = audio_format
+        self.speed = speed
+        self.pitch = pitch
+        self.max_workers = max_workers
+        self.max_stretch_ratio = max_stretch_ratio
+        self.limiter = RateLimiter(rate_per_sec)
+        self.cancelled = threading.Event()
+
+        self.lock = threading.Lock()
+        self.status = {
+            'state': 'idle',
+            'voice': voice,
+            'audio_format': audio_format,
+            'total': 0,
+            'cached': 0,
+            'synthesized': 0,
+            'derived': 0,
+            'failed': 0,
+            'seconds': 0.0
+        }
+
+    def _count(self, field):
+        with self.lock:
+            self.status[field] += 1
+
+    def _derive(self, text):
+        """Time-stretch a rendering cached at another speed (True if cached)"""
+        if not self.max_stretch_ratio or self.max_stretch_ratio <= 1.0:
+            return False
+        base = choose_base(self.phrase_cache.lookup_variants(text, self.voice, self.audio_format, self.pitch),
+                           self.speed, self.max_stretch_ratio)
+        if not base:
+            return False
+        try:
+            with open(base[1], 'rb') as f:
+                base_audio = f.read()
+            audio_data = time_stretch(base_audio, float(self.speed) / float(base[0]),
+                                      rate_from_format(self.audio_format)).tobytes()
+        except (OSError, ValueError) as e:
+            logger.warning(f"Warm-up stretch failed for '{text[:40]}': {e}")
+            return False
+        return bool(self.phrase_cache.put(text, self.voice, self.audio_format, audio_data,
+                                          self.speed, self.pitch, derived=True))
+
+    def _warm(self, text):
+        if self.cancelled.is_set():
+            return
+        if self._derive(text):
+            self._count('derived')
+            return
+        self.limiter.acquire()
+        try:
+            audio_data = self.synthesize(text)
+        except Exception as e:
+            logger.error(f"Warm-up synthesis failed for '{text[:40]}': {e}")
+            audio_data = None
+
+        if audio_data and self.phrase_cache.put(text, self.voice, self.audio_format, audio_data, self.speed, self.pitch):
+            self._count('synthesized')
+        else:
+            self._count('failed')
+
+    def run(self, phrases):
+        """
+        Synthesize all phrases not yet cached (blocking)
+
+        Returns:
+            dict: Final status
+        """
+        start = time.time()
+        missing = [text for text in phrases
+                   if not self.phrase_cache.lookup(text, self.voice, self.audio_format, self.speed, self.pitch, count=False)]
+
+        with self.lock:
+            self.status.update(state='running', total=len(phrases), cached=len(phrases) - len(missing))
+
+        logger.info(f"🔥 TTS warm-up {self.voice}/{self.audio_format}: {len(missing)}/{len(phrases)} phrases to synthesize")
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='tts-warmup') as executor:
+            list(executor.map(self._warm, missing))
+
+        with self.lock:
+            self.status['state'] = 'cancelled' if self.cancelled.is_set() else 'done'
+            self.status['seconds'] = round(time.time() - start, 2)
+            status = dict(self.status)
+
+        logger.info(f"✅ TTS warm-up {status['state']}: {status['synthesized']} synthesized, "
+                    f"{status['derived']} time-stretched, {status['cached']} already cached, "
+                    f"{status['failed']} failed in {status['seconds']}s")
+        return status
+
+    def start(self, phrases):
+        """Run in a background thread (never blocks the caller)"""
+        with self.lock:
+            self.status['state'] = 'queued'
+        thread = threading.Thread(target=self.run, args=(phrases,), name='tts-warmup', daemon=True)
+        thread.start()
+        return thread
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def get_status(self):
+        with self.lock:
+            return dict(self.status)
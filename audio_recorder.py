@@ -90,6 +90,44 @@ def pcm_to_opus_ogg(pcm_data, sample_rate=16000, output_path=None):
         logger.error(f"Error in PCM→OGG conversion: {e}")
         return None
 
+def ogg_to_pcm(ogg_path, sample_rate=8000):
+    """
+    Decode an OGG (Opus) recording back to raw PCM (inverse of pcm_to_opus_ogg)
+
+    Args:
+        ogg_path: Path - OGG file (e.g. {call_id}_incoming_raw_{ts}.ogg)
+        sample_rate: int - output sample rate (resampled by ffmpeg if needed)
+
+    Returns:
+        bytes - raw PCM (16-bit signed little-endian, mono)
+        None - if decoding failed
+    """
+    try:
+        cmd = [
+            'ffmpeg',
+            '-v', 'error',
+            '-i', str(ogg_path),
+            '-f', 's16le',              # Output format: signed 16-bit little-endian
+            '-ar', str(sample_rate),    # Sample rate
+            '-ac', '1',                 # Mono
+            'pipe:1'
+        ]
+
+        result = subprocess.run(cmd, capture_output=True, timeout=60)
+
+        if result.returncode == 0:
+            return result.stdout
+
+        logger.error(f"FFmpeg OGG→PCM failed: {result.stderr.decode()}")
+        return None
+
+    except subprocess.TimeoutExpired:
+        logger.error(f"OGG→PCM conversion timeout: {ogg_path}")
+        return None
+    except Exception as e:
+        logger.error(f"Error in OGG→PCM conversion: {e}")
+        return None
+
 class AsyncAudioRecorder:
     """Asynchronously records audio streams to OGG Opus files (direct PCM conversion)"""
 
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Tokenizer Benchmark
+Compares the compiled TTS response tokenizer against the original
+character-by-character implementation on real bot responses.
+
+Responses are read from the "  Bot: ..." lines of the call transcriptions:
+    /home/rom/transcriptions/*_transcription.txt
+
+Both implementations must produce identical tokens - any difference is printed
+and the script exits with status 1.
+
+Usage:
+    python3 benchmark_tokenizer.py --language ro
+    python3 benchmark_tokenizer.py --language lt --repeat 20 --show-diff 5
+"""
+
+import argparse
+import glob
+import re
+import statistics
+import sys
+import time
+
+from TTS.tokenizer import load_exceptions, load_separators, tokenize_response
+
+TRANSCRIPTIONS_GLOB = "/home/rom/transcriptions/*_transcription.txt"
+
+# Used when no transcriptions are available (and always, to cover edge cases)
+BUILTIN_SAMPLES = [
+    "Bună ziua! Cu ce vă pot ajuta astăzi?",
+    "Desigur, dvs. puteți veni mâine la ora 10, dar vă rog să confirmați și apoi vă trimitem un SMS.",
+    "Laba diena. Kuo galiu padėti? Jūsų užsakymas paruoštas, bet kurjeris vėluoja.",
+    "Sure, we have a slot at 3.30 pm and another one at 5, or you can call back tomorrow.",
+    "Ok... ok,ok! Wait?! yes",
+    "   Spaces   around   and   inside   ",
+    "",
+]
+
+
+def legacy_tokenize(text, language):
+    """Original implementation (reads files, one regex per separator per character)"""
+    separator_words = load_separators(language)
+    exceptions = load_exceptions(language)
+
+    tokens = []
+    current_token = ""
+    i = 0
+
+    while i < len(text):
+        char = text[i]
+        current_token += char
+        should_split = False
+
+        if char in '?!,.':
+            is_exception = False
+            for exception in exceptions:
+                if current_token.rstrip().endswith(exception):
+                    is_exception = True
+                    break
+
+            if not is_exception:
+                if i + 1 >= len(text) or text[i + 1] in ' \n\t':
+                    should_split = True
+
+        if not should_split and separator_words:
+            remaining_text = text[i + 1:]
+            for separator_word in separator_words:
+                pattern = r'^\s+(' + re.escape(separator_word) + r')(\s|[?!,.]|$)'
+                match = re.match(pattern, remaining_text, re.IGNORECASE)
+                if match:
+                    should_split = True
+                    break
+
+        if should_split:
+            token = current_token.strip()
+            if token:
+                tokens.append(token)
+            current_token = ""
+
+        i += 1
+
+    if current_token.strip():
+        tokens.append(current_token.strip())
+
+    if not tokens:
+        tokens = [text.strip()]
+
+    return tokens
+
+
+def load_responses(pattern):
+    """Collect bot responses from transcription files"""
+    responses = []
+    for path in sorted(glob.glob(pattern)):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    if line.startswith("  Bot: "):
+                        responses.append(line[len("  Bot: "):].rstrip('\n'))
+        except Exception as e:
+            print(f"Warning: Failed to read {path}: {e}")
+    return responses
+
+
+def time_calls(func, texts, language, repeat):
+    """Per-call latencies in microseconds"""
+    timings = []
+    for _ in range(repeat):
+        for text in texts:
+            start = time.perf_counter()
+            func(text, language)
+            timings.append((time.perf_counter() - start) * 1e6)
+    return timings
+
+
+def describe(timings):
+    ordered = sorted(timings)
+    p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+    return f"mean {statistics.mean(ordered):8.1f}µs  p50 {statistics.median(ordered):8.1f}µs  p99 {p99:8.1f}µs"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark compiled vs legacy TTS response tokenizer")
+    parser.add_argument('--language', default='ro', help="Language code for separators/exceptions (default: ro)")
+    parser.add_argument('--transcriptions', default=TRANSCRIPTIONS_GLOB, help="Glob of transcription files")
+    parser.add_argument('--repeat', type=int, default=5, help="Passes over the corpus (default: 5)")
+    parser.add_argument('--show-diff', type=int, default=10, help="Max mismatches to print (default: 10)")
+    args = parser.parse_args()
+
+    responses = load_responses(args.transcriptions)
+    print(f"📄 {len(responses)} bot responses from {args.transcriptions}")
+    texts = responses + BUILTIN_SAMPLES
+
+    separators = load_separators(args.language)
+    exceptions = load_exceptions(args.language)
+    print(f"🔤 Language {args.language}: {len(separators)} separator words, {len(exceptions)} exceptions")
+
+    # Correctness first
+    mismatches = 0
+    for text in texts:
+        expected = legacy_tokenize(text, args.language)
+        actual = tokenize_response(text, args.language, save_debug=False)
+        if expected != actual:
+            mismatches += 1
+            if mismatches <= args.show_diff:
+                print(f"\n❌ Mismatch for: {text!r}")
+                print(f"   legacy:   {expected}")
+                print(f"   compiled: {actual}")
+
+    if mismatches:
+        print(f"\n❌ {mismatches}/{len(texts)} responses tokenized differently")
+    else:
+        print(f"✅ Identical tokens for all {len(texts)} responses")
+
+    # Timing (warm the compiled tables first so the one-off compile is not counted)
+    tokenize_response("", args.language, save_debug=False)
+    compiled = time_calls(lambda t, lang: tokenize_response(t, lang, save_debug=False), texts, args.language, args.repeat)
+    legacy = time_calls(legacy_tokenize, texts, args.language, args.repeat)
+
+    print(f"\n⏱️  {len(texts)} responses x {args.repeat} passes")
+    print(f"   legacy:   {describe(legacy)}")
+    print(f"   compiled: {describe(compiled)}")
+    print(f"   speedup:  {statistics.mean(legacy) / max(statistics.mean(compiled), 1e-9):.1f}x")
+
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,363 @@
+#!/usr/bin/env python3
+"""
+TTS Provider Benchmark
+Runs the BaseTTS implementations against a local stand-in for the cloud API so
+provider code (streaming, resampling, routing) can be compared between commits
+without network noise.
+
+Mock server (separate process, so its CPU is not counted):
+    POST /v1/audio/speech   OpenAI-compatible 24kHz int16 PCM stream
+    Query parameters override the defaults per provider: ?ttfb_ms=300&speed=4
+
+Providers:
+    openai   OpenAITTS against the mock
+    router   TTSRouter: slow mock primary hedged by a fast mock secondary
+    piper    PiperTTS (local ONNX, runs only if the voice file exists)
+    azure    not benchmarked - the Speech SDK talks its own websocket protocol
+             to Microsoft and cannot be pointed at a local server
+    google/liepa placeholders (no audio)
+
+Metrics per provider: time to first chunk, real-time factor (wall / audio
+seconds), client CPU seconds per second of audio, peak Python allocations
+(median of tracemalloc passes) and process RSS.
+
+Usage:
+    python3 benchmark_tts.py --output /tmp/tts_bench.json
+    python3 benchmark_tts.py --ttfb-ms 150 --speed 3 --repeat 10
+    python3 benchmark_tts.py --compare /tmp/tts_bench_before.json --output /tmp/tts_bench.json
+"""
+
+import argparse
+import json
+import logging
+import math
+import multiprocessing
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+MOCK_RATE = 24000          # OpenAI 'pcm' response format
+CHARS_PER_SECOND = 15      # Synthetic speech length from text length
+
+SAMPLE_TEXTS = [
+    "Bună ziua!",
+    "Cu ce vă pot ajuta astăzi?",
+    "Desigur, puteți veni mâine la ora zece, iar noi vă trimitem confirmarea prin SMS.",
+    "Laba diena. Kuo galiu padėti?",
+    "Jūsų užsakymas paruoštas, bet kurjeris šiek tiek vėluoja.",
+    "Sure, we have a slot at half past three and another one at five.",
+]
+
+# Lower is better for all of these (compare mode)
+COMPARED_METRICS = ['ttfc_ms_p50', 'ttfc_ms_p90', 'rtf_mean', 'cpu_per_audio_sec', 'peak_alloc_mb']
+PEAK_ALLOC_PASSES = 3      # tracemalloc passes per text, median taken
+
+
+def synthetic_pcm(text):
+    """Deterministic speech-like 24kHz int16 audio, length proportional to the text"""
+    samples = max(1, int(len(text) / CHARS_PER_SECOND * MOCK_RATE))
+    t = np.arange(samples) / MOCK_RATE
+    pitch = 140 + 40 * np.sin(2 * np.pi * 3 * t)
+    phase = 2 * np.pi * np.cumsum(pitch) / MOCK_RATE
+    envelope = 0.5 + 0.5 * np.sin(2 * np.pi * 4 * t) ** 2
+    audio = 0.3 * envelope * (np.sin(phase) + 0.5 * np.sin(2 * phase) + 0.25 * np.sin(3 * phase))
+    return (audio * 32767).astype(np.int16).tobytes()
+
+
+class MockSpeechHandler(BaseHTTPRequestHandler):
+    """OpenAI /v1/audio/speech stand-in with configurable TTFB and throughput"""
+
+    protocol_version = 'HTTP/1.1'
+    ttfb_ms = 250
+    speed = 4.0           # Audio delivered at this multiple of real time
+    chunk_bytes = 4800    # 100ms at 24kHz
+
+    def do_POST(self):
+        url = urllib.parse.urlparse(self.path)
+        if url.path != '/v1/audio/speech':
+            self.send_response(404)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        params = urllib.parse.parse_qs(url.query)
+        ttfb_ms = float(params.get('ttfb_ms', [self.ttfb_ms])[0])
+        speed = float(params.get('speed', [self.speed])[0])
+
+        body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        audio = synthetic_pcm(body.get('input', ''))
+
+        time.sleep(ttfb_ms / 1000.0)
+        self.send_response(200)
+        self.send_header('Content-Type', 'audio/pcm')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+
+        # Odd chunk sizes on purpose - real HTTP chunks split samples too
+        chunk_bytes = self.chunk_bytes + 1
+        interval = chunk_bytes / 2 / MOCK_RATE / speed
+        start = time.time()
+        try:
+            for i, offset in enumerate(range(0, len(audio), chunk_bytes)):
+                delay = start + i * interval - time.time()
+                if delay > 0:
+                    time.sleep(delay)
+                chunk = audio[offset:offset + chunk_bytes]
+                self.wfile.write(f"{len(chunk):X}\r\n".encode() + chunk + b"\r\n")
+                self.wfile.flush()
+            self.wfile.write(b"0\r\n\r\n")
+        except ConnectionError:
+            self.close_connection = True  # Client cancelled the stream (router hedging)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def run_mock_server(port_queue, ttfb_ms, speed):
+    MockSpeechHandler.ttfb_ms = ttfb_ms
+    MockSpeechHandler.speed = speed
+    server = ThreadingHTTPServer(('127.0.0.1', 0), MockSpeechHandler)
+    port_queue.put(server.server_address[1])
+    server.serve_forever()
+
+
+def start_mock_server(ttfb_ms, speed):
+    """Start the mock in its own process, returns (process, base_url)"""
+    port_queue = multiprocessing.Queue()
+    process = multiprocessing.Process(target=run_mock_server, args=(port_queue, ttfb_ms, speed), daemon=True)
+    process.start()
+    return process, f"http://127.0.0.1:{port_queue.get(timeout=10)}/v1/audio/speech"
+
+
+def build_providers(args, base_url):
+    """Benchmarkable providers {name: provider} and skipped ones {name: reason}"""
+    from TTS.tts_openai import OpenAITTS
+
+    config = {
+        'tts_secret_key': 'benchmark',
+        'language': 'ro',
+        'audio_format': args.audio_format,
+        'voice_settings': {'voice': 'alloy', 'speed': 1.0},
+    }
+    providers = {}
+    skipped = {'azure': 'Speech SDK cannot be pointed at a local mock server',
+               'google': 'placeholder (no audio)',
+               'liepa': 'placeholder (no audio)'}
+
+    providers['openai'] = OpenAITTS(dict(config, tts_access_link=base_url))
+
+    from TTS.tts_router import TTSRouter
+    slow = OpenAITTS(dict(config, tts_access_link=f"{base_url}?ttfb_ms={args.router_primary_ttfb_ms}"))
+    fast = OpenAITTS(dict(config, tts_access_link=base_url))
+    providers['router'] = TTSRouter(dict(config, tts_hedge_deadline_ms=args.router_deadline_ms), slow, fast)
+
+    try:
+        from TTS.tts_piper import PiperTTS
+        providers['piper'] = PiperTTS(config)
+    except Exception as e:
+        skipped['piper'] = f"unavailable: {e}"
+
+    return providers, skipped
+
+
+def measure(provider, text, output_rate):
+    """One synthesis: (ttfc_s, wall_s, cpu_s, audio_s)"""
+    start_wall = time.perf_counter()
+    start_cpu = time.process_time()
+    ttfc = None
+    audio_bytes = 0
+
+    for chunk in provider.synthesize_stream_pcm(text):
+        if ttfc is None:
+            ttfc = time.perf_counter() - start_wall
+        audio_bytes += len(chunk)
+
+    wall = time.perf_counter() - start_wall
+    cpu = time.process_time() - start_cpu
+    return ttfc, wall, cpu, audio_bytes / 2 / output_rate
+
+
+def wait_for_attempts(timeout=10):
+    """Wait until no TTSRouter attempt thread (tts-primary/tts-secondary) is running"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if not any(thread.name.startswith('tts-') for thread in threading.enumerate()):
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def peak_allocation(provider, text, passes=PEAK_ALLOC_PASSES):
+    """
+    Peak Python/numpy allocation of one synthesis in MB (separate pass - tracemalloc slows the code)
+
+    Cancelled router attempts keep running after the winner finished. Each pass
+    starts with none left from earlier syntheses and ends once its own are done,
+    so the peak only counts this synthesis; the median of passes smooths the rest.
+    """
+    peaks = []
+    for _ in range(passes):
+        wait_for_attempts()
+        tracemalloc.start()
+        try:
+            for _ in provider.synthesize_stream_pcm(text):
+                pass
+            wait_for_attempts()
+            peaks.append(tracemalloc.get_traced_memory()[1] / 1e6)
+        finally:
+            tracemalloc.stop()
+    return statistics.median(peaks)
+
+
+def percentile(values, q):
+    values = sorted(values)
+    index = max(0, math.ceil(q / 100 * len(values)) - 1)
+    return values[index]
+
+
+def benchmark(name, provider, texts, repeat):
+    """Run every text repeat times, returns the provider's summary dict"""
+    output_rate = provider.output_rate
+    provider.synthesize_to_pcm(texts[0])  # Warm-up (connections, kernels, filter taps)
+
+    ttfcs, rtfs = [], []
+    total_cpu = total_audio = 0.0
+    failures = 0
+    for _ in range(repeat):
+        for text in texts:
+            ttfc, wall, cpu, audio = measure(provider, text, output_rate)
+            if ttfc is None or not audio:
+                failures += 1
+                continue
+            ttfcs.append(ttfc * 1000)
+            rtfs.append(wall / audio)
+            total_cpu += cpu
+            total_audio += audio
+
+    if not ttfcs:
+        return {'provider': name, 'failures': failures, 'error': 'no audio'}
+
+    return {
+        'provider': name,
+        'runs': len(ttfcs),
+        'failures': failures,
+        'audio_seconds': round(total_audio, 2),
+        'ttfc_ms_p50': round(statistics.median(ttfcs), 1),
+        'ttfc_ms_p90': round(percentile(ttfcs, 90), 1),
+        'rtf_mean': round(statistics.mean(rtfs), 4),
+        'cpu_per_audio_sec': round(total_cpu / total_audio, 4),
+        'peak_alloc_mb': round(max(peak_allocation(provider, text) for text in texts), 2),
+        'rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        'stats': provider.get_stats() if hasattr(provider, 'get_stats') else None
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def compare(baseline, current, tolerance):
+    """Print metric deltas, returns the number of regressions beyond tolerance"""
+    regressions = 0
+    baseline_results = {r['provider']: r for r in baseline.get('results', [])}
+
+    print(f"\n📊 Compare with {baseline.get('commit') or 'baseline'} (tolerance {tolerance:.0%})")
+    for result in current['results']:
+        before = baseline_results.get(result['provider'])
+        if not before or 'error' in before or 'error' in result:
+            print(f"   {result['provider']}: no comparable baseline")
+            continue
+        for metric in COMPARED_METRICS:
+            old, new = before.get(metric), result.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            flag = '❌' if change > tolerance else ('✅' if change < -tolerance else '  ')
+            regressions += change > tolerance
+            print(f"   {flag} {result['provider']:8s} {metric:18s} {old:10.3f} → {new:10.3f} ({change:+.1%})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark TTS providers against a local mock server")
+    parser.add_argument('--providers', default='openai,router,piper', help="Comma separated (default: openai,router,piper)")
+    parser.add_argument('--ttfb-ms', type=float, default=250, help="Mock time to first byte (default: 250)")
+    parser.add_argument('--speed', type=float, default=4.0, help="Mock throughput as multiple of real time (default: 4)")
+    parser.add_argument('--router-primary-ttfb-ms', type=float, default=1500, help="Slow primary behind the router")
+    parser.add_argument('--router-deadline-ms', type=float, default=500, help="Router hedge deadline")
+    parser.add_argument('--audio-format', default='Raw8Khz16BitMonoPcm', help="Output format (modem rate)")
+    parser.add_argument('--repeat', type=int, default=3, help="Passes over the sample texts (default: 3)")
+    parser.add_argument('--output', help="Write JSON results to this file")
+    parser.add_argument('--compare', help="Baseline JSON to compare against (exit 1 on regression)")
+    parser.add_argument('--tolerance', type=float, default=0.10, help="Allowed relative regression (default: 0.10)")
+    args = parser.parse_args()
+
+    # Hedging warnings are expected here - show errors only
+    logging.basicConfig(level=logging.ERROR, format='%(message)s')
+
+    process, base_url = start_mock_server(args.ttfb_ms, args.speed)
+    print(f"🧪 Mock OpenAI speech server: {base_url} (TTFB {args.ttfb_ms:.0f}ms, {args.speed:g}x real time)")
+
+    try:
+        providers, skipped = build_providers(args, base_url)
+        wanted = [name.strip() for name in args.providers.split(',') if name.strip()]
+
+        results = []
+        for name in wanted:
+            if name not in providers:
+                print(f"⏭️  {name}: {skipped.get(name, 'unknown provider')}")
+                continue
+            result = benchmark(name, providers[name], SAMPLE_TEXTS, args.repeat)
+            results.append(result)
+            if 'error' in result:
+                print(f"❌ {name}: {result['error']} ({result['failures']} failures)")
+            else:
+                print(f"⏱️  {name:8s} TTFC p50 {result['ttfc_ms_p50']:7.1f}ms  p90 {result['ttfc_ms_p90']:7.1f}ms  "
+                      f"RTF {result['rtf_mean']:.3f}  CPU/audio-s {result['cpu_per_audio_sec']:.4f}  "
+                      f"alloc {result['peak_alloc_mb']:.2f}MB  RSS {result['rss_mb']:.0f}MB")
+    finally:
+        process.terminate()
+
+    report = {
+        'commit': git_commit(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'settings': {
+            'ttfb_ms': args.ttfb_ms,
+            'speed': args.speed,
+            'audio_format': args.audio_format,
+            'repeat': args.repeat,
+            'router_primary_ttfb_ms': args.router_primary_ttfb_ms,
+            'router_deadline_ms': args.router_deadline_ms
+        },
+        'skipped': skipped,
+        'results': results
+    }
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"💾 Results written to {args.output}")
+
+    regressions = 0
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            regressions = compare(json.load(f), report, args.tolerance)
+
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -23,6 +23,7 @@ class CallProfiler:
 
         # Summary data
         self.vad_chunks = 0
+        self.end_of_turn = None
 
         # Output directory
         self.output_dir = Path('/home/rom/timing_analysis')
@@ -65,6 +66,10 @@ class CallProfiler:
         """Set VAD chunk count for summary"""
         self.vad_chunks = count
 
+    def set_end_of_turn(self, summary):
+        """Set adaptive end-of-turn summary"""
+        self.end_of_turn = summary
+
     def save(self):
         """Save profiling data to JSON file"""
         # Calculate total duration
@@ -76,7 +81,8 @@ class CallProfiler:
             'start_time': self.start_timestamp,
             'duration': duration,
             'summary': {
-                'vad_chunks': self.vad_chunks
+                'vad_chunks': self.vad_chunks,
+                'end_of_turn': self.end_of_turn
             },
             'events': self.events
         }
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Adaptive End-of-Turn Detector
+Replaces the fixed 550ms/800ms dual silence thresholds with per-call,
+per-language thresholds learned from the caller's own pauses
+
+How it adapts:
+1. Starts from the language default (see docs/PROGRESSIVE_TRANSCRIPTION.md)
+2. Learns the caller's intra-turn pause distribution (pauses followed by more speech)
+3. Blends the learned 90th percentile with the language default as evidence grows
+4. Short utterances ("da", "yes") end sooner, long utterances get more patience
+5. Premature cuts (caller resumes right after end signal) push the threshold up
+
+Every decision is logged to the call profiler for offline evaluation
+"""
+
+import logging
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+# Ideal end-of-turn pause per language (ms) - from PROGRESSIVE_TRANSCRIPTION.md tuning guide
+LANGUAGE_END_OF_TURN_MS = {
+    'en': 800,
+    'ro': 800,
+    'lt': 900,
+    'es': 700,
+    'de': 1000,
+    'fr': 750
+}
+
+# Gap between "send audio" threshold and "end signal" threshold (800 - 550)
+DEFAULT_AUDIO_LEAD_MS = 250
+
+
+def percentile(values, pct):
+    """Linear-interpolated percentile of a small list (no numpy needed)"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * pct / 100.0
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    fraction = position - lower
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * fraction
+
+
+class AdaptiveEndOfTurn:
+    """Per-call adaptive silence thresholds for end-of-turn detection"""
+
+    def __init__(self, language='en', config=None, profiler=None):
+        """
+        Args:
+            language: Call language code ('ro', 'lt', 'en', ...)
+            config: voice_config dict (optional eot_* overrides)
+            profiler: CallProfiler for decision logging (optional)
+        """
+        config = config or {}
+        self.language = language
+        self.profiler = profiler
+
+        # Fixed mode keeps the legacy 550/800 behaviour (or configured values)
+        self.enabled = config.get('adaptive_end_of_turn', True)
+
+        self.base_end_ms = config.get(
+            'end_sentence_threshold_ms',
+            LANGUAGE_END_OF_TURN_MS.get(language, 800)
+        )
+        self.audio_lead_ms = config.get('eot_audio_lead_ms', DEFAULT_AUDIO_LEAD_MS)
+
+        # Bounds - adaptation never leaves this window
+        self.min_end_ms = config.get('eot_min_ms', 450)
+        self.max_end_ms = config.get('eot_max_ms', 1200)
+        self.min_audio_ms = config.get('eot_min_audio_ms', 200)
+
+        # Learning parameters
+        self.margin_ms = config.get('eot_margin_ms', 120)  # Safety margin above p90 pause
+        self.prior_weight = config.get('eot_prior_weight', 5)  # Observations worth the language default
+        self.min_pause_ms = config.get('eot_min_pause_ms', 100)  # Ignore VAD flicker
+        self.short_utterance_ms = config.get('eot_short_utterance_ms', 1200)
+        self.long_utterance_ms = config.get('eot_long_utterance_ms', 4000)
+        self.short_factor = config.get('eot_short_factor', 0.85)
+        self.long_factor = config.get('eot_long_factor', 1.1)
+        self.premature_window_ms = config.get('eot_premature_window_ms', 1500)
+
+        # Observed intra-turn pauses (ms), most recent only
+        self.pauses = deque(maxlen=config.get('eot_history', 40))
+
+        # Stats for summary
+        self.turns = 0
+        self.premature_ends = 0
+
+        logger.info(f"End-of-turn detector: {'adaptive' if self.enabled else 'fixed'} "
+                    f"(lang={language}, base={self.base_end_ms}ms, "
+                    f"bounds={self.min_end_ms}-{self.max_end_ms}ms)")
+
+    def observe_pause(self, pause_ms):
+        """Record a pause that was followed by more speech (caller not done)"""
+        if pause_ms < self.min_pause_ms:
+            return
+        self.pauses.append(pause_ms)
+
+    def observe_resumption(self, gap_after_end_ms, end_ms):
+        """
+        Caller resumed speaking shortly after an end signal
+
+        Args:
+            gap_after_end_ms: Time between end signal and new speech
+            end_ms: Threshold that produced the end signal
+        Returns:
+            True if this counted as a premature end-of-turn
+        """
+        if gap_after_end_ms > self.premature_window_ms:
+            return False
+
+        # Full pause = silence before the end signal + gap after it
+        self.premature_ends += 1
+        self.observe_pause(end_ms + gap_after_end_ms)
+        self._log('eot_premature', {
+            'gap_after_end_ms': int(gap_after_end_ms),
+            'end_ms': int(end_ms)
+        })
+        return True
+
+    def thresholds(self, utterance_ms):
+        """
+        Get (audio_chunk_ms, end_sentence_ms) for the pause that just started
+
+        Args:
+            utterance_ms: Speech duration so far in the current turn
+        Returns:
+            tuple: (audio_chunk_threshold_ms, end_sentence_threshold_ms)
+        """
+        if not self.enabled:
+            return self.base_end_ms - self.audio_lead_ms, self.base_end_ms
+
+        end_ms = self.base_end_ms
+
+        # Blend learned pause distribution with language prior
+        observed = len(self.pauses)
+        if observed:
+            learned_ms = percentile(list(self.pauses), 90) + self.margin_ms
+            weight = observed / (observed + self.prior_weight)
+            end_ms = weight * learned_ms + (1 - weight) * self.base_end_ms
+
+        # Utterance length: short answers rarely continue, long stories pause more
+        if utterance_ms < self.short_utterance_ms:
+            end_ms *= self.short_factor
+        elif utterance_ms > self.long_utterance_ms:
+            end_ms *= self.long_factor
+
+        end_ms = int(min(max(end_ms, self.min_end_ms), self.max_end_ms))
+        audio_ms = max(end_ms - self.audio_lead_ms, self.min_audio_ms)
+
+        return audio_ms, end_ms
+
+    def record_turn_end(self, utterance_ms, audio_ms, end_ms):
+        """Log an end-of-turn decision for offline evaluation"""
+        self.turns += 1
+        details = {
+            'language': self.language,
+            'utterance_ms': int(utterance_ms),
+            'audio_ms': int(audio_ms),
+            'end_ms': int(end_ms),
+            'fixed_end_ms': self.base_end_ms,
+            'observed_pauses': len(self.pauses),
+            'pause_p90_ms': int(percentile(list(self.pauses), 90)),
+            'adaptive': self.enabled
+        }
+        logger.info(f"⏱️ End-of-turn @{end_ms}ms (audio@{audio_ms}ms, utterance {utterance_ms:.0f}ms, "
+                    f"{len(self.pauses)} pauses observed)")
+        self._log('eot_decision', details)
+
+    def summary(self):
+        """Summary for profiler output"""
+        return {
+            'language': self.language,
+            'adaptive': self.enabled,
+            'turns': self.turns,
+            'premature_ends': self.premature_ends,
+            'observed_pauses': len(self.pauses),
+            'pause_p50_ms': int(percentile(list(self.pauses), 50)),
+            'pause_p90_ms': int(percentile(list(self.pauses), 90))
+        }
+
+    def _log(self, event_name, details):
+        """Send decision to profiler (saved to /home/rom/timing_analysis)"""
+        if self.profiler:
+            self.profiler.log_event(event_name, details)
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+Filler Scheduler - Latency masking while waiting on the VPS
+Plays a short cached filler ("ok", "bine", "supratau"...) when the VPS response
+for an end-of-turn chunk is slower than a configurable delay
+
+Fillers come from the synced library:
+    /home/rom/audio_library/{audio_format}/{voice}/silence_fills/*.pcm
+
+Rules:
+- Only after end-of-turn (caller silent) and only while the VPS request is pending
+- Never the same filler twice in a row
+- When the real response audio arrives the filler is cut with a short fade-out
+"""
+
+import logging
+import random
+import threading
+import time
+from collections import deque
+from pathlib import Path
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class FillerScheduler:
+    """Schedules latency-masking fillers for one call"""
+
+    def __init__(self, filler_dir, sample_rate=8000, delay_ms=700, fade_ms=20, max_filler_ms=1500, can_play=None):
+        """
+        Args:
+            filler_dir: Directory with cached filler PCM (silence_fills/)
+            sample_rate: Modem sample rate of the PCM files
+            delay_ms: Start filler if VPS response is slower than this
+            fade_ms: Fade-out length when cutting a filler
+            max_filler_ms: Ignore fillers longer than this (must stay short)
+            can_play: Callable returning True if bot may speak now (caller silent, line idle)
+        """
+        self.filler_dir = Path(filler_dir)
+        self.sample_rate = sample_rate
+        self.delay_ms = delay_ms
+        self.fade_bytes = int(sample_rate * fade_ms / 1000) * 2
+        self.max_filler_bytes = int(sample_rate * max_filler_ms / 1000) * 2
+        self.chunk_size = 1280 if sample_rate == 16000 else 640  # 40ms, same as TTS playback
+        self.can_play = can_play or (lambda: True)
+
+        self.fillers = {}  # name -> PCM bytes
+        self.last_filler = None
+
+        # Pending VPS requests {chunk_num: start_time}
+        self.pending = {}
+        self.timer = None
+
+        # Playback state
+        self.chunks = deque()
+        self.cut_requested = False
+        self.lock = threading.Lock()
+
+        # Stats
+        self.played = 0
+        self.cut_count = 0
+
+        self.load()
+
+    def load(self):
+        """Load short filler recordings into memory"""
+        if not self.filler_dir.is_dir():
+            logger.info(f"No filler directory: {self.filler_dir} - fillers disabled")
+            return
+
+        for path in sorted(self.filler_dir.iterdir()):
+            if path.suffix not in ('.pcm', '.raw'):
+                continue
+            try:
+                data = path.read_bytes()
+            except Exception as e:
+                logger.error(f"Failed to load filler {path.name}: {e}")
+                continue
+
+            if not data or len(data) > self.max_filler_bytes:
+                logger.debug(f"Skipping filler {path.name} ({len(data)} bytes)")
+                continue
+
+            self.fillers[path.stem] = data[:len(data) - len(data) % 2]
+
+        logger.info(f"🗣️ Loaded {len(self.fillers)} fillers from {self.filler_dir} (delay {self.delay_ms}ms)")
+
+    @property
+    def enabled(self):
+        return bool(self.fillers)
+
+    def request_started(self, chunk_num):
+        """VPS request for a chunk has been sent"""
+        with self.lock:
+            self.pending[chunk_num] = time.time()
+
+    def end_of_turn(self, chunk_num):
+        """Caller finished speaking - arm filler for the pending request"""
+        if not self.enabled:
+            return
+
+        with self.lock:
+            started = self.pending.get(chunk_num)
+            if started is None:
+                return  # Response already arrived (or request never sent)
+
+            if self.timer:
+                self.timer.cancel()
+
+            remaining = max(0.0, self.delay_ms / 1000.0 - (time.time() - started))
+            self.timer = threading.Timer(remaining, self._fire, args=(chunk_num,))
+            self.timer.daemon = True
+            self.timer.start()
+
+    def response_received(self, chunk_num):
+        """VPS answered (success or error) - no filler needed anymore"""
+        with self.lock:
+            self.pending.pop(chunk_num, None)
+            if self.timer and not self.pending:
+                self.timer.cancel()
+                self.timer = None
+
+    def _fire(self, chunk_num):
+        """Timer expired - start a filler if still waiting"""
+        with self.lock:
+            self.timer = None
+            if chunk_num not in self.pending or self.chunks:
+                return
+            if not self.can_play():
+                logger.debug("Filler skipped - caller speaking or bot already talking")
+                return
+
+            # Never repeat the same filler back to back
+            choices = [name for name in self.fillers if name != self.last_filler] or list(self.fillers)
+            name = random.choice(choices)
+            self.last_filler = name
+
+            data = self.fillers[name]
+            self.chunks.extend(data[i:i + self.chunk_size] for i in range(0, len(data), self.chunk_size))
+            self.cut_requested = False
+            self.played += 1
+            waited_ms = (time.time() - self.pending[chunk_num]) * 1000
+
+        logger.info(f"🗣️ VPS slow ({waited_ms:.0f}ms) - playing filler '{name}'")
+
+    def cut(self):
+        """Real response audio is ready - end filler cleanly"""
+        with self.lock:
+            self.pending.clear()
+            if self.timer:
+                self.timer.cancel()
+                self.timer = None
+            if self.chunks:
+                self.cut_requested = True
+
+    def next_chunk(self):
+        """
+        Next filler chunk for the playback thread
+
+        Returns:
+            bytes or None if no filler is playing
+        """
+        with self.lock:
+            if not self.chunks:
+                return None
+
+            chunk = self.chunks.popleft()
+            if not self.cut_requested:
+                return chunk
+
+            # Cut: short linear fade-out instead of an audible click, drop the rest
+            self.chunks.clear()
+            self.cut_requested = False
+            self.cut_count += 1
+
+        tail = np.frombuffer(chunk[:self.fade_bytes], dtype=np.int16)
+        ramp = np.linspace(1.0, 0.0, len(tail), dtype=np.float32)
+        logger.debug("Filler cut - real response ready")
+        return (tail * ramp).astype(np.int16).tobytes()
+
+    def stop(self):
+        """Call ended - cancel everything"""
+        with self.lock:
+            if self.timer:
+                self.timer.cancel()
+                self.timer = None
+            self.pending.clear()
+            self.chunks.clear()
@@ -0,0 +1,389 @@
+#!/usr/bin/env python3
+"""
+Streaming Speech Segmenter - Pure 3-tier segmentation state machine
+Extracted from SIM7600VoiceBot.audio_capture_thread (no serial I/O, no TTS, no recorder)
+
+Consumes (frame, is_speech, t) and emits event dicts:
+- speech_start:      Caller started speaking
+- speech_resumed:    Speech resumed after audio was sent (pending end signal cancelled)
+- progressive_chunk: TIER 2 - phrase pause during long speech (audio, no end signal)
+- audio_chunk:       TIER 0 - first threshold (550ms default), audio for VPS
+- end_sentence:      TIER 0/1 - second threshold (800ms default), caller finished
+- noise_timeout:     TIER 3 - speech longer than max_speech_duration_ms (noise)
+
+Batch mode replays recorded incoming_raw OGG files faster than real time:
+    python3 segmenter.py /home/rom/audio_wav/call_123_incoming_raw_456.ogg
+"""
+
+import argparse
+import json
+import logging
+import sys
+
+import numpy as np
+
+from end_of_turn import AdaptiveEndOfTurn
+
+# WebRTC VAD (same detector as the live bot)
+try:
+    import webrtcvad
+    WEBRTC_VAD_AVAILABLE = True
+except ImportError:
+    WEBRTC_VAD_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# Minimum speech before the first threshold may send audio (10 frames = 200ms)
+MIN_SPEECH_FRAMES = 10
+
+# Energy threshold used when WebRTC VAD is unavailable (matches live bot)
+ENERGY_THRESHOLD = 500
+
+
+class Segmenter:
+    """Streaming segmentation state machine (progressive chunk, dual threshold, noise cutoff)"""
+
+    def __init__(self, config=None, end_of_turn=None, sample_rate=8000, frame_duration_ms=20):
+        """
+        Args:
+            config: voice_config dict (phrase_pause_ms, long_speech_threshold_ms,
+                    max_speech_duration_ms, audio_chunk_threshold_ms, end_sentence_threshold_ms)
+            end_of_turn: AdaptiveEndOfTurn instance (None = fixed dual thresholds from config)
+            sample_rate: PCM sample rate of frames (for event durations)
+            frame_duration_ms: Duration of one frame
+        """
+        config = config or {}
+        self.sample_rate = sample_rate
+        self.frame_duration_ms = frame_duration_ms
+        self.end_of_turn = end_of_turn
+
+        # Fixed dual thresholds (used when no adaptive detector)
+        self.fixed_audio_ms = config.get('audio_chunk_threshold_ms', 550)
+        self.fixed_end_ms = config.get('end_sentence_threshold_ms', 800)
+
+        self.phrase_pause_ms = config.get('phrase_pause_ms', 350)
+        self.long_speech_threshold_ms = config.get('long_speech_threshold_ms', 4500)
+        self.max_speech_duration_ms = config.get('max_speech_duration_ms', 6500)
+        self.phrase_pause_frames = self.phrase_pause_ms // frame_duration_ms
+
+        # Current dual thresholds (recomputed at the start of each pause)
+        self.audio_chunk_ms, self.end_sentence_ms = self._thresholds(0)
+
+        # State tracking
+        self.audio_buffer = []
+        self.silence_frames = 0
+        self.speech_frames = 0
+        self.in_speech = False
+        self.speech_start_time = 0
+        self.last_chunk_sent_time = 0
+        self.last_end_time = None  # For premature end-of-turn detection
+        self.audio_chunk_sent = False
+        self.end_signal_sent = False
+        self.chunk_num = 0
+        self.vad_chunk_count = 0
+
+    def _thresholds(self, utterance_ms):
+        """Get (audio_chunk_ms, end_sentence_ms) for a new pause"""
+        if self.end_of_turn:
+            return self.end_of_turn.thresholds(utterance_ms)
+        return self.fixed_audio_ms, self.fixed_end_ms
+
+    def mark_bot_speaking(self):
+        """Bot started talking - caller speech after this is a reply, not a premature cut"""
+        self.last_end_time = None
+
+    def process(self, frame, is_speech, t):
+        """
+        Process one frame
+
+        Args:
+            frame: bytes - raw PCM frame
+            is_speech: bool - VAD decision for this frame
+            t: float - frame timestamp in seconds (time.time() live, frame clock offline)
+        Returns:
+            list: Events emitted by this frame (usually empty)
+        """
+        events = []
+
+        if is_speech:
+            if not self.in_speech:
+                self.in_speech = True
+                self.speech_start_time = t
+                self.speech_frames = 0
+                self.last_chunk_sent_time = t
+
+                event = {'type': 'speech_start', 't': t}
+
+                # Caller resumed right after our end signal - threshold was too short
+                if self.last_end_time is not None:
+                    gap_ms = (t - self.last_end_time) * 1000
+                    event['gap_after_end_ms'] = gap_ms
+                    if self.end_of_turn:
+                        event['premature'] = self.end_of_turn.observe_resumption(gap_ms, self.end_sentence_ms)
+                    self.last_end_time = None
+
+                events.append(event)
+
+            elif self.silence_frames > 0 and self.end_of_turn:
+                # Intra-turn pause (caller continued) - feed the adaptive detector
+                self.end_of_turn.observe_pause(self.silence_frames * self.frame_duration_ms)
+
+            self.speech_frames += 1
+            self.silence_frames = 0
+
+            # Speech resumed between thresholds - cancel pending end signal
+            if self.audio_chunk_sent and not self.end_signal_sent:
+                self.audio_chunk_sent = False
+                events.append({'type': 'speech_resumed', 't': t, 'chunk_num': self.chunk_num})
+
+            speech_duration_ms = (t - self.speech_start_time) * 1000
+
+            # TIER 3: Maximum speech duration exceeded - probably noise
+            if speech_duration_ms > self.max_speech_duration_ms:
+                events.append({
+                    'type': 'noise_timeout',
+                    't': t,
+                    'speech_duration_ms': speech_duration_ms,
+                    'discarded_bytes': sum(len(f) for f in self.audio_buffer)
+                })
+
+                # Discard buffered audio (it's noise)
+                self.audio_buffer = []
+                self.in_speech = False
+                self.speech_frames = 0
+                self.silence_frames = 0
+                return events
+
+            self.audio_buffer.append(frame)
+            return events
+
+        # Silence
+        self.silence_frames += 1
+
+        if not self.in_speech:
+            return events
+
+        # Collect silence too (for natural audio)
+        self.audio_buffer.append(frame)
+        speech_duration_ms = (t - self.speech_start_time) * 1000
+
+        # New pause - pick thresholds for it
+        if self.silence_frames == 1:
+            self.audio_chunk_ms, self.end_sentence_ms = self._thresholds(speech_duration_ms)
+
+        # TIER 2: Progressive transcription - short phrase pause during long speech
+        if speech_duration_ms > self.long_speech_threshold_ms and self.silence_frames >= self.phrase_pause_frames:
+            interval_ms = (t - self.last_chunk_sent_time) * 1000
+
+            if interval_ms >= self.long_speech_threshold_ms and self.audio_buffer:
+                events.append({
+                    'type': 'progressive_chunk',
+                    't': t,
+                    'pcm_data': b''.join(self.audio_buffer),
+                    'frames': len(self.audio_buffer),
+                    'speech_duration_ms': speech_duration_ms,
+                    'interval_ms': interval_ms
+                })
+
+                # Clear buffer but continue collecting
+                self.audio_buffer = []
+                self.last_chunk_sent_time = t
+                self.silence_frames = 0
+
+        audio_chunk_frames = self.audio_chunk_ms // self.frame_duration_ms
+        end_sentence_frames = self.end_sentence_ms // self.frame_duration_ms
+
+        # TIER 0: First threshold - send audio to VPS
+        if self.silence_frames >= audio_chunk_frames and not self.audio_chunk_sent:
+            if self.speech_frames > MIN_SPEECH_FRAMES:
+                self.chunk_num += 1
+
+                if self.audio_buffer:
+                    pcm_data = b''.join(self.audio_buffer)
+                    events.append({
+                        'type': 'audio_chunk',
+                        't': t,
+                        'pcm_data': pcm_data,
+                        'chunk_num': self.chunk_num,
+                        'duration': len(pcm_data) / (self.sample_rate * 2),
+                        'threshold_ms': self.audio_chunk_ms
+                    })
+
+                self.audio_chunk_sent = True
+
+        # Second threshold - caller finished, send end signal
+        elif self.silence_frames >= end_sentence_frames and self.audio_chunk_sent and not self.end_signal_sent:
+            self.end_signal_sent = True
+
+            if self.end_of_turn:
+                self.end_of_turn.record_turn_end(speech_duration_ms, self.audio_chunk_ms, self.end_sentence_ms)
+
+            remaining_bytes = sum(len(f) for f in self.audio_buffer)
+            if self.audio_buffer:
+                self.vad_chunk_count += 1
+
+            events.append({
+                'type': 'end_sentence',
+                't': t,
+                'chunk_num': self.chunk_num,
+                'speech_frames': self.speech_frames,
+                'speech_duration_ms': speech_duration_ms,
+                'threshold_ms': self.end_sentence_ms,
+                'audio_threshold_ms': self.audio_chunk_ms,
+                'remaining_bytes': remaining_bytes
+            })
+
+            # Reset state for next utterance
+            self.audio_buffer = []
+            self.in_speech = False
+            self.speech_frames = 0
+            self.silence_frames = 0
+            self.audio_chunk_sent = False
+            self.end_signal_sent = False
+            self.last_end_time = t
+
+        return events
+
+    def run(self, frames):
+        """
+        Batch mode - process a whole sequence of frames
+
+        Args:
+            frames: Iterable of (frame, is_speech, t)
+        Returns:
+            list: All emitted events in order
+        """
+        events = []
+        for frame, is_speech, t in frames:
+            events.extend(self.process(frame, is_speech, t))
+        return events
+
+
+def split_frames(pcm_data, sample_rate=8000, frame_duration_ms=20):
+    """Split raw PCM into complete VAD frames (trailing partial frame dropped)"""
+    frame_size = int(sample_rate * frame_duration_ms / 1000) * 2
+    usable = len(pcm_data) - len(pcm_data) % frame_size
+    return [pcm_data[i:i + frame_size] for i in range(0, usable, frame_size)]
+
+
+def classify_frames(frames, sample_rate=8000, vad_mode=3):
+    """
+    Run the live bot's speech detection over frames
+
+    Args:
+        frames: List of PCM frames (10/20/30ms)
+        sample_rate: Frame sample rate
+        vad_mode: WebRTC VAD aggressiveness (0-3)
+    Returns:
+        list: is_speech bool per frame
+    """
+    if WEBRTC_VAD_AVAILABLE:
+        vad = webrtcvad.Vad(vad_mode)
+        decisions = []
+        for frame in frames:
+            try:
+                decisions.append(vad.is_speech(frame, sample_rate))
+            except Exception:
+                decisions.append(True)  # Same fallback as live bot
+        return decisions
+
+    # No VAD - simple energy-based detection (vectorized over all frames)
+    if not frames:
+        return []
+    samples = np.frombuffer(b''.join(frames), dtype=np.int16).reshape(len(frames), -1)
+    energy = np.abs(samples.astype(np.int32)).mean(axis=1)
+    return (energy > ENERGY_THRESHOLD).tolist()
+
+
+def replay_pcm(pcm_data, config=None, vad_mode=3, sample_rate=8000, frame_duration_ms=20,
+               adaptive=False, language='en', speech=None):
+    """
+    Replay raw PCM through VAD + Segmenter on a synthetic frame clock
+
+    Args:
+        pcm_data: Raw PCM bytes (16-bit mono)
+        config: Threshold config (see Segmenter)
+        vad_mode: WebRTC VAD aggressiveness
+        sample_rate: PCM sample rate
+        frame_duration_ms: Frame duration
+        adaptive: Use AdaptiveEndOfTurn instead of fixed dual thresholds
+        language: Language for adaptive defaults
+        speech: Precomputed is_speech list (skips VAD)
+    Returns:
+        tuple: (events, is_speech list)
+    """
+    frames = split_frames(pcm_data, sample_rate, frame_duration_ms)
+    if speech is None:
+        speech = classify_frames(frames, sample_rate, vad_mode)
+
+    end_of_turn = AdaptiveEndOfTurn(language, config) if adaptive else None
+    segmenter = Segmenter(config, end_of_turn, sample_rate, frame_duration_ms)
+
+    step = frame_duration_ms / 1000.0
+    events = segmenter.run(
+        (frame, is_speech, (i + 1) * step) for i, (frame, is_speech) in enumerate(zip(frames, speech))
+    )
+    return events, speech
+
+
+def replay_recording(ogg_path, config=None, vad_mode=3, sample_rate=8000, adaptive=False, language='en'):
+    """
+    Replay a recorded incoming_raw OGG through the segmentation logic
+
+    Returns:
+        list: Events (empty if decoding failed)
+    """
+    from audio_recorder import ogg_to_pcm
+
+    pcm_data = ogg_to_pcm(ogg_path, sample_rate)
+    if not pcm_data:
+        return []
+
+    events, _ = replay_pcm(pcm_data, config, vad_mode, sample_rate, adaptive=adaptive, language=language)
+    return events
+
+
+def main():
+    """Replay recordings and print segmentation events"""
+    parser = argparse.ArgumentParser(description='Replay incoming_raw recordings through the Segmenter')
+    parser.add_argument('recordings', nargs='+', help='incoming_raw OGG files')
+    parser.add_argument('--config', help='voice_config.json for thresholds')
+    parser.add_argument('--vad-mode', type=int, default=3, help='WebRTC VAD mode (0-3)')
+    parser.add_argument('--sample-rate', type=int, default=8000, help='Capture sample rate')
+    parser.add_argument('--adaptive', action='store_true', help='Use adaptive end-of-turn thresholds')
+    parser.add_argument('--json', action='store_true', help='Print events as JSON lines')
+    args = parser.parse_args()
+
+    config = {}
+    if args.config:
+        with open(args.config, 'r') as f:
+            config = json.load(f)
+
+    for path in args.recordings:
+        events = replay_recording(path, config, args.vad_mode, args.sample_rate,
+                                  adaptive=args.adaptive, language=config.get('language', 'en'))
+
+        for event in events:
+            # PCM payloads are not printable - report their size instead
+            printable = {k: v for k, v in event.items() if k != 'pcm_data'}
+            if 'pcm_data' in event:
+                printable['bytes'] = len(event['pcm_data'])
+
+            if args.json:
+                print(json.dumps({'recording': path, **printable}))
+            else:
+                print(f"{event['t']:8.2f}s  {event['type']:<18} "
+                      + ' '.join(f"{k}={v:.0f}" if isinstance(v, float) else f"{k}={v}"
+                                 for k, v in printable.items() if k not in ('t', 'type')))
+
+        if not args.json:
+            uploads = sum(1 for e in events if e['type'] in ('audio_chunk', 'progressive_chunk'))
+            turns = sum(1 for e in events if e['type'] == 'end_sentence')
+            print(f"{path}: {turns} turns, {uploads} uploads\n")
+
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+    sys.exit(main())
@@ -28,9 +28,19 @@ import re
 # Import audio recorder and profiler
 from audio_recorder import CallAudioRecorder
 from call_profiler import CallProfiler
+from end_of_turn import AdaptiveEndOfTurn
+from segmenter import Segmenter
+from filler_scheduler import FillerScheduler
+import vps_stream
+from TTS.phrase_cache import PhraseCache, HotPhraseCache
+from TTS.audio_pack import AudioPackSet
+from TTS.warmup import collect_warmup_phrases, read_phrase_file, FILLER_PHRASES_FILE
+from TTS.token_frequency import top_tokens
+from TTS.time_stretch import time_stretch, choose_base, MAX_RATIO
+from TTS.resampler import rate_from_format
 
 # Import tokenizer
-from TTS.tokenizer import tokenize_response
+from TTS.tokenizer import tokenize_response, IncrementalTokenizer
 
 # WebRTC VAD (lightweight real-time VAD)
 try:
@@ -75,6 +85,14 @@ logger.setLevel(LOG_LEVEL)
 logger.addHandler(file_handler)
 logger.addHandler(console_handler)
 
+# Fixed fallback/apology phrases - kept in the hot cache so the error path never waits on disk
+APOLOGY_REPEAT = "Ne cerem scuze, vă rog să repetați"
+APOLOGY_TECHNICAL = "Ne cerem scuze, am avut o problemă tehnică"
+APOLOGY_GENERIC = "Ne cerem scuze, am avut o problemă"
+HOLD_ON = "Un moment, vă rog"
+FALLBACK_PHRASES = [APOLOGY_REPEAT, APOLOGY_TECHNICAL, APOLOGY_GENERIC, HOLD_ON]
+
+
 class SIM7600VoiceBot:
     """Main voice bot for SIM7600G-H modem"""
 
@@ -86,6 +104,11 @@ class SIM7600VoiceBot:
         self.ser = None  # AT command serial port
         self.audio_serial = None  # Audio PCM serial port
 
+        # AT port sharing: voice commands, the line reader and the direct SMS sender take turns
+        self.at_lock = threading.RLock()
+        self.modem_lines = queue.Queue()  # Unsolicited lines the SMS sender read for us (RING, +CLIP, ...)
+        self.sms_sender = None
+
         # Audio configuration
         self.sample_rate = 8000  # 8kHz for telephony (updated dynamically based on webhook)
         self.channels = 1  # Mono
@@ -98,13 +121,30 @@ class SIM7600VoiceBot:
         self.session_id = None
         self.caller_id = None  # Phone number of caller (extracted from +CLIP)
 
-        # TTS cache tracking {tmp_filename: {'text': str, 'voice': str, 'format': str, 'from_cache': bool}}
+        # TTS cache tracking {tmp_filename: {'text': str, 'voice': str, 'format': str, 'speed': float, 'pitch': float, 'from_cache': bool}}
         self.tts_metadata = {}
 
+        # Content-addressed phrase cache (hash of text/voice/format/prosody, SQLite index, LRU under byte budget)
+        # Packed library (one mmap'ed data file per format/voice, built by sync-audio-library)
+        self.audio_packs = AudioPackSet()
+        self.phrase_cache = PhraseCache(packs=self.audio_packs)
+        # Hottest phrases as PCM in RAM (welcome, apologies, fillers, top tokens) - preloaded on config load
+        self.hot_cache = HotPhraseCache()
+
+        # Ordered multi-token TTS: every request gets an id, every VPS response a response id
+        self.tts_request_counter = 0
+        self.tts_file_seq = 0  # Cache-hit files written this call (unique names within one millisecond)
+        self.vps_response_counter = 0
+        self.api_responses = set()  # Response ids with at least one token synthesized by the API
+        self.file_responses = set()  # Response ids with a cached token waiting in /tmp for the playback thread
+
         # Audio recorder and profiler
         self.audio_recorder = None
         self.profiler = None
 
+        # Latency-masking fillers (created per call once config is known)
+        self.filler_scheduler = None
+
         # Modem initialization retry counter
         self.init_retry_count = 0
         self.max_init_retries = 3
@@ -132,6 +172,8 @@ class SIM7600VoiceBot:
         # VPS endpoints
         self.vps_webhook = "http://10.100.0.1:8088/webhook/phone_call/receive"
         self.local_tts_api = "http://localhost:8088/phone_call"
+        # Keep-alive to the unified API: TTS tokens and warm-up reuse pooled connections (no TCP setup per token)
+        self.local_http = requests.Session()
         self.vps_transcription_url = os.getenv('VPS_TRANSCRIPTION_URL', 'http://10.100.0.1:9000/api/transcribe')
 
         # VPS transcription state
@@ -234,6 +276,12 @@ class SIM7600VoiceBot:
                     # ONLY NOW overwrite in-memory config (after disk write succeeds)
                     self.voice_config = new_config
                     logger.debug(f"✅ Config fetched and loaded into memory")
+
+                    # Welcome message / voice may have changed - refresh in-memory phrases
+                    self.preload_hot_phrases()
+                    # Synthesize missing phrases for this voice in the background (never blocks calls)
+                    if self.voice_config.get('tts_warmup', True):
+                        threading.Thread(target=self.run_tts_warmup, name='tts-warmup', daemon=True).start()
                     return True
                 else:
                     logger.error(f"VPS returned error: {data.get('message')} - using cached config")
@@ -314,60 +362,144 @@ class SIM7600VoiceBot:
         else:
             return 'raw-8khz-16bit-mono-pcm'
 
-    def sanitize_filename(self, text):
-        """
-        Clean text to create safe filesystem filename
-        - Remove all non-alphanumeric characters
-        - Convert to lowercase
-        - Limit length to 200 chars
-        - Use hash for very long texts
-        """
-        # Remove non-alphanumeric characters (keep only a-z, A-Z, 0-9)
-        cleaned = re.sub(r'[^a-zA-Z0-9]', '', text)
-        cleaned = cleaned.lower()
+    def queue_tts_audio(self, audio_data):
+        """Hand complete TTS audio to the playback loop (cuts any filler, records outgoing audio)"""
+        # Real response ready - end any filler cleanly
+        if self.filler_scheduler:
+            self.filler_scheduler.cut()
+
+        # Record outgoing TTS audio (pack hits are memoryviews)
+        if self.audio_recorder:
+            self.audio_recorder.record_outgoing_tts(bytes(audio_data))
+
+        # Queue audio chunks (dynamic size based on sample rate)
+        chunk_size = 1280 if self.sample_rate == 16000 else 640  # 40ms chunks (1280 for 16kHz, 640 for 8kHz)
+        for i in range(0, len(audio_data), chunk_size):
+            chunk = audio_data[i:i+chunk_size]
+            if chunk:  # Only queue non-empty chunks
+                self.audio_out_queue.put(chunk)
+
+    def preload_hot_phrases(self):
+        """Load welcome message, apologies, fillers and top-N tokens into the in-memory cache"""
+        if not self.voice_config:
+            return
+
+        try:
+            audio_format = self.voice_config.get('audio_format', self.get_audio_format_fallback())
+            voice, speed, pitch = self.get_voice_prosody()
+            self.hot_cache.max_bytes = self.voice_config.get('hot_cache_max_bytes', self.hot_cache.max_bytes)
+
+            fillers = self.voice_config.get('filler_phrases') or read_phrase_file(FILLER_PHRASES_FILE)
+            phrases = [self.voice_config.get('welcome_message')] + FALLBACK_PHRASES + fillers
+            phrases += self.phrase_cache.top_phrases(voice, audio_format, speed, pitch,
+                                                     limit=self.voice_config.get('hot_cache_top_n', 50))
+
+            start = time.time()
+            self.hot_cache.clear()
+            loaded = self.hot_cache.preload(phrases, self.phrase_cache, voice, audio_format, speed, pitch)
+            stats = self.hot_cache.stats()
+            logger.info(f"🔥 Hot phrase cache: {loaded}/{len(set(p for p in phrases if p))} phrases preloaded "
+                        f"({stats['bytes'] / 1024:.0f}KB, {(time.time() - start) * 1000:.0f}ms)")
+        except Exception as e:
+            logger.error(f"Hot phrase preload failed: {e}")
 
-        # If too long, use first 150 chars + hash of full text
-        if len(cleaned) > 200:
-            text_hash = hashlib.md5(text.encode()).hexdigest()[:8]
-            cleaned = cleaned[:150] + '_' + text_hash
+    def run_tts_warmup(self, poll_interval=2, max_wait=600):
+        """Ask the unified API to pre-synthesize missing phrases, then refresh the hot cache"""
+        try:
+            audio_format = self.voice_config.get('audio_format', self.get_audio_format_fallback())
+            voice, speed, pitch = self.get_voice_prosody()
+            phrases = collect_warmup_phrases(self.voice_config, FALLBACK_PHRASES)
+
+            # Most frequent tokens from past calls (what callers actually hear)
+            frequent = top_tokens(self.voice_config.get('language', 'en'), voice,
+                                  top_n=self.voice_config.get('warmup_top_tokens', 200),
+                                  min_count=self.voice_config.get('warmup_min_count', 3))
+            phrases = list(dict.fromkeys(phrases + frequent))
+
+            warmup_url = self.local_tts_api.replace('/phone_call', '/tts/warmup')
+            response = self.local_http.post(warmup_url, json={
+                'phrases': phrases,
+                'voice': voice,
+                'audio_format': audio_format,
+                'speed': speed,
+                'pitch': pitch,
+                'language': self.voice_config.get('language', 'en')
+            }, timeout=5)
+            if response.status_code != 202:
+                logger.warning(f"TTS warm-up not started: HTTP {response.status_code} {response.text[:100]}")
+                return
 
-        return cleaned
+            logger.info(f"🔥 TTS warm-up started: {len(phrases)} phrases for {voice}/{audio_format}")
 
-    def get_cache_path(self, text, audio_format, voice):
+            # Wait for the job, then pull freshly synthesized phrases into RAM
+            deadline = time.time() + max_wait
+            while time.time() < deadline:
+                time.sleep(poll_interval)
+                status = self.local_http.get(warmup_url, timeout=5).json().get('warmup', {})
+                if status.get('state') not in ('queued', 'running'):
+                    logger.info(f"✅ TTS warm-up {status.get('state')}: {status.get('synthesized', 0)} synthesized, "
+                                f"{status.get('cached', 0)} already cached, {status.get('failed', 0)} failed")
+                    if status.get('synthesized'):
+                        self.preload_hot_phrases()
+                    return
+
+            logger.warning("TTS warm-up still running after 10 min - not waiting any longer")
+
+        except Exception as e:
+            logger.warning(f"TTS warm-up failed: {e}")
+
+    def get_voice_prosody(self):
+        """Voice, speed and pitch from config (part of the phrase cache key)"""
+        voice_settings = self.voice_config.get('voice_settings', {})
+        return (
+            voice_settings.get('voice', 'default'),
+            voice_settings.get('speed', 1.0),
+            voice_settings.get('pitch', 1)
+        )
+
+    def stretch_cached_variant(self, text, voice, audio_format, speed, pitch):
         """
-        Generate cache file path for TTS audio
-        Path: /home/rom/audio_library/{audio_format}/{voice}/{filename}.raw
+        Derive this speed from a rendering cached at another speed (time-stretch)
+
+        Returns:
+            (audio bytes, cache path) or (None, None) if no base within the quality threshold
         """
-        base_dir = Path('/home/rom/audio_library')
+        max_ratio = self.voice_config.get('tts_stretch_max_ratio', MAX_RATIO)
+        if not max_ratio or max_ratio <= 1.0:
+            return None, None
 
-        # Create directory structure: audio_library/format/voice/
-        cache_dir = base_dir / audio_format / voice
-        cache_dir.mkdir(parents=True, exist_ok=True)
+        base = choose_base(self.phrase_cache.lookup_variants(text, voice, audio_format, pitch), speed, max_ratio)
+        if not base:
+            return None, None
 
-        # Generate filename from text
-        filename = self.sanitize_filename(text) + '.raw'
+        base_speed, base_path = base
+        base_audio = self.load_from_cache(base_path)
+        if not base_audio:
+            return None, None
 
-        return cache_dir / filename
+        start = time.time()
+        audio_data = time_stretch(base_audio, float(speed) / float(base_speed), rate_from_format(audio_format)).tobytes()
+        logger.info(f"⏩ Stretched cached '{text[:40]}...' {base_speed}→{speed} in {(time.time() - start)*1000:.0f}ms")
+
+        # Cache the variant so the next call is a plain hit
+        cache_path = self.phrase_cache.put(text, voice, audio_format, audio_data, speed, pitch, derived=True)
+        return audio_data, cache_path
 
     def load_from_cache(self, cache_path):
-        """Load cached audio file"""
+        """Load cached audio (path from phrase_cache.lookup, None on miss) - pack first, then file"""
+        if not cache_path:
+            return None
+        audio_data = self.audio_packs.read(cache_path)
+        if audio_data is not None:
+            return audio_data
         try:
-            if cache_path.exists():
-                with open(cache_path, 'rb') as f:
-                    audio_data = f.read()
-                return audio_data
+            with open(cache_path, 'rb') as f:
+                return f.read()
         except Exception as e:
             logger.error(f"Cache load error: {e}")
+            self.phrase_cache.invalidate(cache_path)
         return None
 
-    def save_to_cache(self, cache_path, audio_data):
-        """Save audio to cache"""
-        try:
-            with open(cache_path, 'wb') as f:
-                f.write(audio_data)
-        except Exception as e:
-            logger.error(f"Cache save error: {e}")
-
     def load_vad_model(self):
         """Load WebRTC VAD for speech detection"""
         if not WEBRTC_VAD_AVAILABLE:
@@ -607,13 +739,17 @@ class SIM7600VoiceBot:
             return False
 
     def send_at_command(self, command, timeout=1, delay=1):
-        """Send AT command and get response
+        """Send AT command and get response (waits for an SMS submission in progress)
 
         Args:
             command: AT command to send
             timeout: Serial port read timeout (max wait for modem response)
             delay: Time to wait after sending command before reading response
         """
+        with self.at_lock:
+            return self._send_at_command(command, timeout, delay)
+
+    def _send_at_command(self, command, timeout, delay):
         try:
             # Set serial timeout dynamically
             self.ser.timeout = timeout
@@ -674,6 +810,7 @@ class SIM7600VoiceBot:
         self.call_id = temp_call_id
         self.session_id = f"session_{int(time.time())}"
         self.caller_id = caller_id  # Store for use throughout call lifecycle
+        self.tts_file_seq = 0
 
         # Initialize profiler to track entire call flow
         self.profiler = CallProfiler(self.call_id)
@@ -793,6 +930,20 @@ class SIM7600VoiceBot:
             logger.error(f"Failed to load config from disk: {e}")
             self.profiler.stop_timer('config_load', 'disk_config_load', {'success': False, 'error': str(e)})
 
+        # Phrase cache byte budget (SD card)
+        self.phrase_cache.max_bytes = self.voice_config.get('tts_cache_max_bytes', self.phrase_cache.max_bytes)
+
+        # Latency-masking fillers: play a cached "ok"/"bine" if the VPS is slow
+        if self.voice_config.get('filler_enabled', True):
+            audio_format = self.voice_config.get('audio_format', self.get_audio_format_fallback())
+            voice = self.voice_config.get('voice_settings', {}).get('voice', 'default')
+            self.filler_scheduler = FillerScheduler(
+                f"/home/rom/audio_library/{audio_format}/{voice}/silence_fills",
+                sample_rate=self.sample_rate,
+                delay_ms=self.voice_config.get('filler_delay_ms', 700),
+                can_play=lambda: self.caller_is_silent.is_set() and not self.bot_is_speaking and self.audio_out_queue.empty()
+            )
+
         # STORE WELCOME MESSAGE (will be played after caller speaks + 600ms pause)
         self.pending_welcome_message = self.voice_config.get('welcome_message',
                                                               'Hello, how can I help you today?')
@@ -807,7 +958,11 @@ class SIM7600VoiceBot:
         })
 
     def audio_capture_thread(self):
-        """Capture audio with progressive transcription and multi-tier silence detection"""
+        """Capture audio with progressive transcription and multi-tier silence detection
+
+        Segmentation logic lives in segmenter.Segmenter (pure state machine).
+        This thread only does serial I/O, VAD, and reacts to segmenter events.
+        """
         logger.info("Audio capture thread started")
 
         try:
@@ -821,40 +976,21 @@ class SIM7600VoiceBot:
             frame_size = int(sample_rate * frame_duration_ms / 1000) * bytes_per_sample  # 320 bytes
 
             # Dual-threshold silence detection for progressive VPS transcription
-            audio_chunk_threshold_ms = 550  # First threshold: send audio to VPS
-            end_sentence_threshold_ms = 800  # Second threshold: signal sentence complete
-            phrase_pause_ms = self.voice_config.get('phrase_pause_ms', 350)  # Short pause for phrase boundaries
-            long_speech_threshold_ms = self.voice_config.get('long_speech_threshold_ms', 4500)  # Progressive transcription
-            max_speech_duration_ms = self.voice_config.get('max_speech_duration_ms', 6500)  # Noise timeout
-
-            # Calculate frame counts
-            audio_chunk_frames = audio_chunk_threshold_ms // frame_duration_ms  # 550ms in frames
-            end_sentence_frames = end_sentence_threshold_ms // frame_duration_ms  # 800ms in frames
-            phrase_pause_frames = phrase_pause_ms // frame_duration_ms
-            long_speech_frames = long_speech_threshold_ms // frame_duration_ms
-            max_speech_frames = max_speech_duration_ms // frame_duration_ms
-
-            # State tracking
-            audio_buffer = []
-            silence_frames = 0
-            vad_chunk_count = 0  # Track detected speech segments
-            speech_frames = 0
-            in_speech = False
-            speech_start_time = 0
-            last_chunk_sent_time = 0
-
-            # Dual-threshold tracking
-            audio_chunk_sent = False  # Did we send audio at 550ms?
-            end_signal_sent = False  # Did we send end signal at 800ms?
-            current_chunk_num = 0  # Track chunk numbers
+            # Thresholds adapt per call/language (fixed 550/800 when adaptive_end_of_turn=false)
+            end_of_turn = AdaptiveEndOfTurn(
+                self.voice_config.get('language', 'en'),
+                self.voice_config,
+                self.profiler
+            )
+            segmenter = Segmenter(self.voice_config, end_of_turn, sample_rate, frame_duration_ms)
 
             logger.info(f"WebRTC VAD enabled: {self.vad is not None}")
             if self.vad:
                 logger.info(f"WebRTC VAD mode: {self.vad_mode} (0=least aggressive, 3=most aggressive)")
-            logger.info(f"Dual-threshold VAD: audio@{audio_chunk_threshold_ms}ms, end@{end_sentence_threshold_ms}ms")
-            logger.info(f"Phrase pause: {phrase_pause_ms}ms ({phrase_pause_frames} frames)")
-            logger.info(f"Long speech threshold: {long_speech_threshold_ms}ms")
-            logger.info(f"Max speech duration: {max_speech_duration_ms}ms")
+            logger.info(f"Dual-threshold VAD: audio@{segmenter.audio_chunk_ms}ms, end@{segmenter.end_sentence_ms}ms (initial)")
+            logger.info(f"Phrase pause: {segmenter.phrase_pause_ms}ms ({segmenter.phrase_pause_frames} frames)")
+            logger.info(f"Long speech threshold: {segmenter.long_speech_threshold_ms}ms")
+            logger.info(f"Max speech duration: {segmenter.max_speech_duration_ms}ms")
 
             while self.in_call:
                 try:
@@ -889,30 +1025,7 @@ class SIM7600VoiceBot:
                         energy = np.abs(audio_int16).mean()
                         is_speech = energy > 500  # Simple threshold
 
-                    # Process based on speech detection
                     if is_speech:
-                        # Speech detected
-                        if not in_speech:
-                            logger.info("🎤 Speech started - caller is speaking")
-                            in_speech = True
-                            speech_start_time = time.time()
-                            speech_frames = 0
-                            last_chunk_sent_time = speech_start_time
-
-                            # Track first speech from caller
-                            if not self.caller_has_spoken:
-                                self.caller_has_spoken = True
-                                logger.info("✅ Caller has spoken for the first time")
-
-                        speech_frames += 1
-                        silence_frames = 0
-
-                        # Check for speech resumption between thresholds
-                        if audio_chunk_sent and not end_signal_sent:
-                            # Speech resumed between 550ms-800ms - cancel end signal
-                            logger.debug("Speech resumed after audio sent - cancelling pending end signal")
-                            audio_chunk_sent = False
-
                         # CRITICAL: Clear silence flag - caller is speaking NOW
                         with self.playback_lock:
                             was_silent = self.caller_is_silent.is_set()
@@ -921,182 +1034,140 @@ class SIM7600VoiceBot:
                             if was_silent:
                                 logger.debug("🔴 Silence flag cleared - caller speaking (bot must wait)")
 
-                        # Check speech duration
-                        speech_duration_ms = (time.time() - speech_start_time) * 1000
+                    # Speech while bot talks is a reply/barge-in, not a premature end-of-turn
+                    if self.bot_is_speaking:
+                        segmenter.mark_bot_speaking()
 
-                        # TIER 3: Maximum speech duration exceeded (6.5s) - probably noise
-                        if speech_duration_ms > max_speech_duration_ms:
-                            logger.warning(f"⚠️ Speech duration exceeded {max_speech_duration_ms}ms - probably background noise")
-                            logger.warning("Setting flag and will play noise error message")
-
-                            # Set flag (so bot can speak error message)
-                            with self.playback_lock:
-                                self.caller_is_silent.set()
-
-                            # Queue special error message
-                            self.request_tts(
-                                "Sorry, it's too noisy and I can't understand what you're saying. Please call back from a quieter location.",
-                                priority='high'
-                            )
-
-                            # Discard buffered audio (it's noise)
-                            audio_buffer = []
-                            in_speech = False
-                            speech_frames = 0
-                            silence_frames = 0
-                            continue
-
-                        # TIER 2: Long speech (>4.5s) - look for phrase pause (350ms)
-                        elif speech_duration_ms > long_speech_threshold_ms:
-                            # We're in long speech - check for short phrase pauses
-                            # This allows progressive transcription without setting flag
-                            time_since_last_chunk = time.time() - last_chunk_sent_time
-
-                            if time_since_last_chunk * 1000 > long_speech_threshold_ms:
-                                # Been 4.5s since last chunk - look for phrase pause
-                                # (This check happens during silence detection below)
-                                pass
-
-                        # Collect audio
-                        audio_buffer.append(frame)
-
-                    else:
-                        # Silence detected
-                        silence_frames += 1
-
-                        if in_speech:
-                            # We're in speech, collect silence too (for natural audio)
-                            audio_buffer.append(frame)
-
-                            # Calculate current speech duration
-                            speech_duration_ms = (time.time() - speech_start_time) * 1000
-
-                            # TIER 2: Progressive transcription - short phrase pause (350ms)
-                            if speech_duration_ms > long_speech_threshold_ms:
-                                if silence_frames >= phrase_pause_frames:
-                                    # Short pause detected during long speech
-                                    time_since_last_chunk = time.time() - last_chunk_sent_time
-
-                                    if time_since_last_chunk * 1000 >= long_speech_threshold_ms:
-                                        logger.info(f"📝 Phrase pause ({phrase_pause_ms}ms) during long speech - sending progressive chunk")
-                                        logger.debug(f"   Speech duration: {speech_duration_ms:.0f}ms, chunk interval: {time_since_last_chunk*1000:.0f}ms")
-
-                                        # Send chunk WITHOUT setting flag (caller still speaking)
-                                        if audio_buffer:
-                                            audio_data = b''.join(audio_buffer)
-                                            self.audio_in_queue.put(audio_data)
-                                            logger.info(f"   Queued progressive chunk: {len(audio_buffer)} frames ({len(audio_data)} bytes)")
-
-                                            # Save progressive chunk as separate WAV file
-                                            if self.audio_recorder:
-                                                self.audio_recorder.record_incoming_vad_chunk(audio_data)
-
-                                            # Clear buffer but continue collecting
-                                            audio_buffer = []
-                                            last_chunk_sent_time = time.time()
-                                            silence_frames = 0  # Reset silence counter
-
-                            # TIER 0: Dual-threshold progressive transcription
-
-                            # First threshold (550ms) - send audio to VPS
-                            if silence_frames >= audio_chunk_frames and not audio_chunk_sent:
-                                if speech_frames > 10:  # At least 200ms of speech
-                                    logger.info(f"📤 First threshold ({audio_chunk_threshold_ms}ms) - sending audio chunk to VPS")
-                                    current_chunk_num += 1
-
-                                    if audio_buffer:
-                                        audio_data = b''.join(audio_buffer)
-
-                                        # Send to VPS queue
-                                        message = {
-                                            'type': 'audio',
-                                            'pcm_data': audio_data,
-                                            'chunk_num': current_chunk_num,
-                                            'timestamp': int(time.time()),
-                                            'sample_rate': sample_rate,
-                                            'duration': len(audio_data) / (sample_rate * 2),
-                                            'end_sentence': False
-                                        }
-                                        try:
-                                            self.vps_queue.put_nowait(message)
-                                            logger.info(f"   Queued audio chunk #{current_chunk_num}: {len(audio_data)} bytes")
-                                        except queue.Full:
-                                            logger.warning(f"⚠️ VPS queue full - chunk #{current_chunk_num} dropped")
-
-                                        # Save OGG locally
-                                        if self.audio_recorder:
-                                            self.audio_recorder.record_incoming_vad_chunk(audio_data)
-
-                                    audio_chunk_sent = True
-
-                            # Second threshold (800ms) - send end signal
-                            elif silence_frames >= end_sentence_frames and audio_chunk_sent and not end_signal_sent:
-                                logger.info(f"🏁 Second threshold ({end_sentence_threshold_ms}ms) - sending end signal to VPS")
-                                logger.info(f"   Total speech: {speech_frames} frames ({speech_duration_ms:.0f}ms)")
-
-                                # Send end signal
-                                message = {
-                                    'type': 'end_sentence',
-                                    'chunk_num': current_chunk_num,
-                                    'timestamp': int(time.time()),
-                                    'silence_duration_ms': end_sentence_threshold_ms
-                                }
-                                try:
-                                    self.vps_queue.put_nowait(message)
-                                    logger.info(f"   End signal sent for chunk #{current_chunk_num}")
-                                except queue.Full:
-                                    logger.warning(f"⚠️ VPS queue full - end signal dropped")
-
-                                end_signal_sent = True
-
-                                # Set silence flag for bot response
-                                with self.playback_lock:
-                                    self.caller_is_silent.set()
-                                    logger.info("🟢 Silence flag SET - bot can speak now")
-
-                                    # Play welcome message ONLY if:
-                                    # 1. First utterance AND we have pending message
-                                    # 2. Minimum 680ms continuous speech
-                                    if self.caller_has_spoken and self.pending_welcome_message:
-                                        if speech_duration_ms >= 680:
-                                            logger.info(f"📢 Playing welcome message after caller's first speech ({speech_duration_ms:.0f}ms): {self.pending_welcome_message[:50]}...")
-                                            self.request_tts(self.pending_welcome_message, priority='high')
-                                            self.pending_welcome_message = None
-                                        else:
-                                            logger.info(f"⏭️ Speech too short ({speech_duration_ms:.0f}ms < 680ms) - waiting for longer utterance before greeting")
-
-                                # If there's any remaining audio in buffer, send it
-                                if audio_buffer:
-                                    audio_data = b''.join(audio_buffer)
-                                    vad_chunk_count += 1
-                                    logger.debug(f"   Clearing buffer: {len(audio_buffer)} frames ({len(audio_data)} bytes)")
-                                    audio_buffer = []
-
-                                # Reset state for next utterance
-                                in_speech = False
-                                speech_frames = 0
-                                silence_frames = 0
-                                audio_chunk_sent = False
-                                end_signal_sent = False
-                        else:
-                            # Not in speech, just silence
-                            if silence_frames == end_sentence_frames:
-                                # Continuous silence - keep flag set
-                                logger.debug(f"Continuous silence ({end_sentence_threshold_ms}ms) - flag remains SET")
+                    for event in segmenter.process(frame, is_speech, time.time()):
+                        self.handle_segment_event(event, sample_rate)
 
                 except Exception as e:
                     logger.error(f"Frame processing error: {e}")
                     time.sleep(0.1)
 
-            # Save VAD chunk count to profiler
+            # Save VAD chunk count and end-of-turn stats to profiler
             if self.profiler:
-                self.profiler.set_vad_chunks(vad_chunk_count)
+                self.profiler.set_vad_chunks(segmenter.vad_chunk_count)
+                self.profiler.set_end_of_turn(end_of_turn.summary())
 
             logger.info("Audio capture stopped")
 
         except Exception as e:
             logger.error(f"Audio capture error: {e}")
 
+    def handle_segment_event(self, event, sample_rate):
+        """React to a Segmenter event (VPS queue, recorder, silence flag, TTS)"""
+        event_type = event['type']
+
+        if event_type == 'speech_start':
+            logger.info("🎤 Speech started - caller is speaking")
+            if event.get('premature'):
+                logger.info(f"↩️ Caller resumed {event['gap_after_end_ms']:.0f}ms after end signal - premature end-of-turn")
+
+            # Track first speech from caller
+            if not self.caller_has_spoken:
+                self.caller_has_spoken = True
+                logger.info("✅ Caller has spoken for the first time")
+
+        elif event_type == 'speech_resumed':
+            # Speech resumed between 550ms-800ms - cancel end signal
+            logger.debug("Speech resumed after audio sent - cancelling pending end signal")
+
+        elif event_type == 'noise_timeout':
+            # TIER 3: Maximum speech duration exceeded (6.5s) - probably noise
+            logger.warning(f"⚠️ Speech duration exceeded {event['speech_duration_ms']:.0f}ms - probably background noise")
+            logger.warning("Setting flag and will play noise error message")
+
+            # Set flag (so bot can speak error message)
+            with self.playback_lock:
+                self.caller_is_silent.set()
+
+            # Queue special error message
+            self.request_tts(
+                "Sorry, it's too noisy and I can't understand what you're saying. Please call back from a quieter location.",
+                priority='high'
+            )
+
+        elif event_type == 'progressive_chunk':
+            # TIER 2: Phrase pause during long speech - send chunk WITHOUT setting flag
+            audio_data = event['pcm_data']
+            logger.info(f"📝 Phrase pause during long speech - sending progressive chunk")
+            logger.debug(f"   Speech duration: {event['speech_duration_ms']:.0f}ms, chunk interval: {event['interval_ms']:.0f}ms")
+
+            self.audio_in_queue.put(audio_data)
+            logger.info(f"   Queued progressive chunk: {event['frames']} frames ({len(audio_data)} bytes)")
+
+            # Save progressive chunk as separate WAV file
+            if self.audio_recorder:
+                self.audio_recorder.record_incoming_vad_chunk(audio_data)
+
+        elif event_type == 'audio_chunk':
+            # First threshold - send audio to VPS
+            audio_data = event['pcm_data']
+            chunk_num = event['chunk_num']
+            logger.info(f"📤 First threshold ({event['threshold_ms']}ms) - sending audio chunk to VPS")
+
+            message = {
+                'type': 'audio',
+                'pcm_data': audio_data,
+                'chunk_num': chunk_num,
+                'timestamp': int(time.time()),
+                'sample_rate': sample_rate,
+                'duration': event['duration'],
+                'end_sentence': False
+            }
+            try:
+                self.vps_queue.put_nowait(message)
+                logger.info(f"   Queued audio chunk #{chunk_num}: {len(audio_data)} bytes")
+            except queue.Full:
+                logger.warning(f"⚠️ VPS queue full - chunk #{chunk_num} dropped")
+
+            # Save OGG locally
+            if self.audio_recorder:
+                self.audio_recorder.record_incoming_vad_chunk(audio_data)
+
+        elif event_type == 'end_sentence':
+            # Second threshold - send end signal
+            chunk_num = event['chunk_num']
+            speech_duration_ms = event['speech_duration_ms']
+            logger.info(f"🏁 Second threshold ({event['threshold_ms']}ms) - sending end signal to VPS")
+            logger.info(f"   Total speech: {event['speech_frames']} frames ({speech_duration_ms:.0f}ms)")
+
+            message = {
+                'type': 'end_sentence',
+                'chunk_num': chunk_num,
+                'timestamp': int(time.time()),
+                'silence_duration_ms': event['threshold_ms']
+            }
+            try:
+                self.vps_queue.put_nowait(message)
+                logger.info(f"   End signal sent for chunk #{chunk_num}")
+            except queue.Full:
+                logger.warning(f"⚠️ VPS queue full - end signal dropped")
+
+            # Set silence flag for bot response
+            with self.playback_lock:
+                self.caller_is_silent.set()
+                logger.info("🟢 Silence flag SET - bot can speak now")
+
+                # Play welcome message ONLY if:
+                # 1. First utterance AND we have pending message
+                # 2. Minimum 680ms continuous speech
+                if self.caller_has_spoken and self.pending_welcome_message:
+                    if speech_duration_ms >= 680:
+                        logger.info(f"📢 Playing welcome message after caller's first speech ({speech_duration_ms:.0f}ms): {self.pending_welcome_message[:50]}...")
+                        self.request_tts(self.pending_welcome_message, priority='high')
+                        self.pending_welcome_message = None
+                    else:
+                        logger.info(f"⏭️ Speech too short ({speech_duration_ms:.0f}ms < 680ms) - waiting for longer utterance before greeting")
+
+            # VPS still working on this chunk? Arm latency-masking filler
+            if self.filler_scheduler:
+                self.filler_scheduler.end_of_turn(chunk_num)
+
+            if event['remaining_bytes']:
+                logger.debug(f"   Clearing buffer: {event['remaining_bytes']} bytes")
+
     def audio_playback_thread(self):
         """Play audio to phone line with conversation flow control"""
         logger.info("Audio playback thread started")
@@ -1128,39 +1199,39 @@ class SIM7600VoiceBot:
                             # Check for metadata (either direct or pending)
                             metadata = self.tts_metadata.get(tts_file)
                             if not metadata:
-                                # Check for pending metadata (from TTS API call)
-                                metadata = self.tts_metadata.get(f'pending_{self.call_id}')
+                                # API files are named tts_{call_id}_{ms}_{seq}-{request_id}[.{source}].raw
+                                # (source set when the TTS router served a hedged/failover rendering)
+                                name = os.path.basename(tts_file)[len(f"tts_{self.call_id}_"):-len('.raw')]
+                                name, _, tts_source = name.partition('.')
+                                pending_key = f'pending_{name.split("-", 1)[1]}' if '-' in name else f'pending_{self.call_id}'
+                                metadata = self.tts_metadata.pop(pending_key, None)
                                 if metadata:
+                                    if tts_source:
+                                        metadata = dict(metadata, from_cache=True, tts_source=tts_source)
                                     # Move from pending to file-specific
                                     self.tts_metadata[tts_file] = metadata
-                                    del self.tts_metadata[f'pending_{self.call_id}']
 
                             # Log audio source and save to cache if needed
                             if metadata:
-                                if metadata.get('from_cache', False):
+                                if metadata.get('tts_source'):
+                                    logger.info(f"🔀 Playing {metadata['tts_source'].upper()} TTS (not cached): '{metadata['text'][:50]}...' ({len(audio_data)} bytes)")
+                                elif metadata.get('from_cache', False):
                                     logger.info(f"🎵 Playing from CACHE: '{metadata['text'][:50]}...' ({len(audio_data)} bytes)")
                                 else:
                                     logger.info(f"🎤 Playing from TTS ENGINE: '{metadata['text'][:50]}...' ({len(audio_data)} bytes)")
                                     # Save to cache for future use
-                                    cache_path = self.get_cache_path(
+                                    self.phrase_cache.put(
                                         metadata['text'],
+                                        metadata['voice'],
                                         metadata['format'],
-                                        metadata['voice']
+                                        audio_data,
+                                        metadata.get('speed', 1.0),
+                                        metadata.get('pitch', 1)
                                     )
-                                    self.save_to_cache(cache_path, audio_data)
                             else:
                                 logger.warning(f"⚠️ No metadata for TTS file: {tts_file} - playing anyway")
 
-                            # Record outgoing TTS audio
-                            if self.audio_recorder:
-                                self.audio_recorder.record_outgoing_tts(audio_data)
-
-                            # Queue audio chunks (dynamic size based on sample rate)
-                            chunk_size = 1280 if self.sample_rate == 16000 else 640  # 40ms chunks (1280 for 16kHz, 640 for 8kHz)
-                            for i in range(0, len(audio_data), chunk_size):
-                                chunk = audio_data[i:i+chunk_size]
-                                if chunk:  # Only queue non-empty chunks
-                                    self.audio_out_queue.put(chunk)
+                            self.queue_tts_audio(audio_data)
 
                             # Track TTS generation timing
                             if self.profiler:
@@ -1173,6 +1244,15 @@ class SIM7600VoiceBot:
                         except Exception as e:
                             logger.error(f"Error loading TTS file {tts_file}: {e}")
 
+                    # Latency-masking filler (plays only while waiting on VPS, cut when response arrives)
+                    filler_chunk = self.filler_scheduler.next_chunk() if self.filler_scheduler else None
+                    if filler_chunk:
+                        audio_serial.write(filler_chunk)
+                        if self.audio_recorder:
+                            self.audio_recorder.record_outgoing_tts(filler_chunk)
+                        time.sleep(len(filler_chunk) / (self.sample_rate * 2))
+                        continue
+
                     if not self.audio_out_queue.empty():
                         # Check if this is start of a new message
                         is_new_message = queue_was_empty
@@ -1224,7 +1304,7 @@ class SIM7600VoiceBot:
                         audio_chunk = self.audio_out_queue.get(timeout=0.1)
 
                         # Validate audio chunk
-                        if audio_chunk is None or not isinstance(audio_chunk, bytes):
+                        if audio_chunk is None or not isinstance(audio_chunk, (bytes, memoryview)):
                             logger.warning(f"Invalid audio chunk type: {type(audio_chunk)}")
                             continue
 
@@ -1322,10 +1402,15 @@ class SIM7600VoiceBot:
             f.write(f"=== Call Transcription: {self.call_id} ===\n")
             f.write(f"VPS URL: {self.vps_transcription_url}\n")
             f.write(f"Language: {language}\n")
+            f.write(f"Voice: {self.voice_config.get('voice_settings', {}).get('voice', 'default')}\n")
             f.write(f"Sample Rate: {self.sample_rate}Hz\n")
             f.write(f"Start Time: {time.strftime('%Y-%m-%d %H:%M:%S')}\n")
             f.write("="*50 + "\n\n")
 
+        # Streamed responses (early TTS) if the VPS supports them - probe is cached
+        streaming = self.voice_config.get('vps_streaming', True) and vps_stream.supports_streaming(self.vps_transcription_url)
+        logger.info(f"   Response mode: {'streamed' if streaming else 'JSON'}")
+
         while self.in_call:
             try:
                 # Get chunk from queue (timeout to check in_call periodically)
@@ -1334,6 +1419,10 @@ class SIM7600VoiceBot:
                 except queue.Empty:
                     continue
 
+                # End signals carry no audio (filler scheduling handles them in capture thread)
+                if chunk_info.get('type') == 'end_sentence':
+                    continue
+
                 pcm_data = chunk_info['pcm_data']
                 chunk_num = chunk_info['chunk_num']
                 sample_rate = chunk_info['sample_rate']
@@ -1378,15 +1467,34 @@ class SIM7600VoiceBot:
                     vps_start = time.time()
                     logger.info(f"   Sending to VPS...")
 
-                    response = requests.post(
-                        self.vps_transcription_url,
-                        json=payload,
-                        timeout=10  # 10 second timeout
-                    )
+                    if self.filler_scheduler:
+                        self.filler_scheduler.request_started(chunk_num)
+                    response = None
+                    try:
+                        response = requests.post(
+                            self.vps_transcription_url,
+                            json=payload,
+                            timeout=10,  # 10 second timeout (between bytes when streamed)
+                            stream=streaming,
+                            headers={'Accept': vps_stream.STREAM_ACCEPT} if streaming else None
+                        )
+                    finally:
+                        # Streamed: filler stays armed until the first sentence is sent to TTS
+                        if self.filler_scheduler and not (response is not None and vps_stream.is_streamed(response)):
+                            self.filler_scheduler.response_received(chunk_num)
 
                     vps_time = time.time() - vps_start
 
-                    if response.status_code == 200:
+                    if response.status_code == 200 and vps_stream.is_streamed(response):
+                        continue_call = self.process_streamed_response(response, chunk_num, language, transcription_file, vps_start)
+
+                        # Check if VPS wants to end call
+                        if not continue_call:
+                            logger.info("🛑 VPS requested call end")
+                            self.in_call = False
+                            break
+
+                    elif response.status_code == 200:
                         data = response.json()
 
                         if data.get('status') == 'success':
@@ -1425,20 +1533,15 @@ class SIM7600VoiceBot:
                                 num_tokens = len(tokens)
                                 logger.info(f"   Split into {num_tokens} tokens ({tokenization_time_ms:.2f}ms)")
 
-                                # Send each token to TTS sequentially
+                                # Send all tokens at once - API synthesizes concurrently, plays in order
+                                self.vps_response_counter += 1
+                                response_id = f"c{chunk_num}r{self.vps_response_counter}"
                                 for i, token in enumerate(tokens, 1):
                                     logger.info(f"   Token {i}/{num_tokens}: '{token}'")
-                                    self.request_tts(token, priority='high')
+                                    self.request_tts(token, priority='high', response_id=response_id, token_index=i)
 
                             # Save complete transcription entry to file (including tokenization time)
-                            with open(transcription_file, 'a') as f:
-                                f.write(f"[{transcription_entry['timestamp']}] Chunk #{transcription_entry['chunk_num']}:\n")
-                                f.write(f"  Caller: {transcription_entry['transcription']}\n")
-                                f.write(f"  Bot: {transcription_entry['response_text']}\n")
-                                f.write(f"  VPS Processing: {transcription_entry['processing_time']}ms\n")
-                                if num_tokens > 0:
-                                    f.write(f"  Tokenization: {tokenization_time_ms:.2f}ms → {num_tokens} tokens\n")
-                                f.write("\n")
+                            self.save_transcription_entry(transcription_file, transcription_entry, num_tokens, tokenization_time_ms)
 
                             # Check if VPS wants to end call
                             if not continue_call:
@@ -1449,7 +1552,7 @@ class SIM7600VoiceBot:
                         else:
                             # VPS returned error
                             error_msg = data.get('error', 'Unknown error')
-                            fallback = data.get('fallback_response', 'Ne cerem scuze, vă rog să repetați')
+                            fallback = data.get('fallback_response', APOLOGY_REPEAT)
                             logger.error(f"❌ VPS error: {error_msg}")
                             logger.info(f"   Using fallback: {fallback}")
                             self.request_tts(fallback, priority='high')
@@ -1457,43 +1560,225 @@ class SIM7600VoiceBot:
                     else:
                         logger.error(f"❌ VPS HTTP error: {response.status_code}")
                         # Use generic apology
-                        self.request_tts("Ne cerem scuze, am avut o problemă tehnică", priority='high')
+                        self.request_tts(APOLOGY_TECHNICAL, priority='high')
 
                 except requests.Timeout:
                     logger.error(f"❌ VPS timeout for chunk #{chunk_num}")
-                    self.request_tts("Un moment, vă rog", priority='high')
+                    self.request_tts(HOLD_ON, priority='high')
 
                 except requests.ConnectionError:
                     logger.error(f"❌ VPS connection error for chunk #{chunk_num}")
-                    self.request_tts("Ne cerem scuze, vă rog să repetați", priority='high')
+                    self.request_tts(APOLOGY_REPEAT, priority='high')
 
                 except Exception as e:
                     logger.error(f"❌ VPS processing error for chunk #{chunk_num}: {e}")
-                    self.request_tts("Ne cerem scuze, am avut o problemă", priority='high')
+                    self.request_tts(APOLOGY_GENERIC, priority='high')
 
             except Exception as e:
                 logger.error(f"VPS thread error: {e}")
 
         logger.info(f"✅ VPS transcription thread stopped. Transcription saved to: {transcription_file}")
 
-    def request_tts(self, text, priority='normal'):
-        """Request TTS from unified API with cache support"""
+    def process_streamed_response(self, response, chunk_num, language, transcription_file, vps_start):
+        """
+        Consume a streamed VPS response - each sentence goes to TTS as soon as it is complete
+
+        Args:
+            response: requests.Response (stream=True) with an event stream body
+            chunk_num: Chunk number the response belongs to
+            language: Language for tokenization
+            transcription_file: Call transcription log
+            vps_start: Time the request was sent
+
+        Returns:
+            bool: False if the VPS wants to end the call
+        """
+        tokenizer = IncrementalTokenizer(language, call_id=self.call_id, save_debug=True)
+        self.vps_response_counter += 1
+        response_id = f"c{chunk_num}r{self.vps_response_counter}"
+
+        transcription = ''
+        response_parts = []
+        continue_call = True
+        processing_time = 0
+        tokenization_time_ms = 0
+        first_token_ms = None
+        num_tokens = 0
+        vps_error = False
+
+        def speak(tokens):
+            nonlocal num_tokens, first_token_ms
+            for token in tokens:
+                num_tokens += 1
+                if first_token_ms is None:
+                    first_token_ms = (time.time() - vps_start) * 1000
+                    logger.info(f"⚡ First sentence after {first_token_ms:.0f}ms")
+                    if self.filler_scheduler:
+                        self.filler_scheduler.response_received(chunk_num)
+                logger.info(f"   Token {num_tokens}: '{token}'")
+                self.request_tts(token, priority='high', response_id=response_id, token_index=num_tokens)
+
+        try:
+            for event in vps_stream.iter_events(response):
+                event_type = event.get('type')
+
+                if event_type == 'transcription':
+                    transcription = event.get('transcription', '')
+                    logger.info(f"   Transcription: {transcription}")
+
+                elif event_type == 'delta':
+                    text = event.get('text', '')
+                    response_parts.append(text)
+                    tokenization_start = time.time()
+                    tokens = tokenizer.feed(text)
+                    tokenization_time_ms += (time.time() - tokenization_start) * 1000
+                    speak(tokens)
+
+                elif event_type == 'done':
+                    continue_call = event.get('continue', True)
+                    processing_time = event.get('processing_time_ms', 0)
+                    # Server sent the text only at the end - still works, just not early
+                    if not response_parts and event.get('response'):
+                        response_parts.append(event['response'])
+                        speak(tokenizer.feed(event['response']))
+                    break
+
+                elif event_type == 'error':
+                    error_msg = event.get('error', 'Unknown error')
+                    fallback = event.get('fallback_response', APOLOGY_REPEAT)
+                    continue_call = event.get('continue', True)
+                    vps_error = True
+                    logger.error(f"❌ VPS error: {error_msg}")
+                    if num_tokens == 0:
+                        logger.info(f"   Using fallback: {fallback}")
+                        self.request_tts(fallback, priority='high')
+                    break
+
+        except requests.RequestException as e:
+            # Nothing spoken yet - let the caller-facing apology logic handle it
+            if num_tokens == 0:
+                raise
+            logger.error(f"❌ VPS stream interrupted after {num_tokens} tokens: {e}")
+
+        finally:
+            response.close()
+            if self.filler_scheduler:
+                self.filler_scheduler.response_received(chunk_num)
+
+        # VPS error: the buffered partial sentence is dropped - no half-sentence after the fallback apology
+        if not vps_error:
+            tokenization_start = time.time()
+            tokens = tokenizer.flush()
+            tokenization_time_ms += (time.time() - tokenization_start) * 1000
+            speak(tokens)
+
+        response_text = ''.join(response_parts)
+        logger.info(f"✅ VPS streamed response ({time.time() - vps_start:.2f}s, first sentence "
+                    f"{first_token_ms if first_token_ms is not None else 0:.0f}ms, processed in {processing_time}ms)")
+        logger.info(f"   Response: {response_text}")
+
+        if self.profiler:
+            self.profiler.log_event('vps_stream_complete', {
+                'chunk_num': chunk_num,
+                'first_token_ms': first_token_ms,
+                'tokens': num_tokens
+            })
+
+        transcription_entry = {
+            'timestamp': time.strftime('%H:%M:%S'),
+            'chunk_num': chunk_num,
+            'transcription': transcription,
+            'response_text': response_text,
+            'processing_time': processing_time
+        }
+        self.save_transcription_entry(transcription_file, transcription_entry, num_tokens, tokenization_time_ms)
+
+        return continue_call
+
+    def save_transcription_entry(self, transcription_file, entry, num_tokens, tokenization_time_ms):
+        """Append one caller/bot exchange to the call transcription file"""
+        with open(transcription_file, 'a') as f:
+            f.write(f"[{entry['timestamp']}] Chunk #{entry['chunk_num']}:\n")
+            f.write(f"  Caller: {entry['transcription']}\n")
+            f.write(f"  Bot: {entry['response_text']}\n")
+            f.write(f"  VPS Processing: {entry['processing_time']}ms\n")
+            if num_tokens > 0:
+                f.write(f"  Tokenization: {tokenization_time_ms:.2f}ms → {num_tokens} tokens\n")
+            f.write("\n")
+
+    def request_tts(self, text, priority='normal', response_id=None, token_index=None):
+        """
+        Request TTS from unified API with cache support
+
+        Args:
+            text: Text to speak
+            priority: 'high' preempts pending tokens of older responses
+            response_id: Groups tokens of one VPS response (played in token order)
+            token_index: Position of the token within its response
+        """
         try:
             # Get audio format and voice for cache lookup
             audio_format = self.voice_config.get('audio_format', self.get_audio_format_fallback())
-            voice = self.voice_config.get('voice_settings', {}).get('voice', 'default')
+            voice, speed, pitch = self.get_voice_prosody()
 
-            # Check cache first
-            cache_path = self.get_cache_path(text, audio_format, voice)
-            cached_audio = self.load_from_cache(cache_path)
+            self.tts_request_counter += 1
+            request_id = f"r{self.tts_request_counter}"
+
+            # Hot phrase in RAM - straight to the output queue, unless earlier tokens
+            # of this response are still on their way (would be played out of order)
+            cached_audio = self.hot_cache.get(text, voice, audio_format, speed, pitch)
+            if cached_audio and response_id not in self.api_responses and response_id not in self.file_responses:
+                logger.info(f"⚡ Hot cache hit! '{text[:50]}...' - queued for playback")
+                self.queue_tts_audio(cached_audio)
+                if self.profiler:
+                    self.profiler.log_event('tts_request_sent', {
+                        'text_length': len(text),
+                        'priority': priority,
+                        'cache_hit': True,
+                        'hot_cache': True
+                    })
+                return
+
+            # Check disk cache
+            cache_path = None
+            if cached_audio is None:
+                cache_path = self.phrase_cache.lookup(text, voice, audio_format, speed, pitch)
+                cached_audio = self.load_from_cache(cache_path)
+                if cached_audio is None:
+                    # Speed changed on the VPS - derive from another speed instead of re-synthesizing
+                    cached_audio, cache_path = self.stretch_cached_variant(text, voice, audio_format, speed, pitch)
+                if cached_audio:
+                    self.hot_cache.put(text, voice, audio_format, cached_audio, speed, pitch)
+
+            # Earlier token of this response is being synthesized by the API - route the
+            # cached audio through the API too so it keeps its place in the playback order
+            if cached_audio and response_id in self.api_responses:
+                if cache_path is None:
+                    cache_path = self.phrase_cache.lookup(text, voice, audio_format, speed, pitch, count=False)
+                logger.info(f"🚀 Cache hit! '{text[:50]}...' - ordered behind pending API tokens")
+                self.tts_metadata[f'pending_{request_id}'] = {
+                    'text': text,
+                    'voice': voice,
+                    'format': audio_format,
+                    'speed': speed,
+                    'pitch': pitch,
+                    'from_cache': True
+                }
+                self.send_tts_request(text, priority, audio_format, response_id, token_index, request_id,
+                                      audio_file=str(cache_path) if cache_path else None)
+                return
 
             if cached_audio:
                 # Cache hit! Write directly to /tmp file for playback thread
+                # Named like the API's files: hot hits of one response land within the same millisecond
                 timestamp = int(time.time() * 1000)
-                tmp_file = f"/tmp/tts_{self.call_id}_{timestamp}.raw"
+                self.tts_file_seq += 1
+                tmp_file = f"/tmp/tts_{self.call_id}_{timestamp}_{self.tts_file_seq:05d}-{request_id}.raw"
 
-                with open(tmp_file, 'wb') as f:
+                with open(tmp_file + '.tmp', 'wb') as f:
                     f.write(cached_audio)
+                if response_id:
+                    self.file_responses.add(response_id)
 
                 logger.info(f"🚀 Cache hit! '{text[:50]}...' - instant playback ready")
 
@@ -1502,8 +1787,11 @@ class SIM7600VoiceBot:
                     'text': text,
                     'voice': voice,
                     'format': audio_format,
+                    'speed': speed,
+                    'pitch': pitch,
                     'from_cache': True
                 }
+                os.rename(tmp_file + '.tmp', tmp_file)  # Visible to the *.raw glob once its metadata is in place
 
                 # Still track timing for profiling
                 if self.profiler:
@@ -1516,46 +1804,60 @@ class SIM7600VoiceBot:
 
             # Cache miss - call TTS API as normal
 
-            # Store metadata with call_id as key (TTS API will create file with this call_id)
+            # Store metadata with request_id as key (TTS API puts it in the file name)
             # Playback thread will pick this up when it finds the file
-            self.tts_metadata[f'pending_{self.call_id}'] = {
+            self.tts_metadata[f'pending_{request_id}'] = {
                 'text': text,
                 'voice': voice,
                 'format': audio_format,
+                'speed': speed,
+                'pitch': pitch,
                 'from_cache': False
             }
+            if response_id:
+                self.api_responses.add(response_id)
 
-            payload = {
-                'callId': self.call_id,
-                'sessionId': self.session_id,
-                'text': text,
-                'action': 'speak',
-                'priority': priority,
-                'language': self.voice_config.get('language', 'en'),
-                'audio_format': audio_format
-            }
-
-            response = requests.post(
-                self.local_tts_api,
-                json=payload,
-                timeout=5
-            )
-
-            if response.status_code == 200:
-                logger.info(f"TTS requested: {text[:50]}...")
-                if self.profiler:
-                    self.profiler.start_timer('tts_generation')
-                    self.profiler.log_event('tts_request_sent', {
-                        'text_length': len(text),
-                        'priority': priority,
-                        'cache_hit': False
-                    })
-            else:
-                logger.error(f"TTS request failed: {response.status_code}")
+            self.send_tts_request(text, priority, audio_format, response_id, token_index, request_id)
 
         except Exception as e:
             logger.error(f"TTS request error: {e}")
 
+    def send_tts_request(self, text, priority, audio_format, response_id, token_index, request_id, audio_file=None):
+        """POST a TTS request to the unified API (audio_file: already cached PCM, only needs ordering)"""
+        payload = {
+            'callId': self.call_id,
+            'sessionId': self.session_id,
+            'text': text,
+            'action': 'speak',
+            'priority': priority,
+            'language': self.voice_config.get('language', 'en'),
+            'audio_format': audio_format,
+            'responseId': response_id,
+            'tokenIndex': token_index,
+            'requestId': request_id
+        }
+        if audio_file:
+            payload['audio_file'] = audio_file
+
+        response = self.local_http.post(
+            self.local_tts_api,
+            json=payload,
+            timeout=5
+        )
+
+        if response.status_code == 200:
+            logger.info(f"TTS requested: {text[:50]}...")
+            if self.profiler:
+                self.profiler.start_timer('tts_generation')
+                self.profiler.log_event('tts_request_sent', {
+                    'text_length': len(text),
+                    'priority': priority,
+                    'cache_hit': bool(audio_file)
+                })
+        else:
+            logger.error(f"TTS request failed: {response.status_code}")
+            self.tts_metadata.pop(f'pending_{request_id}', None)
+
     def cleanup_call(self):
         """Clean up resources after call ends"""
         logger.info("Cleaning up call resources...")
@@ -1566,6 +1868,18 @@ class SIM7600VoiceBot:
 
         # Clear TTS metadata
         self.tts_metadata.clear()
+        self.api_responses.clear()
+        self.file_responses.clear()
+
+        # Persist phrase cache usage (LRU order) and log hit rate
+        self.phrase_cache.flush()
+        logger.info(f"📚 Phrase cache: {self.phrase_cache.stats()}")
+        logger.info(f"🔥 Hot phrase cache: {self.hot_cache.stats()}")
+
+        # Stop filler scheduling
+        if self.filler_scheduler:
+            self.filler_scheduler.stop()
+            self.filler_scheduler = None
 
         # Close audio serial port
         if hasattr(self, 'audio_serial') and self.audio_serial:
@@ -1647,6 +1961,46 @@ class SIM7600VoiceBot:
         except Exception as e:
             logger.error(f"VPS notification error: {e}")
 
+    def read_modem_line(self):
+        """
+        Next line from the AT port, or None
+
+        Lines the direct SMS sender read during a submission come first, so a
+        RING/+CLIP/NO CARRIER that arrived mid-SMS is handled like any other.
+        """
+        try:
+            return self.modem_lines.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self.at_lock:
+            if self.ser and self.ser.in_waiting:
+                return self.ser.readline().decode('utf-8', errors='ignore').strip()
+        return None
+
+    def start_direct_sms(self):
+        """Send outbox SMS from this process (SMS_TRANSPORT=direct) - smsd spool not used for outgoing"""
+        if os.getenv('SMS_TRANSPORT', 'spool') != 'direct' or self.sms_sender:
+            return
+
+        # Only needed in direct mode - the voice bot must start without the SMS gateway modules
+        try:
+            sys.path.insert(0, '/home/rom/SMS_Gateway')
+            from sms_direct import DirectSMSSender, OutboxSender
+            from sms_outbox import SMSOutbox
+        except ImportError as e:
+            logger.error(f"❌ Direct SMS transport unavailable - SMS gateway modules not found: {e}")
+            return
+
+        try:
+            sender = DirectSMSSender(lambda: self.ser, self.at_lock, on_unsolicited=self.modem_lines.put)
+            # Calls come first: queued SMS wait until the call ended
+            self.sms_sender = OutboxSender(SMSOutbox(), sender, is_busy=lambda: self.in_call)
+            self.sms_sender.start()
+            logger.info("✅ Direct SMS transport: outbox -> AT+CMGS on the voice AT port")
+        except Exception as e:
+            logger.error(f"❌ Direct SMS transport unavailable: {e}")
+
     def extract_caller_id(self, timeout=1.0):
         """
         Extract caller ID from +CLIP notification after RING
@@ -1660,8 +2014,8 @@ class SIM7600VoiceBot:
         try:
             # Wait up to timeout seconds for +CLIP line
             while (time.time() - start_time) < timeout:
-                if self.ser and self.ser.in_waiting:
-                    line = self.ser.readline().decode('utf-8', errors='ignore').strip()
+                line = self.read_modem_line()
+                if line is not None:
                     logger.debug(f"Reading for caller ID: {line}")
 
                     if "+CLIP:" in line:
@@ -1731,29 +2085,27 @@ class SIM7600VoiceBot:
                             self.init_retry_count = 0
 
                 # Read unsolicited messages
-                if self.ser and self.ser.in_waiting:
-                    line = self.ser.readline().decode('utf-8', errors='ignore').strip()
+                line = self.read_modem_line()
+                if line:
+                    logger.debug(f"Modem: {line}")
 
-                    if line:
-                        logger.debug(f"Modem: {line}")
+                    # Handle incoming call
+                    if "RING" in line:
+                        # Record ring time (for calculating when to answer)
+                        ring_time = time.time()
 
-                        # Handle incoming call
-                        if "RING" in line:
-                            # Record ring time (for calculating when to answer)
-                            ring_time = time.time()
+                        # Extract caller ID using improved detection
+                        caller_id = self.extract_caller_id(timeout=1.0)
 
-                            # Extract caller ID using improved detection
-                            caller_id = self.extract_caller_id(timeout=1.0)
+                        # Handle call (will answer based on answer_after_rings config)
+                        self.handle_incoming_call(caller_id, ring_time)
 
-                            # Handle call (will answer based on answer_after_rings config)
-                            self.handle_incoming_call(caller_id, ring_time)
-
-                        # Handle call end
-                        elif "NO CARRIER" in line or "BUSY" in line:
-                            if self.in_call:
-                                logger.info("Call ended")
-                                self.cleanup_call()
-                                self.notify_vps('call_ended', {})
+                    # Handle call end
+                    elif "NO CARRIER" in line or "BUSY" in line:
+                        if self.in_call:
+                            logger.info("Call ended")
+                            self.cleanup_call()
+                            self.notify_vps('call_ended', {})
 
                 time.sleep(0.1)
 
@@ -1803,6 +2155,7 @@ def main():
         logger.info(f"   Welcome: {bot.voice_config.get('welcome_message', '')[:50]}...")
     else:
         logger.warning("⚠️ Failed to fetch config from VPS - will use cached/defaults")
+        bot.preload_hot_phrases()
     logger.info("="*60)
 
     # Trigger audio library sync at service startup
@@ -1814,6 +2167,9 @@ def main():
     except Exception as e:
         logger.warning(f"⚠️ Audio sync trigger failed: {e}")
 
+    # Outgoing SMS through our AT port instead of the smsd spool (SMS_TRANSPORT=direct)
+    bot.start_direct_sms()
+
     try:
         bot.monitor_modem()
     except KeyboardInterrupt:
@@ -24,6 +24,11 @@ rsync -av --exclude='silence_fills/' "$SOURCE" "$DEST" 2>&1 | tee -a "$LOG" | gr
 echo "[$(date '+%Y-%m-%d %H:%M:%S')] Pass 2: Syncing silence_fills/ directories (with delete)..." | tee -a "$LOG"
 rsync -av --delete --include='*/' --include='*/silence_fills/***' --exclude='*' "$SOURCE" "$DEST" 2>&1 | tee -a "$LOG" | grep -E '^(sending|deleting|total size|speedup)' || true
 
+# Pass 3: Update packed library (one mmap'ed data file per format/voice, top-level library files only -
+# phrases/ (phrase cache) and silence_fills/ stay plain files; appends new/changed files only)
+echo "[$(date '+%Y-%m-%d %H:%M:%S')] Pass 3: Updating audio packs..." | tee -a "$LOG"
+(cd /home/rom && python3 -m TTS.audio_pack sync "$DEST") 2>&1 | tee -a "$LOG" || true
+
 # Summary
 echo "[$(date '+%Y-%m-%d %H:%M:%S')] Sync completed successfully" | tee -a "$LOG"
 echo "" | tee -a "$LOG"
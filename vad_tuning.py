@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+"""
+Offline VAD / Threshold Tuning Tool
+Replays recorded calls through the live capture logic (VAD + Segmenter)
+across a grid of thresholds and reports, per configuration:
+- End-of-turn latency distribution (last speech frame → end signal)
+- Upload latency (last speech frame → audio sent to VPS)
+- Premature-cut rate (caller resumed shortly after end signal)
+- Upload count (audio + progressive chunks sent to VPS)
+
+Inputs:
+- /home/rom/audio_wav/*_incoming_raw_*.ogg     (recorded calls)
+- /home/rom/timing_analysis/{call_id}.json     (live baseline, optional)
+
+Usage:
+    python3 vad_tuning.py --vad-modes 2,3 --end-threshold 600,700,800 --audio-threshold 350,450,550
+    python3 vad_tuning.py --adaptive --json /tmp/vad_grid.json
+"""
+
+import argparse
+import glob
+import itertools
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import numpy as np
+
+from segmenter import split_frames, classify_frames, replay_pcm
+
+AUDIO_DIR = '/home/rom/audio_wav'
+TIMING_DIR = '/home/rom/timing_analysis'
+
+SAMPLE_RATE = 8000  # Capture thread always runs VAD at 8kHz
+FRAME_DURATION_MS = 20
+
+
+def parse_int_list(value):
+    """Parse '300,350,400' into [300, 350, 400]"""
+    return [int(v) for v in value.split(',') if v.strip()]
+
+
+def build_grid(args):
+    """Build list of configurations from CLI ranges"""
+    grid = []
+    for vad_mode, phrase, long_speech, audio_ms, end_ms in itertools.product(
+            args.vad_modes, args.phrase_pause, args.long_speech,
+            args.audio_threshold, args.end_threshold):
+        if audio_ms >= end_ms:
+            continue  # Audio must be sent before end signal
+        grid.append({
+            'vad_mode': vad_mode,
+            'phrase_pause_ms': phrase,
+            'long_speech_threshold_ms': long_speech,
+            'max_speech_duration_ms': args.max_speech,
+            'audio_chunk_threshold_ms': audio_ms,
+            'end_sentence_threshold_ms': end_ms,
+            'adaptive': False
+        })
+
+    if args.adaptive:
+        # Adaptive end-of-turn per VAD mode / progressive setting (dual thresholds learned)
+        for vad_mode, phrase, long_speech in itertools.product(
+                args.vad_modes, args.phrase_pause, args.long_speech):
+            grid.append({
+                'vad_mode': vad_mode,
+                'phrase_pause_ms': phrase,
+                'long_speech_threshold_ms': long_speech,
+                'max_speech_duration_ms': args.max_speech,
+                'audio_chunk_threshold_ms': None,
+                'end_sentence_threshold_ms': None,
+                'adaptive': True
+            })
+
+    return grid
+
+
+def config_label(config):
+    """Short human-readable label for a configuration"""
+    dual = 'adaptive' if config['adaptive'] else \
+        f"{config['audio_chunk_threshold_ms']}/{config['end_sentence_threshold_ms']}"
+    return (f"vad={config['vad_mode']} phrase={config['phrase_pause_ms']} "
+            f"long={config['long_speech_threshold_ms']} dual={dual}")
+
+
+def find_recordings(audio_dir, limit=None):
+    """Find incoming_raw recordings, newest first"""
+    recordings = sorted(glob.glob(os.path.join(audio_dir, '*_incoming_raw_*.ogg')),
+                        key=os.path.getmtime, reverse=True)
+    return recordings[:limit] if limit else recordings
+
+
+def call_id_from_recording(path):
+    """call_1712345678_incoming_raw_1712345680.ogg → call_1712345678"""
+    return Path(path).name.split('_incoming_raw_')[0]
+
+
+def load_live_baseline(call_id, timing_dir):
+    """Read live upload count / duration from profiler JSON (if present)"""
+    timing_file = Path(timing_dir) / f"{call_id}.json"
+    if not timing_file.exists():
+        return None
+    try:
+        with open(timing_file, 'r') as f:
+            data = json.load(f)
+        return {
+            'vad_chunks': data.get('summary', {}).get('vad_chunks', 0),
+            'duration': data.get('duration', 0)
+        }
+    except Exception:
+        return None
+
+
+def evaluate_recording(path, grid, premature_window_ms, language):
+    """
+    Worker: decode one recording once, run every configuration over it
+
+    Returns:
+        dict: {'path', 'audio_seconds', 'results': [per-config raw metrics]} or {'path', 'error'}
+    """
+    from audio_recorder import ogg_to_pcm
+
+    pcm_data = ogg_to_pcm(path, SAMPLE_RATE)
+    if not pcm_data:
+        return {'path': path, 'error': 'decode failed'}
+
+    frames = split_frames(pcm_data, SAMPLE_RATE, FRAME_DURATION_MS)
+    step = FRAME_DURATION_MS / 1000.0
+
+    # VAD depends only on vad_mode - classify once per mode
+    speech_by_mode = {}
+    last_speech_by_mode = {}
+    for vad_mode in sorted({c['vad_mode'] for c in grid}):
+        speech = classify_frames(frames, SAMPLE_RATE, vad_mode)
+        speech_by_mode[vad_mode] = speech
+        # Index of last speech frame at or before each frame (-1 = none yet)
+        indices = np.where(np.asarray(speech, dtype=bool), np.arange(len(speech)), -1)
+        last_speech_by_mode[vad_mode] = np.maximum.accumulate(indices) if len(indices) else indices
+
+    results = []
+    for config in grid:
+        segment_config = {k: v for k, v in config.items() if v is not None}
+        events, _ = replay_pcm(pcm_data, segment_config, config['vad_mode'], SAMPLE_RATE,
+                               FRAME_DURATION_MS, adaptive=config['adaptive'], language=language,
+                               speech=speech_by_mode[config['vad_mode']])
+        last_speech = last_speech_by_mode[config['vad_mode']]
+
+        def latency_ms(event):
+            frame_idx = int(round(event['t'] / step)) - 1
+            last_idx = last_speech[frame_idx] if 0 <= frame_idx < len(last_speech) else -1
+            return (frame_idx - last_idx) * FRAME_DURATION_MS if last_idx >= 0 else None
+
+        eot_latencies = [latency_ms(e) for e in events if e['type'] == 'end_sentence']
+        upload_latencies = [latency_ms(e) for e in events if e['type'] == 'audio_chunk']
+        premature = sum(1 for e in events if e['type'] == 'speech_start'
+                        and e.get('gap_after_end_ms') is not None
+                        and e['gap_after_end_ms'] <= premature_window_ms)
+
+        results.append({
+            'eot_latencies': [v for v in eot_latencies if v is not None],
+            'upload_latencies': [v for v in upload_latencies if v is not None],
+            'turns': len(eot_latencies),
+            'premature': premature,
+            'uploads': sum(1 for e in events if e['type'] in ('audio_chunk', 'progressive_chunk')),
+            'cancelled_uploads': sum(1 for e in events if e['type'] == 'speech_resumed'),
+            'noise_timeouts': sum(1 for e in events if e['type'] == 'noise_timeout')
+        })
+
+    return {'path': path, 'audio_seconds': len(frames) * step, 'results': results}
+
+
+def summarize(grid, recordings_results):
+    """Aggregate per-recording metrics into one row per configuration"""
+    audio_seconds = sum(r['audio_seconds'] for r in recordings_results)
+    rows = []
+
+    for idx, config in enumerate(grid):
+        per_config = [r['results'][idx] for r in recordings_results]
+        eot = np.array([v for r in per_config for v in r['eot_latencies']], dtype=float)
+        upload = np.array([v for r in per_config for v in r['upload_latencies']], dtype=float)
+        turns = sum(r['turns'] for r in per_config)
+        premature = sum(r['premature'] for r in per_config)
+        uploads = sum(r['uploads'] for r in per_config)
+
+        def pct(values, p):
+            return float(np.percentile(values, p)) if len(values) else None
+
+        rows.append({
+            'config': config,
+            'label': config_label(config),
+            'turns': turns,
+            'eot_p50_ms': pct(eot, 50),
+            'eot_p90_ms': pct(eot, 90),
+            'eot_p99_ms': pct(eot, 99),
+            'upload_p50_ms': pct(upload, 50),
+            'premature_rate': premature / turns if turns else 0.0,
+            'uploads': uploads,
+            'uploads_per_min': uploads / (audio_seconds / 60.0) if audio_seconds else 0.0,
+            'cancelled_uploads': sum(r['cancelled_uploads'] for r in per_config),
+            'noise_timeouts': sum(r['noise_timeouts'] for r in per_config)
+        })
+
+    return rows
+
+
+def print_report(rows, max_premature, live_uploads, top):
+    """Print configurations ranked by latency among those within premature-cut budget"""
+    def sort_key(row):
+        within_budget = row['premature_rate'] <= max_premature
+        latency = row['eot_p50_ms'] if row['eot_p50_ms'] is not None else float('inf')
+        return (not within_budget, latency, row['uploads'])
+
+    ranked = sorted(rows, key=sort_key)
+
+    print("=" * 118)
+    print(f"{'Configuration':<55} {'turns':>6} {'EOT p50':>8} {'p90':>6} {'p99':>6} "
+          f"{'upl p50':>8} {'premat':>7} {'uploads':>8} {'/min':>6}")
+    print("-" * 118)
+
+    def fmt(value):
+        return f"{value:.0f}" if value is not None else '-'
+
+    for row in ranked[:top]:
+        marker = ' ' if row['premature_rate'] <= max_premature else '!'
+        print(f"{marker}{row['label']:<54} {row['turns']:>6} {fmt(row['eot_p50_ms']):>8} "
+              f"{fmt(row['eot_p90_ms']):>6} {fmt(row['eot_p99_ms']):>6} {fmt(row['upload_p50_ms']):>8} "
+              f"{row['premature_rate']*100:>6.1f}% {row['uploads']:>8} {row['uploads_per_min']:>6.1f}")
+
+    print("-" * 118)
+    print(f"! = premature-cut rate above {max_premature*100:.1f}%")
+    if live_uploads is not None:
+        print(f"Live baseline (timing_analysis vad_chunks): {live_uploads} uploads")
+    print("=" * 118)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Tune VAD/segmentation thresholds over recorded calls')
+    parser.add_argument('recordings', nargs='*', help='incoming_raw OGG files (default: all in --audio-dir)')
+    parser.add_argument('--audio-dir', default=AUDIO_DIR, help='Directory with incoming_raw recordings')
+    parser.add_argument('--timing-dir', default=TIMING_DIR, help='Directory with per-call timing JSON')
+    parser.add_argument('--limit', type=int, help='Use only the N newest recordings')
+    parser.add_argument('--vad-modes', type=parse_int_list, default=[3], help='e.g. 1,2,3')
+    parser.add_argument('--phrase-pause', type=parse_int_list, default=[350], help='phrase_pause_ms values')
+    parser.add_argument('--long-speech', type=parse_int_list, default=[4500], help='long_speech_threshold_ms values')
+    parser.add_argument('--audio-threshold', type=parse_int_list, default=[450, 550], help='First threshold (ms)')
+    parser.add_argument('--end-threshold', type=parse_int_list, default=[700, 800], help='Second threshold (ms)')
+    parser.add_argument('--max-speech', type=int, default=6500, help='max_speech_duration_ms')
+    parser.add_argument('--adaptive', action='store_true', help='Also evaluate adaptive end-of-turn')
+    parser.add_argument('--language', default='ro', help='Language for adaptive defaults')
+    parser.add_argument('--premature-window', type=int, default=1500,
+                        help='Speech within this many ms after end signal counts as premature cut')
+    parser.add_argument('--max-premature', type=float, default=0.05, help='Acceptable premature-cut rate')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='Process pool size')
+    parser.add_argument('--top', type=int, default=30, help='Rows to print')
+    parser.add_argument('--json', help='Write full results to this JSON file')
+    args = parser.parse_args()
+
+    recordings = args.recordings or find_recordings(args.audio_dir, args.limit)
+    if not recordings:
+        print(f"No incoming_raw recordings found in {args.audio_dir}")
+        return 1
+
+    grid = build_grid(args)
+    if not grid:
+        print("Empty grid (audio threshold must be below end threshold)")
+        return 1
+
+    print(f"Replaying {len(recordings)} recordings × {len(grid)} configurations on {args.workers} workers...")
+    start = time.time()
+
+    recordings_results = []
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        futures = [pool.submit(evaluate_recording, path, grid, args.premature_window, args.language)
+                   for path in recordings]
+        for future in as_completed(futures):
+            result = future.result()
+            if 'error' in result:
+                print(f"⚠️ {result['path']}: {result['error']}")
+                continue
+            recordings_results.append(result)
+
+    if not recordings_results:
+        print("No recordings could be decoded")
+        return 1
+
+    elapsed = time.time() - start
+    audio_seconds = sum(r['audio_seconds'] for r in recordings_results)
+    print(f"Replayed {audio_seconds/60:.1f} min of audio in {elapsed:.1f}s "
+          f"({audio_seconds * len(grid) / max(elapsed, 1e-6):.0f}x real time across grid)")
+
+    # Live baseline from profiler JSON (uploads the bot actually made)
+    baselines = [load_live_baseline(call_id_from_recording(r['path']), args.timing_dir)
+                 for r in recordings_results]
+    live_uploads = sum(b['vad_chunks'] for b in baselines if b) if any(baselines) else None
+
+    rows = summarize(grid, recordings_results)
+    print_report(rows, args.max_premature, live_uploads, args.top)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({
+                'recordings': [r['path'] for r in recordings_results],
+                'audio_seconds': audio_seconds,
+                'live_uploads': live_uploads,
+                'rows': rows
+            }, f, indent=2)
+        print(f"Results saved to: {args.json}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
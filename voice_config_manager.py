@@ -177,12 +177,12 @@ class VoiceConfigManager:
         logger.error("No valid whisper model found!")
         return None
 
-    def get_tts_provider(self):
-        """Get the TTS provider based on configuration"""
+    def get_tts_provider(self, tts_model=None):
+        """Get the TTS provider based on configuration (or the given tts_model)"""
         if not self.config:
             return None
 
-        tts_model = self.config.get('tts_model', 'azure').lower()
+        tts_model = (tts_model or self.config.get('tts_model', 'azure')).lower()
 
         # Import the appropriate TTS module
         if tts_model == 'azure':
@@ -197,10 +197,28 @@ class VoiceConfigManager:
         elif tts_model == 'google':
             from TTS.tts_google import GoogleTTS
             return GoogleTTS(self.config)
+        elif tts_model == 'piper':
+            from TTS.tts_piper import PiperTTS
+            return PiperTTS(self.config)
         else:
             logger.error(f"Unknown TTS provider: {tts_model}")
             return None
 
+    def get_fallback_tts_provider(self):
+        """Get the local TTS provider used when the primary (cloud) provider fails"""
+        if not self.config:
+            return None
+
+        fallback_model = (self.config.get('tts_fallback_model') or 'piper').lower()
+        if fallback_model in ('none', self.config.get('tts_model', 'azure').lower()):
+            return None
+
+        try:
+            return self.get_tts_provider(fallback_model)
+        except Exception as e:
+            logger.warning(f"Fallback TTS provider '{fallback_model}' unavailable: {e}")
+            return None
+
     def apply_configuration(self):
         """Apply all configuration settings"""
         if not self.config:
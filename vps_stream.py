@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+VPS Stream - Streamed transcription responses from the VPS
+Lets the bot start TTS on the first sentence instead of waiting for the full JSON body
+
+Capability probe (cached):
+    GET /api/transcribe  ->  {"streaming": true, "stream_formats": ["ndjson", "sse"]}
+    Anything else (404/405, no JSON, connection error) = JSON only
+
+Streamed response (Content-Type application/x-ndjson or text/event-stream),
+one event per line (NDJSON) or per "event:/data:" block (SSE):
+    {"type": "transcription", "transcription": "Bună ziua"}
+    {"type": "delta", "text": "Bună ziua! "}
+    {"type": "delta", "text": "Cu ce vă pot ajuta?"}
+    {"type": "done", "continue": true, "processing_time_ms": 1650}
+    {"type": "error", "error": "...", "fallback_response": "...", "continue": true}
+
+Servers that ignore the Accept header and answer application/json keep working
+(existing contract, see docs/VPS_API_PAYLOAD_SPEC.md).
+"""
+
+import json
+import logging
+import threading
+import time
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+STREAM_CONTENT_TYPES = ('application/x-ndjson', 'text/event-stream')
+STREAM_ACCEPT = 'application/x-ndjson, text/event-stream;q=0.9, application/json;q=0.5'
+
+PROBE_TTL = 600          # Re-probe every 10 min (VPS may be upgraded mid-day)
+PROBE_ERROR_TTL = 30     # Retry sooner if the VPS was unreachable
+PROBE_TIMEOUT = 2
+
+_probe_cache = {}  # url -> (streaming, checked_at, ttl)
+_probe_lock = threading.Lock()
+
+
+def supports_streaming(url):
+    """
+    Check (cached) whether the transcription endpoint can stream responses
+
+    Args:
+        url: Transcription endpoint (probed with GET)
+
+    Returns:
+        bool: True if the VPS advertises streaming
+    """
+    with _probe_lock:
+        cached = _probe_cache.get(url)
+        if cached and time.time() - cached[1] < cached[2]:
+            return cached[0]
+
+    streaming = False
+    ttl = PROBE_TTL
+    try:
+        response = requests.get(url, timeout=PROBE_TIMEOUT, headers={'Accept': 'application/json'})
+        if response.status_code == 200:
+            capabilities = response.json()
+            streaming = bool(capabilities.get('streaming', False))
+        logger.info(f"📡 VPS capability probe: HTTP {response.status_code}, streaming={'yes' if streaming else 'no'}")
+    except requests.RequestException as e:
+        ttl = PROBE_ERROR_TTL
+        logger.warning(f"VPS capability probe failed: {e} - using JSON responses")
+    except ValueError:
+        logger.info("📡 VPS capability probe: no JSON capabilities - using JSON responses")
+
+    with _probe_lock:
+        _probe_cache[url] = (streaming, time.time(), ttl)
+    return streaming
+
+
+def is_streamed(response):
+    """True if the response body is an event stream (not a single JSON document)"""
+    content_type = response.headers.get('Content-Type', '').split(';')[0].strip().lower()
+    return content_type in STREAM_CONTENT_TYPES
+
+
+def iter_events(response):
+    """
+    Yield event dicts from a streamed response as they arrive
+
+    Args:
+        response: requests.Response opened with stream=True
+
+    Yields:
+        dict: Event with at least a 'type' key
+    """
+    sse = response.headers.get('Content-Type', '').lower().startswith('text/event-stream')
+    event_name = None
+    data_lines = []
+
+    # chunk_size=None: hand over data as soon as it arrives (no 512-byte buffering)
+    for raw in response.iter_lines(chunk_size=None):
+        line = raw.decode('utf-8', errors='replace') if isinstance(raw, bytes) else raw
+
+        if not sse:
+            if line.strip():
+                event = parse_event(line)
+                if event:
+                    yield event
+            continue
+
+        # SSE: blank line terminates an event
+        if not line:
+            if data_lines:
+                event = parse_event('\n'.join(data_lines), event_name)
+                if event:
+                    yield event
+            event_name = None
+            data_lines = []
+        elif line.startswith(':'):
+            continue  # Comment / keep-alive
+        elif line.startswith('event:'):
+            event_name = line[6:].strip()
+        elif line.startswith('data:'):
+            data_lines.append(line[5:].lstrip(' '))
+
+    if sse and data_lines:
+        event = parse_event('\n'.join(data_lines), event_name)
+        if event:
+            yield event
+
+
+def parse_event(data, event_name=None):
+    """Decode one event payload (SSE event name wins over a missing 'type')"""
+    try:
+        event = json.loads(data)
+    except ValueError:
+        logger.warning(f"Ignoring malformed stream event: {data[:100]}")
+        return None
+
+    if not isinstance(event, dict):
+        return None
+    if event_name and 'type' not in event:
+        event['type'] = event_name
+    return event